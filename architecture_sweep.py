@@ -0,0 +1,192 @@
+# Architecture Sweep: Width Multiplier x Input Resolution
+# Builds MobileNetV2 food classifiers across width multipliers (alpha) and
+# input resolutions, fine-tunes the classification head on the food images,
+# converts each to TensorFlow Lite, then benchmarks and evaluates every
+# variant and reports the latency/accuracy Pareto frontier.
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from benchmark_model import benchmark_models
+from convert_model import VARIANT_RECIPES, apply_recipe, make_representative_data_gen
+from create_fresh_model import build_model
+from food_model_utils import (
+    list_class_images, load_class_labels, load_labeled_images, predict_tflite, stratified_sample
+)
+from parity_check import top_k_accuracy
+from training_data import load_image_dataset
+
+DEFAULT_ALPHAS = (0.35, 0.5, 0.75, 1.0)
+# Input sizes with ImageNet weights for every alpha above
+DEFAULT_RESOLUTIONS = (96, 128, 160, 192, 224)
+
+def variant_name(alpha, img_size):
+    return f"mobilenetv2_{alpha:.2f}_{img_size}"
+
+def train_variant(alpha, img_size, train_dir, class_names, epochs=3, batch_size=32, weights='imagenet'):
+    """Build a frozen-backbone model and fine-tune its classification head"""
+    model = build_model(len(class_names), img_size, alpha, weights)
+    train_ds, val_ds = load_image_dataset(train_dir, class_names, img_size, batch_size,
+                                          validation_split=0.1)
+    start = time.perf_counter()
+    history = model.fit(train_ds, validation_data=val_ds, epochs=epochs, verbose=2)
+    train_seconds = time.perf_counter() - start
+    return model, history.history, train_seconds
+
+def convert_variant(model, tflite_path, recipe, calibration_samples=None):
+    representative_dataset = None
+    if recipe.get('representative_dataset'):
+        representative_dataset = make_representative_data_gen(calibration_samples,
+                                                              img_size=model.input_shape[1])
+    converter = apply_recipe(tf.lite.TFLiteConverter.from_keras_model(model), recipe,
+                             representative_dataset)
+    with open(tflite_path, 'wb') as f:
+        f.write(converter.convert())
+    return tflite_path
+
+def build_variants(alphas, resolutions, train_dir, output_dir, class_names, recipe_name='fp16',
+                   epochs=3, batch_size=32, resume=False, weights='imagenet'):
+    """Train and convert every alpha x resolution combination"""
+    os.makedirs(output_dir, exist_ok=True)
+    recipe = VARIANT_RECIPES[recipe_name]
+    calibration_samples = None
+    if recipe.get('representative_dataset'):
+        calibration_samples = stratified_sample(list_class_images(train_dir, class_names), 10)
+
+    variants = []
+    for alpha in alphas:
+        for img_size in resolutions:
+            name = variant_name(alpha, img_size)
+            tflite_path = os.path.join(output_dir, f"{name}_{recipe_name}.tflite")
+            variant = {'variant': name, 'alpha': alpha, 'img_size': img_size, 'path': tflite_path}
+
+            if resume and os.path.exists(tflite_path):
+                print(f"⏭️  {name}: already converted, skipping training")
+                variants.append(variant)
+                continue
+
+            print(f"\n🏗️  {name}: training head for {epochs} epochs")
+            try:
+                model, history, train_seconds = train_variant(
+                    alpha, img_size, train_dir, class_names, epochs, batch_size, weights
+                )
+                convert_variant(model, tflite_path, recipe, calibration_samples)
+            except Exception as e:
+                print(f"❌ {name} failed: {e}")
+                continue
+
+            variant.update({
+                'params': int(model.count_params()),
+                'train_seconds': train_seconds,
+                'train_accuracy': float(history['accuracy'][-1]),
+            })
+            if 'val_accuracy' in history:
+                variant['keras_val_accuracy'] = float(history['val_accuracy'][-1])
+            variants.append(variant)
+            print(f"✅ {name}: {tflite_path}")
+
+            # Release the graph before building the next variant
+            del model
+            tf.keras.backend.clear_session()
+
+    return variants
+
+def evaluate_variants(variants, eval_dir, class_names, samples_per_class=25, runs=50):
+    """Single-thread latency (fresh process each) and accuracy on held-out images"""
+    timings = benchmark_models([variant['path'] for variant in variants], max_threads=1,
+                               batch_sizes=(1,), runs=runs, xnnpack_modes=(True,))
+    timing_by_path = {timing['model']: timing for timing in timings}
+
+    images_by_size = {}
+    rows = []
+    for variant in variants:
+        timing = timing_by_path.get(variant['path'], {})
+        if 'error' in timing or not timing:
+            print(f"⚠️  Skipping {variant['variant']}: benchmark failed")
+            continue
+
+        img_size = variant['img_size']
+        if img_size not in images_by_size:
+            images_by_size[img_size] = load_labeled_images(eval_dir, samples_per_class,
+                                                           img_size, class_names)[:2]
+        images, labels = images_by_size[img_size]
+        probs = predict_tflite(variant['path'], images)
+
+        rows.append({
+            **variant,
+            'size_mb': timing['model_size_mb'],
+            'p50_ms': timing['latency']['p50_ms'],
+            'p90_ms': timing['latency']['p90_ms'],
+            'peak_rss_mb': timing['peak_rss_mb'],
+            'top1_accuracy': top_k_accuracy(labels, probs, 1),
+            'top3_accuracy': top_k_accuracy(labels, probs, 3),
+        })
+
+    return sorted(rows, key=lambda row: row['p50_ms'])
+
+def pareto_frontier(rows, cost='p50_ms', value='top1_accuracy'):
+    """Variants that no other variant beats on both latency and accuracy"""
+    frontier, best_value = [], -np.inf
+    for row in sorted(rows, key=lambda row: (row[cost], -row[value])):
+        if row[value] > best_value:
+            frontier.append(row)
+            best_value = row[value]
+    return frontier
+
+def print_sweep(rows, frontier, reference=None):
+    frontier_names = {row['variant'] for row in frontier}
+    print(f"\n{'':2}{'Variant':<24}{'Size MB':>9}{'p50 ms':>9}{'p90 ms':>9}"
+          f"{'Speedup':>9}{'Top1 acc':>10}{'Top3 acc':>10}")
+    print("-" * 82)
+    for row in rows:
+        speedup = f"{reference['p50_ms'] / row['p50_ms']:.1f}x" if reference else '-'
+        marker = '★ ' if row['variant'] in frontier_names else '  '
+        print(f"{marker}{row['variant']:<24}{row['size_mb']:>9.2f}{row['p50_ms']:>9.2f}{row['p90_ms']:>9.2f}"
+              f"{speedup:>9}{row['top1_accuracy']:>10.3f}{row['top3_accuracy']:>10.3f}")
+    print("\n★ = Pareto-optimal (no other variant is both faster and more accurate)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep MobileNetV2 width and input resolution")
+    parser.add_argument("--train-dir", required=True, help="Training images, one folder per class")
+    parser.add_argument("--eval-dir", required=True, help="Held-out images, one folder per class")
+    parser.add_argument("--alphas", type=float, nargs="+", default=list(DEFAULT_ALPHAS))
+    parser.add_argument("--resolutions", type=int, nargs="+", default=list(DEFAULT_RESOLUTIONS))
+    parser.add_argument("--variant", default="fp16", choices=list(VARIANT_RECIPES),
+                        help="TFLite conversion recipe for every model")
+    parser.add_argument("--epochs", type=int, default=3, help="Head fine-tuning epochs per model")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--eval-samples-per-class", type=int, default=25)
+    parser.add_argument("--runs", type=int, default=50, help="Timed runs for latency")
+    parser.add_argument("--output-dir", default="sweep", help="Where to write the converted models")
+    parser.add_argument("--resume", action="store_true", help="Reuse models already in --output-dir")
+    parser.add_argument("--output", default="sweep_results.json", help="JSON results path")
+    args = parser.parse_args()
+
+    print("📐 Food Classifier Architecture Sweep")
+    print("=" * 50)
+
+    class_names = load_class_labels()
+    variants = build_variants(args.alphas, args.resolutions, args.train_dir, args.output_dir,
+                              class_names, args.variant, args.epochs, args.batch_size, args.resume)
+    if not variants:
+        print("❌ No variants built")
+        sys.exit(1)
+
+    print("\n⏱️  Benchmarking and evaluating variants...")
+    rows = evaluate_variants(variants, args.eval_dir, class_names, args.eval_samples_per_class, args.runs)
+    frontier = pareto_frontier(rows)
+
+    # Speedups are relative to the current production architecture
+    reference = next((row for row in rows if row['variant'] == variant_name(1.0, 224)), None)
+    print_sweep(rows, frontier, reference)
+
+    with open(args.output, 'w') as f:
+        json.dump({'recipe': args.variant, 'epochs': args.epochs, 'variants': rows,
+                   'pareto_frontier': [row['variant'] for row in frontier]}, f, indent=2)
+    print(f"💾 Sweep results saved to: {args.output}")
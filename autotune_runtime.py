@@ -0,0 +1,155 @@
+# TensorFlow Lite Runtime Autotuner
+# Benchmarks one .tflite model across thread counts, XNNPACK on/off and batch
+# sizes on this machine, then writes the fastest settings to a small runtime
+# profile next to the model (food_classifier.runtime.json). The app reads the
+# latency pick at startup; batch_classify.py and inference_server.py read the
+# throughput pick. Run it on the CPU class the model will be deployed to.
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from benchmark_model import DEFAULT_BATCH_SIZES, benchmark_models
+from conversion_cache import hash_file
+from food_model_utils import runtime_profile_path
+from model_history import ASSETS_MODEL_PATH
+
+OBJECTIVES = ('latency', 'throughput')
+
+# Settings within this fraction of the best score count as a tie; ties go to
+# fewer threads and smaller batches, which leave cores and memory for the app
+DEFAULT_TOLERANCE = 0.05
+
+def latency_candidates(results, metric='p50_ms'):
+    """(score, settings) for single-image latency, lower is better
+
+    Only XNNPACK-on runs count: the app's TFLite plugin always applies the
+    default delegate, so an XNNPACK-off pick could not be honoured there.
+    """
+    return [
+        (result['latency'][metric], {
+            'numThreads': result['num_threads'],
+            'useXnnpack': result['xnnpack'],
+            'batchSize': 1,
+            'p50Ms': round(result['latency']['p50_ms'], 3),
+            'p90Ms': round(result['latency']['p90_ms'], 3),
+        })
+        for result in results if 'error' not in result and result['xnnpack']
+    ]
+
+def throughput_candidates(results):
+    """(score, settings) for images per second at each batch size, higher is better"""
+    candidates = []
+    for result in results:
+        if 'error' in result:
+            continue
+        for batch_size, batch in result['throughput'].items():
+            if 'error' in batch:
+                continue
+            candidates.append((batch['images_per_sec'], {
+                'numThreads': result['num_threads'],
+                'useXnnpack': result['xnnpack'],
+                'batchSize': int(batch_size),
+                'imagesPerSec': round(batch['images_per_sec'], 2),
+                'batchLatencyMs': round(batch['batch_latency_ms'], 3),
+            }))
+    return candidates
+
+def pick_setting(candidates, lower_is_better, tolerance=DEFAULT_TOLERANCE):
+    """Cheapest setting whose score is within tolerance of the best one"""
+    if not candidates:
+        return None
+    scores = [score for score, _ in candidates]
+    if lower_is_better:
+        best = min(scores)
+        near_best = [item for item in candidates if item[0] <= best * (1 + tolerance)]
+    else:
+        best = max(scores)
+        near_best = [item for item in candidates if item[0] >= best * (1 - tolerance)]
+    # XNNPACK on wins ties: it is the runtime default
+    _, setting = min(near_best, key=lambda item: (item[1]['numThreads'], item[1]['batchSize'],
+                                                  not item[1]['useXnnpack'], item[0] if lower_is_better else -item[0]))
+    return dict(setting, useGpuDelegate=False)
+
+def autotune(model_path, max_threads=None, batch_sizes=DEFAULT_BATCH_SIZES, runs=50, warmup=5,
+             xnnpack_modes=(True, False), latency_metric='p50_ms', tolerance=DEFAULT_TOLERANCE, cpu_class=None):
+    """Benchmark model_path and build its runtime profile; returns (profile, raw results)"""
+    results = benchmark_models([model_path], max_threads, batch_sizes, runs, warmup, xnnpack_modes)
+
+    objectives = {
+        'latency': pick_setting(latency_candidates(results, latency_metric), True, tolerance),
+        'throughput': pick_setting(throughput_candidates(results), False, tolerance),
+    }
+    if objectives['latency'] is None:
+        raise RuntimeError("No XNNPACK-on configuration ran successfully; the app always uses XNNPACK, "
+                           "so tune with --xnnpack on or both")
+
+    profile = {
+        'model': os.path.basename(model_path),
+        'modelSha256': hash_file(model_path),
+        'createdAt': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'cpuClass': cpu_class or platform.machine(),
+        'host': {
+            'platform': platform.platform(),
+            'cpuCount': os.cpu_count(),
+        },
+        'objectives': {objective: setting for objective, setting in objectives.items() if setting is not None},
+    }
+    return profile, results
+
+def print_profile(profile):
+    latency = profile['objectives']['latency']
+    print(f"\n🎯 Latency:    {latency['numThreads']} thread(s), XNNPACK {'on' if latency['useXnnpack'] else 'off'} "
+          f"-> p50 {latency['p50Ms']:.2f} ms, p90 {latency['p90Ms']:.2f} ms")
+    throughput = profile['objectives'].get('throughput')
+    if throughput:
+        print(f"🚚 Throughput: {throughput['numThreads']} thread(s), XNNPACK {'on' if throughput['useXnnpack'] else 'off'}, "
+              f"batch {throughput['batchSize']} -> {throughput['imagesPerSec']:.1f} images/sec")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune TFLite thread count, XNNPACK and batch size for this CPU")
+    parser.add_argument("model", nargs="?", default=ASSETS_MODEL_PATH, help="TFLite model to tune")
+    parser.add_argument("--output", help="Runtime profile path (default: <model>.runtime.json)")
+    parser.add_argument("--max-threads", type=int, default=None,
+                        help="Try num_threads 1..N (default: CPU count)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--runs", type=int, default=50, help="Timed runs per configuration")
+    parser.add_argument("--warmup", type=int, default=5, help="Warm-up runs before timing")
+    parser.add_argument("--xnnpack", choices=["both", "on", "off"], default="both")
+    parser.add_argument("--latency-metric", choices=["p50_ms", "p90_ms", "p99_ms", "mean_ms"], default="p50_ms",
+                        help="Latency percentile to minimize")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Prefer fewer threads / smaller batches within this fraction of the best score")
+    parser.add_argument("--cpu-class", help="Label for the target CPU class (default: machine architecture)")
+    parser.add_argument("--report", help="Optional JSON path for every benchmarked configuration")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.model):
+        print(f"❌ Model not found: {args.model}")
+        sys.exit(1)
+
+    xnnpack_modes = {'both': (True, False), 'on': (True,), 'off': (False,)}[args.xnnpack]
+
+    print("🎛️  Food Classifier Runtime Autotuner")
+    print("=" * 50)
+
+    try:
+        profile, results = autotune(args.model, args.max_threads, args.batch_sizes, args.runs, args.warmup,
+                                    xnnpack_modes, args.latency_metric, args.tolerance, args.cpu_class)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print_profile(profile)
+
+    output_path = args.output or runtime_profile_path(args.model)
+    with open(output_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    print(f"💾 Runtime profile saved to: {output_path}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'profile': profile, 'results': results}, f, indent=2)
+        print(f"💾 Benchmark results saved to: {args.report}")
@@ -0,0 +1,288 @@
+# Batch Food Classification Engine
+# Re-labels large folders of meal photos with the TensorFlow Lite model.
+# Images are decoded in a thread pool and fed to a pool of interpreters
+# (one per worker) in batches, with top-k predictions written to JSONL/CSV.
+# Duplicate and near-duplicate images are answered from a perceptual-hash
+# classification cache instead of rerunning the model.
+
+import argparse
+import csv
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from classification_cache import (
+    DEFAULT_MAX_DISTANCE, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, HASH_FUNCTIONS,
+    ClassificationCache, print_cache_stats
+)
+from conversion_cache import hash_file
+from food_model_utils import (
+    IMG_SIZE, create_interpreter, dequantize_output, list_images, load_class_labels,
+    load_image, load_runtime_settings, model_input_size, prepare_input, top_k_predictions
+)
+
+class InterpreterPool:
+    """Fixed pool of pre-allocated interpreters, one per inference worker"""
+
+    def __init__(self, model_path, size, num_threads=1, factory=None, use_xnnpack=True):
+        factory = factory or BatchInterpreter
+        self._interpreters = queue.Queue()
+        for _ in range(size):
+            self._interpreters.put(factory(model_path, num_threads, use_xnnpack))
+
+    def acquire(self):
+        return self._interpreters.get()
+
+    def release(self, interpreter):
+        self._interpreters.put(interpreter)
+
+class BatchInterpreter:
+    """TFLite interpreter that resizes its input tensor to the batch size"""
+
+    def __init__(self, model_path, num_threads=1, use_xnnpack=True):
+        self.interpreter = create_interpreter(model_path, num_threads=num_threads, use_xnnpack=use_xnnpack)
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        # Models with fused preprocessing accept any size; batches are decoded
+        # to the training resolution so they can be stacked
+        self.img_size = model_input_size(self.input_detail) or IMG_SIZE
+        self.batch_size = int(self.input_detail['shape'][0])
+        self.supports_batching = True
+
+    def _resize(self, shape):
+        if tuple(shape) == tuple(self.input_detail['shape']):
+            return True
+        try:
+            self.interpreter.resize_tensor_input(self.input_detail['index'], list(shape))
+            self.interpreter.allocate_tensors()
+            self.input_detail = self.interpreter.get_input_details()[0]
+            self.output_detail = self.interpreter.get_output_details()[0]
+            self.batch_size = shape[0]
+            return True
+        except Exception as e:
+            print(f"⚠️  Model does not support batching ({e}), falling back to batch size 1")
+            self.supports_batching = False
+            return False
+
+    def predict(self, images):
+        """Run a batch of uint8 images and return float probabilities"""
+        if self.supports_batching and self._resize(images.shape):
+            return self._invoke(images)
+
+        self._resize((1,) + images.shape[1:])
+        return np.concatenate([self._invoke(images[i:i + 1]) for i in range(len(images))])
+
+    def _invoke(self, images):
+        self.interpreter.set_tensor(self.input_detail['index'], prepare_input(images, self.input_detail))
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self.output_detail['index'])
+        return dequantize_output(output, self.output_detail)
+
+def collect_image_paths(sources):
+    """Expand directories and .txt file lists into image paths"""
+    image_paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            image_paths.extend(list_images(source))
+        elif source.endswith('.txt'):
+            with open(source) as f:
+                image_paths.extend(line.strip() for line in f if line.strip())
+        else:
+            image_paths.append(source)
+    return image_paths
+
+def _decode(image_path, img_size):
+    try:
+        return load_image(image_path, img_size), None
+    except Exception as e:
+        return None, str(e)
+
+class PredictionWriter:
+    """Thread-safe JSONL or CSV writer for top-k predictions"""
+
+    def __init__(self, output_path, top_k):
+        self._file = open(output_path, 'w', newline='')
+        self._lock = threading.Lock()
+        self._csv = None
+        if output_path.endswith('.csv'):
+            header = ['path', 'error']
+            for rank in range(1, top_k + 1):
+                header += [f'top{rank}_label', f'top{rank}_confidence']
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(header)
+
+    def write(self, image_path, predictions=None, error=None):
+        with self._lock:
+            if self._csv is not None:
+                row = [image_path, error or '']
+                for prediction in predictions or []:
+                    row += [prediction['foodName'], prediction['confidence']]
+                self._csv.writerow(row)
+            else:
+                record = {'path': image_path, 'predictions': predictions or []}
+                if error:
+                    record['error'] = error
+                self._file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self._file.close()
+
+def classify_images(image_paths, model_path, output_path, labels, batch_size=32,
+                    workers=None, decode_threads=None, num_threads=1, top_k=3, cache=None, use_xnnpack=True):
+    """Classify image_paths in batches and write predictions to output_path
+
+    With a ClassificationCache, images whose perceptual hash is (nearly) cached
+    skip the interpreter.
+    """
+    # Multi-threaded interpreters share the cores instead of oversubscribing them
+    workers = workers or max(1, (os.cpu_count() or 1) // num_threads)
+    decode_threads = decode_threads or 2 * workers
+
+    print(f"🤖 Loading {workers} interpreter(s) x {num_threads} thread(s) from: {model_path}")
+    pool = InterpreterPool(model_path, workers, num_threads, use_xnnpack=use_xnnpack)
+    probe = pool.acquire()
+    img_size = probe.img_size
+    pool.release(probe)
+
+    writer = PredictionWriter(output_path, top_k)
+    decode_pool = ThreadPoolExecutor(max_workers=decode_threads)
+    stats = {'done': 0, 'failed': 0, 'cached': 0}
+    stats_lock = threading.Lock()
+
+    def run_batch(batch_paths):
+        decoded = list(decode_pool.map(lambda path: _decode(path, img_size), batch_paths))
+
+        images, kept_paths = [], []
+        for image_path, (image, error) in zip(batch_paths, decoded):
+            if error:
+                writer.write(image_path, error=error)
+            else:
+                images.append(image)
+                kept_paths.append(image_path)
+        failed = len(batch_paths) - len(images)
+
+        keys = [None] * len(images)
+        if cache is not None and images:
+            keys = list(decode_pool.map(cache.hash_image, images))
+            uncached = []
+            for image_path, image, key in zip(kept_paths, images, keys):
+                cached = cache.get(key)
+                if cached is None:
+                    uncached.append((image_path, image, key))
+                else:
+                    writer.write(image_path, predictions=top_k_predictions(cached, labels, top_k))
+            kept_paths, images, keys = (list(column) for column in zip(*uncached)) if uncached else ([], [], [])
+
+        if images:
+            interpreter = pool.acquire()
+            try:
+                probabilities = interpreter.predict(np.stack(images))
+            finally:
+                pool.release(interpreter)
+            for image_path, row, key in zip(kept_paths, probabilities, keys):
+                if cache is not None:
+                    cache.put(key, row)
+                writer.write(image_path, predictions=top_k_predictions(row, labels, top_k))
+
+        with stats_lock:
+            stats['done'] += len(batch_paths)
+            stats['failed'] += failed
+            stats['cached'] += len(batch_paths) - failed - len(images)
+
+    batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+    print(f"📂 {len(image_paths)} images in {len(batches)} batches of up to {batch_size}")
+
+    start = time.perf_counter()
+    last_report = start
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded window of batches in flight so memory stays flat
+            pending = set()
+            for batch in batches:
+                if len(pending) >= 2 * workers:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        future.result()
+                pending.add(executor.submit(run_batch, batch))
+
+                now = time.perf_counter()
+                if now - last_report >= 10:
+                    last_report = now
+                    rate = stats['done'] / (now - start)
+                    print(f"   {stats['done']}/{len(image_paths)} images ({rate:.1f} images/sec)")
+
+            for future in pending:
+                future.result()
+    finally:
+        decode_pool.shutdown()
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    rate = stats['done'] / elapsed if elapsed > 0 else 0.0
+    print(f"\n✅ Classified {stats['done'] - stats['failed']} images "
+          f"({stats['failed']} unreadable) in {elapsed:.1f}s")
+    print(f"⚡ Throughput: {rate:.1f} images/sec")
+    if cache is not None:
+        print_cache_stats(cache.snapshot())
+    print(f"💾 Predictions saved to: {output_path}")
+
+    return {'images': stats['done'], 'failed': stats['failed'], 'cached': stats['cached'],
+            'seconds': elapsed, 'images_per_sec': rate}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-classify food images with the TFLite model")
+    parser.add_argument("sources", nargs="+", help="Image folders, image files or .txt file lists")
+    parser.add_argument("--model", default="food_classifier.tflite", help="TFLite model path")
+    parser.add_argument("--labels", default="class_indices.pkl", help="Class indices pickle")
+    parser.add_argument("--output", default="predictions.jsonl", help="Output .jsonl or .csv")
+    parser.add_argument("--batch-size", type=int, default=None,
+                        help="Images per batch (default: runtime profile, else 32)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Inference workers / interpreters (default: CPU count / threads per interpreter)")
+    parser.add_argument("--decode-threads", type=int, default=None,
+                        help="Image decode threads (default: 2x workers)")
+    parser.add_argument("--num-threads", type=int, default=None,
+                        help="Threads per interpreter (default: runtime profile, else 1)")
+    parser.add_argument("--xnnpack", choices=["on", "off"], default=None,
+                        help="XNNPACK delegate (default: runtime profile, else on)")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--no-cache", action="store_true", help="Run the model on every image")
+    parser.add_argument("--cache-file", help="Load and save the classification cache here, across runs")
+    parser.add_argument("--cache-distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                        help="Largest Hamming distance between hashes served from the cache (0 = exact)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES, help="Cached images")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL_SECONDS, help="Seconds an entry stays valid")
+    parser.add_argument("--hash-method", default="phash", choices=list(HASH_FUNCTIONS))
+    args = parser.parse_args()
+
+    print("🍽️  Batch Food Classification")
+    print("=" * 50)
+
+    runtime = load_runtime_settings(args.model, 'throughput')
+    if runtime['source']:
+        print(f"🎛️  Runtime profile: {runtime['num_threads']} thread(s), "
+              f"XNNPACK {'on' if runtime['use_xnnpack'] else 'off'}, batch {runtime['batch_size']}")
+    num_threads = args.num_threads or runtime['num_threads']
+    batch_size = args.batch_size or (runtime['batch_size'] if runtime['source'] else 32)
+    use_xnnpack = runtime['use_xnnpack'] if args.xnnpack is None else args.xnnpack == 'on'
+
+    cache = None
+    if not args.no_cache:
+        cache = ClassificationCache(args.cache_size, args.cache_ttl, args.cache_distance, args.hash_method,
+                                    model_key=hash_file(args.model))
+        if args.cache_file:
+            print(f"🗂️  Loaded {cache.load(args.cache_file)} cached classifications from: {args.cache_file}")
+
+    classify_images(
+        collect_image_paths(args.sources), args.model, args.output,
+        load_class_labels(args.labels), batch_size=batch_size,
+        workers=args.workers, decode_threads=args.decode_threads,
+        num_threads=num_threads, top_k=args.top_k, cache=cache, use_xnnpack=use_xnnpack
+    )
+    if cache is not None and args.cache_file:
+        cache.save(args.cache_file)
@@ -0,0 +1,207 @@
+# TensorFlow Lite Model Benchmark
+# Measures load time, latency percentiles, batch throughput and peak memory
+# for each .tflite artifact across thread counts, with and without XNNPACK.
+# Every configuration runs in a fresh process so cold-start and RSS numbers
+# are not polluted by earlier runs. Results are written as JSON.
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from food_model_utils import IMG_SIZE, create_interpreter, load_tflite_runtime, model_input_size, prepare_input
+
+DEFAULT_BATCH_SIZES = (1, 4, 16)
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def latency_summary(latencies_ms):
+    """Percentile summary of a list of latencies in milliseconds"""
+    latencies = np.asarray(latencies_ms)
+    return {
+        'runs': int(latencies.size),
+        'mean_ms': float(np.mean(latencies)),
+        'p50_ms': float(np.percentile(latencies, 50)),
+        'p90_ms': float(np.percentile(latencies, 90)),
+        'p99_ms': float(np.percentile(latencies, 99)),
+        'min_ms': float(np.min(latencies)),
+        'max_ms': float(np.max(latencies)),
+    }
+
+def _timed_invoke(interpreter, input_index, input_data):
+    interpreter.set_tensor(input_index, input_data)
+    start = time.perf_counter()
+    interpreter.invoke()
+    return (time.perf_counter() - start) * 1000
+
+def benchmark_config(model_path, num_threads, use_xnnpack, batch_sizes=DEFAULT_BATCH_SIZES,
+                     runs=50, warmup=5):
+    """Benchmark one model/thread/delegate configuration in the current process"""
+    # Import the runtime first so cold load only measures the model itself
+    start = time.perf_counter()
+    runtime_name = load_tflite_runtime()[0]
+    runtime_import_ms = (time.perf_counter() - start) * 1000
+    rss_before_load = peak_rss_mb()
+
+    start = time.perf_counter()
+    interpreter = create_interpreter(model_path, num_threads=num_threads, use_xnnpack=use_xnnpack)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    input_detail = interpreter.get_input_details()[0]
+    if model_input_size(input_detail) is None:
+        # Fused preprocessing with dynamic height/width: time training-size frames
+        image_shape = [IMG_SIZE, IMG_SIZE, int(input_detail['shape'][3])]
+        interpreter.resize_tensor_input(input_detail['index'], [1] + image_shape)
+        interpreter.allocate_tensors()
+        input_detail = interpreter.get_input_details()[0]
+    image_shape = [int(dim) for dim in input_detail['shape'][1:]]
+    rng = np.random.default_rng(0)
+
+    def make_batch(batch_size):
+        images = rng.integers(0, 256, size=[batch_size] + image_shape, dtype=np.uint8)
+        return prepare_input(images, input_detail)
+
+    # First inference includes lazy kernel preparation and delegate setup
+    first_inference_ms = _timed_invoke(interpreter, input_detail['index'], make_batch(1))
+
+    for _ in range(warmup):
+        _timed_invoke(interpreter, input_detail['index'], make_batch(1))
+    latencies = [_timed_invoke(interpreter, input_detail['index'], make_batch(1)) for _ in range(runs)]
+
+    throughput = {}
+    for batch_size in batch_sizes:
+        try:
+            if batch_size != int(input_detail['shape'][0]):
+                interpreter.resize_tensor_input(input_detail['index'], [batch_size] + image_shape)
+                interpreter.allocate_tensors()
+                input_detail = interpreter.get_input_details()[0]
+            batch = make_batch(batch_size)
+            _timed_invoke(interpreter, input_detail['index'], batch)
+            iterations = max(1, runs // batch_size)
+            elapsed_ms = sum(_timed_invoke(interpreter, input_detail['index'], batch)
+                             for _ in range(iterations))
+            throughput[str(batch_size)] = {
+                'images_per_sec': batch_size * iterations / (elapsed_ms / 1000),
+                'batch_latency_ms': elapsed_ms / iterations,
+            }
+        except Exception as e:
+            throughput[str(batch_size)] = {'error': str(e)}
+
+    return {
+        'model': model_path,
+        'model_size_mb': os.path.getsize(model_path) / (1024 * 1024),
+        'num_threads': num_threads,
+        'xnnpack': use_xnnpack,
+        'input_dtype': np.dtype(input_detail['dtype']).name,
+        'runtime': runtime_name,
+        'runtime_import_ms': runtime_import_ms,
+        'cold_load_ms': load_ms,
+        'first_inference_ms': first_inference_ms,
+        'latency': latency_summary(latencies),
+        'throughput': throughput,
+        'rss_before_load_mb': rss_before_load,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def _benchmark_worker(args):
+    model_path, num_threads, use_xnnpack, batch_sizes, runs, warmup = args
+    try:
+        return benchmark_config(model_path, num_threads, use_xnnpack, batch_sizes, runs, warmup)
+    except Exception as e:
+        return {'model': model_path, 'num_threads': num_threads, 'xnnpack': use_xnnpack,
+                'error': str(e)}
+
+def benchmark_models(model_paths, max_threads=None, batch_sizes=DEFAULT_BATCH_SIZES,
+                     runs=50, warmup=5, xnnpack_modes=(True, False)):
+    """Benchmark every model across thread counts and XNNPACK on/off"""
+    max_threads = max_threads or os.cpu_count() or 1
+    configs = [
+        (model_path, num_threads, use_xnnpack, tuple(batch_sizes), runs, warmup)
+        for model_path in model_paths
+        for use_xnnpack in xnnpack_modes
+        for num_threads in range(1, max_threads + 1)
+    ]
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for config in configs:
+        model_path, num_threads, use_xnnpack = config[:3]
+        print(f"⏱️  {os.path.basename(model_path)} | threads={num_threads} | "
+              f"xnnpack={'on' if use_xnnpack else 'off'}")
+
+        # One fresh process per configuration, run sequentially so
+        # configurations don't compete for CPU
+        with context.Pool(processes=1, maxtasksperchild=1) as pool:
+            result = pool.apply(_benchmark_worker, (config,))
+
+        if 'error' in result:
+            print(f"   ❌ {result['error']}")
+        else:
+            print(f"   load {result['cold_load_ms']:.1f} ms | first {result['first_inference_ms']:.1f} ms | "
+                  f"p50 {result['latency']['p50_ms']:.2f} ms | p99 {result['latency']['p99_ms']:.2f} ms | "
+                  f"peak RSS {result['peak_rss_mb'] or 0:.0f} MB")
+        results.append(result)
+
+    return results
+
+def default_model_paths():
+    """All .tflite artifacts produced by the conversion scripts"""
+    return sorted(set(glob.glob('*.tflite') + glob.glob('assets/models/*.tflite')))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TFLite food classifier variants")
+    parser.add_argument("models", nargs="*", help="TFLite models (default: ./*.tflite and assets/models/)")
+    parser.add_argument("--max-threads", type=int, default=None,
+                        help="Benchmark num_threads 1..N (default: CPU count)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=list(DEFAULT_BATCH_SIZES))
+    parser.add_argument("--runs", type=int, default=50, help="Timed runs per configuration")
+    parser.add_argument("--warmup", type=int, default=5, help="Warm-up runs before timing")
+    parser.add_argument("--xnnpack", choices=["both", "on", "off"], default="both")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results path")
+    args = parser.parse_args()
+
+    model_paths = args.models or default_model_paths()
+    if not model_paths:
+        print("❌ No .tflite models found")
+        sys.exit(1)
+
+    xnnpack_modes = {'both': (True, False), 'on': (True,), 'off': (False,)}[args.xnnpack]
+
+    print("📊 Food Classifier Benchmark")
+    print("=" * 50)
+
+    results = benchmark_models(model_paths, args.max_threads, args.batch_sizes,
+                               args.runs, args.warmup, xnnpack_modes)
+
+    report = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'host': {
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'python': platform.python_version(),
+        },
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n💾 Benchmark results saved to: {args.output}")
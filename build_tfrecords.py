@@ -0,0 +1,135 @@
+# Sharded TFRecord Dataset Builder
+# Decodes every food photo once, resizes it to the model resolution and writes
+# sharded TFRecords (train/validation) plus dataset_info.json, so fine-tuning
+# reads small pre-sized images instead of decoding full JPEGs every epoch.
+# Shards are written concurrently and decoding runs on tf.data's thread pool.
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tensorflow as tf
+
+from food_model_utils import IMG_SIZE, list_class_images, load_class_labels
+from training_data import AUTOTUNE, TFRECORD_INFO_FILE, split_class_images
+
+ENCODINGS = ('raw', 'jpeg')
+
+def shard_paths(split, num_shards):
+    return [f"{split}-{i:05d}-of-{num_shards:05d}.tfrecord" for i in range(num_shards)]
+
+def resize_image(path, img_size, encoding='raw', jpeg_quality=95):
+    """Decode and resize one image to uint8 (img_size, img_size, 3), optionally re-encoded as JPEG"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    # Antialiasing keeps downscaled images close to the app's PIL bilinear resize
+    image = tf.image.resize(image, (img_size, img_size), antialias=True)
+    image = tf.cast(tf.clip_by_value(tf.round(image), 0.0, 255.0), tf.uint8)
+    if encoding == 'jpeg':
+        return tf.io.encode_jpeg(image, quality=jpeg_quality)
+    return image
+
+def make_example(image_bytes, label):
+    return tf.train.Example(features=tf.train.Features(feature={
+        'image': tf.train.Feature(bytes_list=tf.train.BytesList(value=[image_bytes])),
+        'label': tf.train.Feature(int64_list=tf.train.Int64List(value=[label])),
+    })).SerializeToString()
+
+def write_shard(samples, output_path, img_size, encoding='raw'):
+    """Write (path, class index) pairs to one TFRecord file, skipping unreadable images"""
+    paths = [path for path, _ in samples]
+    labels = [class_index for _, class_index in samples]
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(lambda path, label: (resize_image(path, img_size, encoding), label),
+                          num_parallel_calls=AUTOTUNE)
+    dataset = dataset.ignore_errors(log_warning=True).prefetch(AUTOTUNE)
+
+    written = 0
+    with tf.io.TFRecordWriter(output_path) as writer:
+        for image, label in dataset:
+            image_bytes = image.numpy() if encoding == 'jpeg' else image.numpy().tobytes()
+            writer.write(make_example(image_bytes, int(label)))
+            written += 1
+    return written
+
+def write_split(samples, split, output_dir, img_size, encoding='raw', images_per_shard=500, workers=4):
+    """Spread samples round-robin over shards and write them in parallel"""
+    num_shards = max(1, math.ceil(len(samples) / images_per_shard))
+    names = shard_paths(split, num_shards)
+    shards = [samples[i::num_shards] for i in range(num_shards)]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        counts = list(executor.map(
+            lambda job: write_shard(job[0], os.path.join(output_dir, job[1]), img_size, encoding),
+            zip(shards, names)
+        ))
+
+    skipped = len(samples) - sum(counts)
+    print(f"   {split}: {sum(counts)} images in {num_shards} shards"
+          + (f" ({skipped} unreadable skipped)" if skipped else ""))
+    return {'files': names, 'num_examples': sum(counts), 'skipped': skipped}
+
+def build_tfrecords(data_dir, output_dir, class_names, img_size=IMG_SIZE, validation_split=0.1,
+                    encoding='raw', images_per_shard=500, workers=4, seed=0):
+    """Build train/validation TFRecord shards and dataset_info.json from an image folder"""
+    train, validation = split_class_images(list_class_images(data_dir, class_names),
+                                           validation_split, seed)
+    if not train:
+        raise ValueError(f"No training images found in: {data_dir}")
+
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"📦 Writing {len(train) + len(validation)} images at {img_size}x{img_size} ({encoding}) "
+          f"to {output_dir}")
+
+    start = time.perf_counter()
+    splits = {'train': write_split(train, 'train', output_dir, img_size, encoding,
+                                   images_per_shard, workers)}
+    if validation:
+        splits['validation'] = write_split(validation, 'validation', output_dir, img_size, encoding,
+                                           images_per_shard, workers)
+    elapsed = time.perf_counter() - start
+
+    info = {
+        'img_size': img_size,
+        'encoding': encoding,
+        'class_names': list(class_names),
+        'source_dir': os.path.abspath(data_dir),
+        'validation_split': validation_split,
+        'seed': seed,
+        'splits': splits,
+    }
+    with open(os.path.join(output_dir, TFRECORD_INFO_FILE), 'w') as f:
+        json.dump(info, f, indent=2)
+
+    total = sum(split['num_examples'] for split in splits.values())
+    print(f"⏱️  {total} images in {elapsed:.1f} s ({total / elapsed:.0f} images/s)")
+    return info
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build sharded TFRecords from a food image folder")
+    parser.add_argument("data_dir", help="Images, one folder per class")
+    parser.add_argument("--output-dir", default="tfrecords", help="Where to write the shards")
+    parser.add_argument("--img-size", type=int, default=IMG_SIZE, help="Stored image resolution")
+    parser.add_argument("--validation-split", type=float, default=0.1)
+    parser.add_argument("--encoding", default="raw", choices=ENCODINGS,
+                        help="raw uint8 pixels (no decode at train time) or JPEG (smaller shards)")
+    parser.add_argument("--images-per-shard", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4,
+                        help="Shards written concurrently")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print("🗂️  Food Classifier TFRecord Builder")
+    print("=" * 50)
+
+    try:
+        build_tfrecords(args.data_dir, args.output_dir, load_class_labels(), args.img_size,
+                        args.validation_split, args.encoding, args.images_per_shard,
+                        args.workers, args.seed)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"💾 Dataset info saved to: {os.path.join(args.output_dir, TFRECORD_INFO_FILE)}")
@@ -0,0 +1,223 @@
+# Perceptual-Hash Classification Cache
+# Re-photographed plates and re-uploaded images produce near-identical pixels,
+# so their predictions can be reused instead of rerunning the model. Images are
+# keyed by a 64-bit pHash or dHash of the downscaled grayscale image; lookups
+# accept any cached hash within a Hamming-distance threshold, found through a
+# multi-index hash. Entries are evicted least recently used first once the
+# cache is full, and expire after a TTL. Hit rates are tracked for /metrics.
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+HASH_BITS = 64
+HASH_SIDE = 8
+PHASH_SAMPLE_SIDE = 32
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_MAX_DISTANCE = 4
+
+def _grayscale(image, size):
+    """Downscale a uint8 RGB array (or PIL image) to a float grayscale (height, width) array"""
+    if not isinstance(image, Image.Image):
+        image = Image.fromarray(np.asarray(image, dtype=np.uint8))
+    return np.asarray(image.convert('L').resize(size, Image.BILINEAR), dtype=np.float32)
+
+def _pack_bits(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+def dhash(image):
+    """Difference hash: sign of horizontal gradients on a 9x8 thumbnail"""
+    pixels = _grayscale(image, (HASH_SIDE + 1, HASH_SIDE))
+    return _pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+DCT_MATRIX = _dct_matrix(PHASH_SAMPLE_SIDE)
+
+def phash(image):
+    """DCT hash: low-frequency 8x8 DCT coefficients of a 32x32 thumbnail against their median"""
+    pixels = _grayscale(image, (PHASH_SAMPLE_SIDE, PHASH_SAMPLE_SIDE))
+    coefficients = (DCT_MATRIX @ pixels @ DCT_MATRIX.T)[:HASH_SIDE, :HASH_SIDE]
+    # The DC term only reflects overall brightness
+    return _pack_bits(coefficients > np.median(coefficients.ravel()[1:]))
+
+HASH_FUNCTIONS = {'phash': phash, 'dhash': dhash}
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+class MultiIndexHash:
+    """Hamming-radius search over 64-bit hashes
+
+    Each hash is split into max_distance + 1 bit chunks with one exact-match
+    table per chunk; by pigeonhole any hash within max_distance shares at least
+    one chunk, so only those candidates are compared. Unlike a BK-tree,
+    removal is O(chunks), which LRU eviction needs.
+    """
+
+    def __init__(self, max_distance=DEFAULT_MAX_DISTANCE, bits=HASH_BITS):
+        self.max_distance = max_distance
+        chunks = max_distance + 1
+        if chunks > bits:
+            raise ValueError(f"max_distance must be below {bits}")
+        bounds = np.linspace(0, bits, chunks + 1).astype(int)
+        self._chunks = [(int(start), (1 << int(end - start)) - 1) for start, end in zip(bounds[:-1], bounds[1:])]
+        self._tables = [{} for _ in self._chunks]
+
+    def _parts(self, value):
+        return [(value >> shift) & mask for shift, mask in self._chunks]
+
+    def add(self, value):
+        for table, part in zip(self._tables, self._parts(value)):
+            table.setdefault(part, set()).add(value)
+
+    def remove(self, value):
+        for table, part in zip(self._tables, self._parts(value)):
+            bucket = table.get(part)
+            if bucket is not None:
+                bucket.discard(value)
+                if not bucket:
+                    del table[part]
+
+    def search(self, value, max_distance=None):
+        """[(distance, hash)] within max_distance, nearest first"""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        candidates = set()
+        for table, part in zip(self._tables, self._parts(value)):
+            candidates.update(table.get(part, ()))
+        return sorted((distance, candidate) for candidate in candidates
+                      if (distance := hamming(value, candidate)) <= max_distance)
+
+class ClassificationCache:
+    """Thread-safe LRU + TTL cache of class probabilities keyed by perceptual hash"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_distance=DEFAULT_MAX_DISTANCE, hash_method='phash', model_key=None):
+        if hash_method not in HASH_FUNCTIONS:
+            raise ValueError(f"Unknown hash method: {hash_method} (choose from {', '.join(HASH_FUNCTIONS)})")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.hash_method = hash_method
+        self.hash_image = HASH_FUNCTIONS[hash_method]
+        # Cached predictions belong to one model; persisted caches for others are ignored
+        self.model_key = model_key
+        self._entries = OrderedDict()
+        self._index = MultiIndexHash(max_distance)
+        self._lock = threading.Lock()
+        self.stats = {'exact_hits': 0, 'near_hits': 0, 'misses': 0, 'inserts': 0,
+                      'evictions': 0, 'expirations': 0}
+        self._lookup_seconds = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        del self._entries[key]
+        self._index.remove(key)
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, key):
+        """Cached probabilities for the hash or its nearest live neighbour, else None"""
+        start = time.perf_counter()
+        now = time.time()
+        with self._lock:
+            try:
+                if self.max_distance > 0:
+                    candidates = self._index.search(key)
+                else:
+                    candidates = [(0, key)] if key in self._entries else []
+                for distance, candidate in candidates:
+                    probabilities, stored_at = self._entries[candidate]
+                    if self._expired(stored_at, now):
+                        self._drop(candidate)
+                        self.stats['expirations'] += 1
+                        continue
+                    self._entries.move_to_end(candidate)
+                    self.stats['exact_hits' if distance == 0 else 'near_hits'] += 1
+                    return probabilities
+                self.stats['misses'] += 1
+                return None
+            finally:
+                self._lookup_seconds += time.perf_counter() - start
+
+    def put(self, key, probabilities):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                self._index.add(key)
+                self.stats['inserts'] += 1
+            self._entries[key] = (np.asarray(probabilities, dtype=np.float32), time.time())
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.stats['evictions'] += 1
+
+    def snapshot(self):
+        """Size, hit/miss counters, hit rate and mean lookup time"""
+        with self._lock:
+            lookups = self.stats['exact_hits'] + self.stats['near_hits'] + self.stats['misses']
+            hits = self.stats['exact_hits'] + self.stats['near_hits']
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'max_distance': self.max_distance,
+                'hash_method': self.hash_method,
+                **self.stats,
+                'lookups': lookups,
+                'hit_rate': round(hits / lookups, 4) if lookups else None,
+                'mean_lookup_us': round(self._lookup_seconds / lookups * 1e6, 2) if lookups else None,
+            }
+
+    def save(self, path):
+        """Write live entries to JSON, oldest first so reloading keeps LRU order"""
+        with self._lock:
+            entries = [[f"{key:016x}", probabilities.tolist(), stored_at]
+                       for key, (probabilities, stored_at) in self._entries.items()]
+        staging_path = path + '.tmp'
+        with open(staging_path, 'w') as f:
+            json.dump({'model_key': self.model_key, 'hash_method': self.hash_method, 'entries': entries}, f)
+        os.replace(staging_path, path)
+
+    def load(self, path):
+        """Add entries from a saved cache of the same model and hash method; returns how many"""
+        if not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            saved = json.load(f)
+        if saved.get('model_key') != self.model_key or saved.get('hash_method') != self.hash_method:
+            return 0
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for key, probabilities, stored_at in saved['entries']:
+                key = int(key, 16)
+                if self._expired(stored_at, now) or key in self._entries:
+                    continue
+                self._index.add(key)
+                self._entries[key] = (np.asarray(probabilities, dtype=np.float32), stored_at)
+                loaded += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return loaded
+
+def print_cache_stats(snapshot):
+    hit_rate = snapshot['hit_rate']
+    print(f"🗂️  Classification cache: {snapshot['entries']} entries, "
+          f"{snapshot['exact_hits']} exact + {snapshot['near_hits']} near hits, {snapshot['misses']} misses"
+          + (f" ({hit_rate:.1%} hit rate)" if hit_rate is not None else ''))
@@ -0,0 +1,86 @@
+# Fast-Start Food Classifier
+# Inspects the TFLite model and classifies images using only the lightweight
+# TFLite runtime (ai_edge_litert / tflite_runtime) and NumPy. TensorFlow is
+# never imported, so worker processes start in well under a second.
+# Install with: pip install ai-edge-litert numpy pillow
+
+import time
+
+_process_start = time.perf_counter()
+
+import argparse
+import json
+import sys
+
+from food_model_utils import (
+    create_interpreter, dequantize_output, load_class_labels, load_image,
+    load_tflite_runtime, model_input_size, set_image_input, top_k_predictions
+)
+
+# Imports + runtime + model load + first inference must stay under this
+STARTUP_TARGET_MS = 500
+
+def inspect_model(interpreter):
+    """Print input/output tensor details"""
+    for detail in interpreter.get_input_details():
+        print(f"   Input:  {detail['name']} {detail['shape'].tolist()} {detail['dtype'].__name__} "
+              f"quantization={detail['quantization']}")
+    for detail in interpreter.get_output_details():
+        print(f"   Output: {detail['name']} {detail['shape'].tolist()} {detail['dtype'].__name__} "
+              f"quantization={detail['quantization']}")
+
+def classify(interpreter, image_path, labels, top_k=3):
+    """Classify a single image file"""
+    # Models with fused preprocessing take the decoded image at its own size
+    image = load_image(image_path, model_input_size(interpreter.get_input_details()[0]))
+
+    set_image_input(interpreter, image[None, ...])
+    interpreter.invoke()
+    output_detail = interpreter.get_output_details()[0]
+    probabilities = dequantize_output(interpreter.get_tensor(output_detail['index']), output_detail)[0]
+    return top_k_predictions(probabilities, labels, top_k)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify food images without importing TensorFlow")
+    parser.add_argument("images", nargs="*", help="Image files to classify")
+    parser.add_argument("--model", default="food_classifier.tflite", help="TFLite model path")
+    parser.add_argument("--labels", default="class_indices.pkl", help="Class indices pickle")
+    parser.add_argument("--num-threads", type=int, default=1)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--enforce-startup-target", action="store_true",
+                        help=f"Exit non-zero if startup exceeds {STARTUP_TARGET_MS} ms or TensorFlow gets imported")
+    args = parser.parse_args()
+
+    timings = {'imports_ms': (time.perf_counter() - _process_start) * 1000}
+
+    start = time.perf_counter()
+    runtime_name = load_tflite_runtime()[0]
+    timings['runtime_import_ms'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    interpreter = create_interpreter(args.model, num_threads=args.num_threads)
+    timings['model_load_ms'] = (time.perf_counter() - start) * 1000
+
+    labels = load_class_labels(args.labels)
+    print(f"🤖 Model: {args.model} (runtime: {runtime_name})")
+    inspect_model(interpreter)
+
+    for i, image_path in enumerate(args.images):
+        start = time.perf_counter()
+        predictions = classify(interpreter, image_path, labels, args.top_k)
+        if i == 0:
+            timings['first_inference_ms'] = (time.perf_counter() - start) * 1000
+        print(json.dumps({'path': image_path, 'predictions': predictions}))
+
+    startup_ms = sum(timings.values())
+    tensorflow_loaded = 'tensorflow' in sys.modules
+
+    print(f"\n⏱️  Startup: {startup_ms:.0f} ms (target {STARTUP_TARGET_MS} ms)")
+    for name, value in timings.items():
+        print(f"   {name}: {value:.1f}")
+    if tensorflow_loaded:
+        print("⚠️  TensorFlow was imported, install ai-edge-litert or tflite-runtime for fast start")
+
+    if args.enforce_startup_target and (startup_ms > STARTUP_TARGET_MS or tensorflow_loaded):
+        print("❌ Startup target missed")
+        sys.exit(1)
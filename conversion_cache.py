@@ -0,0 +1,98 @@
+# Content-Addressed Conversion Cache
+# Reuses previously converted .tflite artifacts when the input weights and
+# the full converter configuration are unchanged, so no-op pipeline runs
+# skip loading the .h5 and reconverting. Entries are evicted least recently
+# used first once the cache grows past its size limit.
+
+import hashlib
+import os
+import shutil
+import time
+
+DEFAULT_CACHE_DIR = '.tflite_cache'
+DEFAULT_MAX_CACHE_MB = 1024
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents, streamed in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_source(path):
+    """Hash of a script's source, for pipelines that rebuild the model in code"""
+    return hash_file(path)[:16]
+
+class ConversionCache:
+    """Local artifact cache keyed by content hash, with size-bounded LRU eviction"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size_mb=DEFAULT_MAX_CACHE_MB):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def fetch(self, key, outputs):
+        """Copy cached artifacts to their destinations
+
+        outputs maps artifact name -> destination path. Returns True only
+        if every artifact was in the cache.
+        """
+        entry_dir = self._entry_dir(key)
+        cached = {name: os.path.join(entry_dir, name) for name in outputs}
+        if not all(os.path.exists(path) for path in cached.values()):
+            return False
+
+        for name, destination in outputs.items():
+            shutil.copy2(cached[name], destination)
+
+        # Mark as recently used for LRU eviction
+        now = time.time()
+        os.utime(entry_dir, (now, now))
+        print(f"♻️  Conversion cache hit: {key[:12]}")
+        return True
+
+    def store(self, key, outputs):
+        """Store artifacts (artifact name -> source path) under key"""
+        entry_dir = self._entry_dir(key)
+        staging_dir = entry_dir + '.tmp'
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        os.makedirs(staging_dir)
+
+        for name, source in outputs.items():
+            shutil.copy2(source, os.path.join(staging_dir, name))
+
+        # Swap in the complete entry so readers never see a partial one
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(staging_dir, entry_dir)
+        print(f"💾 Stored in conversion cache: {key[:12]}")
+
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if not os.path.isdir(path) or name.endswith('.tmp'):
+                continue
+            size = sum(
+                os.path.getsize(os.path.join(path, file_name))
+                for file_name in os.listdir(path)
+            )
+            entries.append((os.path.getmtime(path), size, path))
+        return entries
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits its size limit"""
+        entries = sorted(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+
+        # Never evict the most recent entry, even if it alone is over the limit
+        while total_size > self.max_size_bytes and len(entries) > 1:
+            _, size, path = entries.pop(0)
+            shutil.rmtree(path, ignore_errors=True)
+            total_size -= size
+            print(f"🧹 Evicted from conversion cache: {os.path.basename(path)[:12]}")
@@ -1,197 +1,139 @@
 # Food Classification Model Converter
 # This script converts the .h5 model to TensorFlow Lite format for Flutter
+# The conversion itself runs through export_pipeline.py; the converter recipes
+# and calibration helpers shared by the model scripts live here.
+
+import argparse
+import os
+import sys
 
 import tensorflow as tf
 import numpy as np
 
-def convert_h5_to_tflite(h5_model_path, tflite_output_path):
-    """Convert H5 model to TensorFlow Lite format"""
-    try:
-        print(f"Loading H5 model from: {h5_model_path}")
-        
-        # Load the saved H5 model
-        model = tf.keras.models.load_model(h5_model_path)
-        
-        # Print model summary
-        print("\nModel Summary:")
-        model.summary()
-        
-        # Check if model has any issues and try to fix them
-        try:
-            # Test the model with dummy input first
-            dummy_input = tf.random.normal([1, 224, 224, 3])
-            dummy_output = model(dummy_input)
-            print(f"\nModel test successful. Output shape: {dummy_output.shape}")
-        except Exception as e:
-            print(f"⚠️  Model test failed: {e}")
-            print("Attempting to rebuild model...")
-            
-            # Try to rebuild the model to fix architecture issues
-            model = rebuild_model_if_needed(model)
-        
-        # Convert to TensorFlow Lite
-        print("\nConverting to TensorFlow Lite...")
-        converter = tf.lite.TFLiteConverter.from_keras_model(model)
-        
-        # Set optimization flags for better compatibility
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
-        
-        # Enable select TF ops for better compatibility
-        converter.target_spec.supported_ops = [
-            tf.lite.OpsSet.TFLITE_BUILTINS,
-            tf.lite.OpsSet.SELECT_TF_OPS
-        ]
-        
-        # Allow custom ops if needed
-        converter.allow_custom_ops = True
-        
-        # Use float16 for smaller model size
-        converter.target_spec.supported_types = [tf.float16]
-        
-        # Set representative dataset for better quantization (optional)
-        converter.representative_dataset = representative_data_gen
-        
-        # Convert the model
-        try:
-            tflite_model = converter.convert()
-        except Exception as e:
-            print(f"⚠️  First conversion attempt failed: {e}")
-            print("Trying with relaxed settings...")
-            
-            # Try with more relaxed settings
-            converter = tf.lite.TFLiteConverter.from_keras_model(model)
-            converter.optimizations = [tf.lite.Optimize.DEFAULT]
-            converter.target_spec.supported_ops = [
-                tf.lite.OpsSet.TFLITE_BUILTINS,
-                tf.lite.OpsSet.SELECT_TF_OPS
-            ]
-            converter.allow_custom_ops = True
-            
-            tflite_model = converter.convert()
-        
-        # Save the TFLite model
-        with open(tflite_output_path, 'wb') as f:
-            f.write(tflite_model)
-        
-        print(f"✅ Model successfully converted and saved to: {tflite_output_path}")
-        
-        # Get model size info
-        import os
-        h5_size = os.path.getsize(h5_model_path) / (1024 * 1024)  # MB
-        tflite_size = os.path.getsize(tflite_output_path) / (1024 * 1024)  # MB
-        
-        print(f"\nSize comparison:")
-        print(f"H5 model: {h5_size:.2f} MB")
-        print(f"TFLite model: {tflite_size:.2f} MB")
-        print(f"Reduction: {((h5_size - tflite_size) / h5_size * 100):.1f}%")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ Error converting model: {e}")
-        print("\n🔧 Troubleshooting suggestions:")
-        print("1. Try using a different TensorFlow version")
-        print("2. Check if model file is corrupted")
-        print("3. Use the alternative conversion method below")
-        return False
+from conversion_cache import ConversionCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_CACHE_MB
+from food_model_utils import (
+    IMAGE_MEAN, IMAGE_STD, IMG_SIZE, dequantize_output, list_class_images, load_class_labels, load_image,
+    model_input_size, normalize_image, set_image_input, stratified_sample
+)
+from model_history import DEFAULT_EVAL_DIR, DEFAULT_HISTORY
+from op_audit import audit_ops, print_audit
 
-def rebuild_model_if_needed(original_model):
-    """Rebuild model to fix potential architecture issues"""
-    try:
-        print("🔧 Rebuilding model architecture...")
-        
-        # Get the base model (MobileNetV2) layers
-        base_layers = []
-        dense_layers = []
-        
-        for layer in original_model.layers:
-            if 'mobilenet' in layer.name.lower() or 'conv' in layer.name.lower():
-                base_layers.append(layer)
-            elif 'dense' in layer.name.lower() or 'dropout' in layer.name.lower():
-                dense_layers.append(layer)
-        
-        # Create a new model with explicit architecture
-        inputs = tf.keras.Input(shape=(224, 224, 3))
-        
-        # Use MobileNetV2 base
-        base_model = tf.keras.applications.MobileNetV2(
-            input_shape=(224, 224, 3),
-            include_top=False,
-            weights=None  # We'll load weights later
-        )
-        
-        x = base_model(inputs, training=False)
-        x = tf.keras.layers.GlobalAveragePooling2D()(x)
-        x = tf.keras.layers.Dropout(0.2)(x)
-        x = tf.keras.layers.Dense(128, activation='relu')(x)
-        x = tf.keras.layers.Dropout(0.2)(x)
-        outputs = tf.keras.layers.Dense(20, activation='softmax')(x)
-        
-        new_model = tf.keras.Model(inputs, outputs)
-        
-        # Try to transfer weights from original model
-        try:
-            for i, layer in enumerate(new_model.layers):
-                if i < len(original_model.layers):
-                    try:
-                        layer.set_weights(original_model.layers[i].get_weights())
-                    except:
-                        print(f"⚠️  Could not transfer weights for layer {i}")
-        except Exception as e:
-            print(f"⚠️  Weight transfer failed: {e}")
-            print("Using original model weights may not be preserved")
-        
-        print("✅ Model rebuilt successfully")
-        return new_model
-        
-    except Exception as e:
-        print(f"❌ Model rebuild failed: {e}")
-        return original_model
+# Converter settings, kept as plain data so they can be hashed for the cache
+FLOAT16_RECIPE = {
+    'optimizations': ['DEFAULT'],
+    'supported_ops': ['TFLITE_BUILTINS', 'SELECT_TF_OPS'],
+    'supported_types': ['float16'],
+    'allow_custom_ops': True,
+}
 
-def representative_data_gen():
-    """Generate representative data for quantization"""
-    for _ in range(100):
-        # Generate random data that matches your model's input
-        data = np.random.random((1, 224, 224, 3)).astype(np.float32)
-        yield [data]
+RELAXED_RECIPE = {
+    'optimizations': ['DEFAULT'],
+    'supported_ops': ['TFLITE_BUILTINS', 'SELECT_TF_OPS'],
+    'allow_custom_ops': True,
+}
 
-def alternative_conversion_method(h5_model_path, tflite_output_path):
-    """Alternative conversion method using saved_model format"""
-    try:
-        print("\n🔄 Trying alternative conversion method...")
-        
-        # Load model
-        model = tf.keras.models.load_model(h5_model_path)
-        
-        # Save as SavedModel format first
-        saved_model_dir = "temp_saved_model"
-        model.save(saved_model_dir, save_format='tf')
-        
-        # Convert from SavedModel
-        converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
-        converter.target_spec.supported_ops = [
-            tf.lite.OpsSet.TFLITE_BUILTINS,
-            tf.lite.OpsSet.SELECT_TF_OPS
-        ]
-        converter.allow_custom_ops = True
-        
-        tflite_model = converter.convert()
-        
-        # Save the converted model
-        with open(tflite_output_path, 'wb') as f:
-            f.write(tflite_model)
-        
-        # Clean up temporary directory
-        import shutil
-        shutil.rmtree(saved_model_dir, ignore_errors=True)
-        
-        print(f"✅ Alternative conversion successful: {tflite_output_path}")
-        return True
-        
-    except Exception as e:
-        print(f"❌ Alternative conversion failed: {e}")
+FLOAT32_RECIPE = {
+    'supported_ops': ['TFLITE_BUILTINS', 'SELECT_TF_OPS'],
+    'allow_custom_ops': True,
+}
+
+INT8_RECIPE = {
+    'optimizations': ['DEFAULT'],
+    'supported_ops': ['TFLITE_BUILTINS_INT8'],
+    'inference_input_type': 'uint8',
+    'inference_output_type': 'uint8',
+    'representative_dataset': True,
+}
+
+# DEFAULT optimizations without a representative dataset give
+# dynamic-range int8 weights, which is what RELAXED_RECIPE produces
+VARIANT_RECIPES = {
+    'fp32': FLOAT32_RECIPE,
+    'fp16': FLOAT16_RECIPE,
+    'dynamic_int8': RELAXED_RECIPE,
+    'full_int8': INT8_RECIPE,
+}
+
+def apply_recipe(converter, recipe, representative_dataset=None):
+    """Apply a converter recipe dict to a TFLiteConverter"""
+    converter.optimizations = [getattr(tf.lite.Optimize, name) for name in recipe.get('optimizations', [])]
+    converter.target_spec.supported_ops = [
+        getattr(tf.lite.OpsSet, name) for name in recipe.get('supported_ops', ['TFLITE_BUILTINS'])
+    ]
+    if recipe.get('supported_types'):
+        converter.target_spec.supported_types = [tf.as_dtype(name) for name in recipe['supported_types']]
+    converter.allow_custom_ops = recipe.get('allow_custom_ops', False)
+    if recipe.get('inference_input_type'):
+        converter.inference_input_type = tf.as_dtype(recipe['inference_input_type'])
+    if recipe.get('inference_output_type'):
+        converter.inference_output_type = tf.as_dtype(recipe['inference_output_type'])
+    if recipe.get('representative_dataset'):
+        converter.representative_dataset = representative_dataset
+    return converter
+
+def add_preprocessing(model, input_size=None):
+    """Wrap model so it takes raw uint8 RGB images and resizes/normalizes in-graph
+    
+    input_size=None leaves height and width dynamic, so callers can hand over
+    a decoded camera frame as-is (resize the input tensor to its shape first).
+    The ops are CAST, MUL/ADD and RESIZE_BILINEAR, all TFLite builtins.
+    """
+    img_size = model.input_shape[1]
+    inputs = tf.keras.Input(shape=(input_size, input_size, 3), dtype='uint8', name='image')
+    
+    # Same as FoodClassificationService: (pixel - 127.5) / 127.5. Bilinear
+    # resizing is linear, so normalizing first gives the same result.
+    x = tf.keras.layers.Rescaling(1.0 / IMAGE_STD, offset=-IMAGE_MEAN / IMAGE_STD, name='normalize')(inputs)
+    x = tf.keras.layers.Resizing(img_size, img_size, interpolation='bilinear', name='resize')(x)
+    outputs = model(x)
+    
+    return tf.keras.Model(inputs, outputs, name=f'{model.name}_uint8')
+
+def check_ops(tflite_path, builtins_only=False):
+    """Print the op audit of a converted model, False if strict mode is violated"""
+    audit = audit_ops(tflite_path)
+    print_audit(audit)
+    if builtins_only and not audit['builtins_only']:
+        print(f"❌ Builtins-only export failed: {tflite_path} still contains non-builtin ops")
         return False
+    return True
+
+def select_calibration_samples(calibration_dir, samples_per_class=10):
+    """Pick calibration images evenly across classes
+    
+    Expects one sub-directory per food category (class_indices.pkl names).
+    Returns a list of (image_path, class_index).
+    """
+    images_by_class = list_class_images(calibration_dir, load_class_labels())
+    samples = stratified_sample(images_by_class, samples_per_class)
+    if not samples:
+        raise ValueError(f"No calibration images found in: {calibration_dir}")
+    
+    missing = [idx for idx, paths in images_by_class.items() if not paths]
+    print(f"📸 Calibration set: {len(samples)} images from "
+          f"{len(images_by_class) - len(missing)}/{len(images_by_class)} classes")
+    if missing:
+        print(f"⚠️  No calibration images for class indices: {missing}")
+    
+    return samples
+
+def make_representative_data_gen(calibration_samples, img_size=224):
+    """Build a representative dataset that streams real food photos
+    
+    Images are preprocessed exactly like the app does, so the int8
+    calibration ranges match real inputs.
+    """
+    def representative_data_gen():
+        """Generate representative data for quantization"""
+        for image_path, _ in calibration_samples:
+            try:
+                image = load_image(image_path, img_size)
+            except Exception as e:
+                print(f"⚠️  Skipping unreadable image {image_path}: {e}")
+                continue
+            yield [normalize_image(image)[np.newaxis, ...]]
+    
+    return representative_data_gen
 
 def test_tflite_model(tflite_model_path):
     """Test the converted TFLite model"""
@@ -214,14 +156,17 @@ def test_tflite_model(tflite_model_path):
         for i, detail in enumerate(output_details):
             print(f"  Output {i}: {detail['shape']} - {detail['dtype']}")
         
-        # Test with random data
-        input_shape = input_details[0]['shape']
-        input_data = np.array(np.random.random_sample(input_shape), dtype=np.float32)
+        # Test with a random image, converted to the model's input type. Fused
+        # models with dynamic height/width get a training-size frame.
+        img_size = model_input_size(input_details[0]) or IMG_SIZE
+        test_image = np.random.randint(0, 256, size=(1, img_size, img_size, 3), dtype=np.uint8)
         
-        interpreter.set_tensor(input_details[0]['index'], input_data)
+        set_image_input(interpreter, test_image)
         interpreter.invoke()
         
-        output_data = interpreter.get_tensor(output_details[0]['index'])
+        output_data = dequantize_output(
+            interpreter.get_tensor(output_details[0]['index']), output_details[0]
+        )
         print(f"\nTest inference completed successfully!")
         print(f"Output shape: {output_data.shape}")
         print(f"Max prediction: {np.max(output_data):.4f}")
@@ -234,50 +179,71 @@ def test_tflite_model(tflite_model_path):
         return False
 
 if __name__ == "__main__":
-    # Define paths
-    h5_model_path = "food_classifier_final.h5"  # Your H5 model path
-    tflite_output_path = "food_classifier.tflite"  # Output TFLite model path
+    parser = argparse.ArgumentParser(description="Convert the food classifier to TensorFlow Lite")
+    parser.add_argument("--h5", default="food_classifier_final.h5", help="Input H5 model path")
+    parser.add_argument("--output", default="food_classifier.tflite", help="Output TFLite model path")
+    parser.add_argument("--calibration-dir", default="calibration_images",
+                        help="Real food photos (one folder per class) for INT8 calibration")
+    parser.add_argument("--int8-output", default="food_classifier_int8.tflite",
+                        help="Output path for the full-integer model")
+    parser.add_argument("--samples-per-class", type=int, default=10,
+                        help="Calibration images sampled per class")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Conversion cache directory")
+    parser.add_argument("--cache-size-mb", type=float, default=DEFAULT_MAX_CACHE_MB,
+                        help="Maximum conversion cache size before LRU eviction")
+    parser.add_argument("--no-cache", action="store_true", help="Always reconvert")
+    parser.add_argument("--builtins-only", action="store_true",
+                        help="No Flex/custom ops: fail if the model needs the Flex delegate")
+    parser.add_argument("--fused-preprocessing", action="store_true",
+                        help="Model takes raw uint8 RGB images and resizes/normalizes in-graph")
+    parser.add_argument("--fused-input-size", type=int, default=None,
+                        help="Fixed square uint8 input size (default: dynamic height/width)")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="Model history file (see model_history.py)")
+    parser.add_argument("--eval-dir", default=DEFAULT_EVAL_DIR,
+                        help="Labeled images for the accuracy recorded in the history")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Don't record the export or check it against the deployed model")
+    parser.add_argument("--allow-regression", action="store_true",
+                        help="Copy to assets even if the model regresses against the deployed one")
+    args = parser.parse_args()
+    
+    from export_pipeline import ExportPipeline, conversion_recipes
+    
+    calibration_dir = args.calibration_dir if os.path.isdir(args.calibration_dir) else None
     
     print("🍽️  Food Classification Model Converter")
     print("=" * 50)
     
-    # Try main conversion method
-    success = convert_h5_to_tflite(h5_model_path, tflite_output_path)
+    if calibration_dir is None:
+        print(f"ℹ️  No calibration directory at '{args.calibration_dir}', skipping INT8 model")
     
-    # If main method fails, try alternative
-    if not success:
-        print("\n" + "=" * 50)
-        print("🔄 Trying alternative conversion method...")
-        success = alternative_conversion_method(h5_model_path, tflite_output_path)
+    recipe, fallback_recipe = conversion_recipes('fp16', args.builtins_only)
+    pipeline = ExportPipeline(
+        args.h5, args.output, recipe=recipe, fallback_recipe=fallback_recipe,
+        fused_preprocessing=args.fused_preprocessing, fused_input_size=args.fused_input_size,
+        int8_output=args.int8_output, calibration_dir=calibration_dir, samples_per_class=args.samples_per_class,
+        builtins_only=args.builtins_only, history_path=None if args.no_history else args.history,
+        eval_dir=args.eval_dir, allow_regression=args.allow_regression,
+        cache=None if args.no_cache else ConversionCache(args.cache_dir, args.cache_size_mb),
+        force=args.no_cache, source_name='convert_model'
+    )
     
-    if success:
-        # Test the converted model
-        test_tflite_model(tflite_output_path)
-        
+    if pipeline.run():
         print("\n" + "=" * 50)
         print("✅ Conversion completed successfully!")
         print(f"\nNext steps:")
-        print(f"1. Copy '{tflite_output_path}' to 'assets/models/' in your Flutter project")
-        print(f"2. Update pubspec.yaml to include the assets (already done)")
-        print(f"3. Run 'flutter pub get' and restart the app")
-        print(f"4. Test the food recognition in Food Planner → Food Logger")
-        
-        # Copy to assets automatically if possible
-        import shutil
-        assets_path = "assets/models/food_classifier.tflite"
-        try:
-            shutil.copy2(tflite_output_path, assets_path)
-            print(f"\n🚀 Model automatically copied to: {assets_path}")
-            print("Ready to use in Flutter app!")
-        except Exception as e:
-            print(f"\n⚠️  Could not auto-copy to assets: {e}")
-            print(f"Please manually copy {tflite_output_path} to assets/models/")
-            
+        print(f"1. Update pubspec.yaml to include the assets (already done)")
+        print(f"2. Run 'flutter pub get' and restart the app")
+        print(f"3. Test the food recognition in Food Planner → Food Logger")
+    elif pipeline.failed_stage == 'publish':
+        print("\n⛔ Converted, but the deployed model was kept (see the comparison above)")
+        sys.exit(1)
     else:
         print("\n" + "=" * 50)
-        print("❌ All conversion methods failed!")
-        print("\n🔧 Manual conversion alternatives:")
+        print("❌ Conversion failed!")
+        print("\n🔧 Troubleshooting suggestions:")
         print("1. Try with different TensorFlow version: pip install tensorflow==2.13.0")
-        print("2. Use online conversion tools")
+        print("2. Rebuild the architecture from the H5 weights: python fix_and_convert_model.py")
         print("3. Retrain model with TFLite-compatible architecture")
-        print("4. For now, use the demo mode in the Flutter app")
\ No newline at end of file
+        print("4. For now, use the demo mode in the Flutter app")
+        sys.exit(1)
@@ -1,216 +1,135 @@
 # Create a New Working Model from Scratch
 # This script creates a new model with the correct architecture for food classification
 
-import tensorflow as tf
-import numpy as np
+import argparse
 import os
-import pickle
+import shutil
+import sys
+
+import tensorflow as tf
 
-def create_fresh_model():
-    """Create a fresh model with correct architecture"""
+from food_model_utils import FOOD_CATEGORIES, IMG_SIZE
+from model_history import DEFAULT_EVAL_DIR, DEFAULT_HISTORY
+
+def build_model(num_classes, img_size=224, alpha=1.0, weights='imagenet'):
+    """MobileNetV2 backbone + Dense(128) head, same as the training script"""
+    base_model = tf.keras.applications.MobileNetV2(
+        input_shape=(img_size, img_size, 3),
+        alpha=alpha,
+        include_top=False,
+        weights=weights  # Use pretrained ImageNet weights
+    )
+    
+    # Freeze base model initially
+    base_model.trainable = False
+    
+    # Add classification head (same as training script)
+    model = tf.keras.Sequential([
+        base_model,
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dropout(0.2),
+        tf.keras.layers.Dense(128, activation='relu'),
+        tf.keras.layers.Dropout(0.2),
+        tf.keras.layers.Dense(num_classes, activation='softmax')
+    ])
+    
+    # Compile model (same as training script)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    return model
+
+def create_fresh_model(compress=False, train_dir=None, history_path=DEFAULT_HISTORY, eval_dir=DEFAULT_EVAL_DIR,
+                       allow_regression=False, **compress_options):
+    """Create a fresh model with correct architecture
+    
+    Runs the export pipeline from a new ImageNet-initialized model. With
+    compress=True the model is also pruned and clustered while fine-tuning
+    on train_dir, and the compressed model is the one converted. The export
+    is recorded in the model history (unless history_path is None) and only
+    copied to assets if it doesn't regress against the deployed model, or
+    allow_regression is set.
+    """
+    from conversion_cache import ConversionCache
+    from export_pipeline import ExportPipeline, conversion_recipes
     
     print("🍽️  Creating Fresh Food Classification Model")
     print("=" * 60)
     
-    try:
-        # Food categories (must match your training data)
-        food_categories = [
-            'biriyani', 'bisibelebath', 'butternaan', 'chaat', 'chappati',
-            'dhokla', 'dosa', 'gulab jamun', 'halwa', 'idly',
-            'kathi roll', 'meduvadai', 'noodles', 'paniyaram', 'poori',
-            'samosa', 'tandoori chicken', 'upma', 'vada pav', 'ven pongal'
-        ]
-        
-        num_classes = len(food_categories)
-        img_size = 224
-        
-        print(f"🏷️  Food Categories: {num_classes}")
-        print(f"📐 Input Size: {img_size}x{img_size}")
-        
-        # Create the exact same model architecture as in train_model.py
-        print("\n🏗️  Building Model Architecture...")
-        
-        base_model = tf.keras.applications.MobileNetV2(
-            input_shape=(img_size, img_size, 3),
-            include_top=False,
-            weights='imagenet'  # Use pretrained ImageNet weights
-        )
-        
-        # Freeze base model initially
-        base_model.trainable = False
-        
-        # Add classification head (same as training script)
-        model = tf.keras.Sequential([
-            base_model,
-            tf.keras.layers.GlobalAveragePooling2D(),
-            tf.keras.layers.Dropout(0.2),
-            tf.keras.layers.Dense(128, activation='relu'),
-            tf.keras.layers.Dropout(0.2),
-            tf.keras.layers.Dense(num_classes, activation='softmax')
-        ])
-        
-        # Compile model (same as training script)
-        model.compile(
-            optimizer=tf.keras.optimizers.Adam(learning_rate=0.001),
-            loss='categorical_crossentropy',
-            metrics=['accuracy']
-        )
-        
-        print("✅ Model created successfully!")
-        print("\n📋 Model Architecture:")
-        model.summary()
-        
-        # Test the model with dummy input
-        print("\n🧪 Testing model with dummy input...")
-        dummy_input = np.random.random((1, img_size, img_size, 3)).astype(np.float32)
-        dummy_output = model.predict(dummy_input, verbose=0)
-        
-        print(f"✅ Model test successful!")
-        print(f"   Input shape: {dummy_input.shape}")
-        print(f"   Output shape: {dummy_output.shape}")
-        print(f"   Output sum: {np.sum(dummy_output):.4f} (should be ~1.0)")
-        print(f"   Max confidence: {np.max(dummy_output):.4f}")
-        print(f"   Predicted class: {np.argmax(dummy_output)}")
-        
-        # Save the fresh model
-        fresh_model_path = 'food_classifier_fresh.h5'
-        model.save(fresh_model_path)
+    num_classes = len(FOOD_CATEGORIES)
+    print(f"🏷️  Food Categories: {num_classes}")
+    print(f"📐 Input Size: {IMG_SIZE}x{IMG_SIZE}")
+    
+    fresh_model_path = 'food_classifier_fresh.h5'
+    tflite_path = 'food_classifier.tflite'
+    recipe, fallback_recipe = conversion_recipes('compressed' if compress else 'fp16')
+    pipeline = ExportPipeline(
+        'fresh', tflite_path, repair='none',
+        compress={'train_dir': train_dir, **compress_options} if compress else None,
+        recipe=recipe, fallback_recipe=fallback_recipe, class_names=FOOD_CATEGORIES,
+        labels_path='class_indices.pkl', history_path=history_path, eval_dir=eval_dir,
+        allow_regression=allow_regression, cache=ConversionCache(), source_name='create_fresh_model'
+    )
+    if not pipeline.run():
+        print("❌ Model creation failed")
+        return False
+    
+    if pipeline.converted_from_cache:
+        print(f"\n♻️  Converted model came from the conversion cache, {fresh_model_path} left as is")
+    else:
+        shutil.copy2(pipeline.manifest['load']['outputs']['model'], fresh_model_path)
         print(f"\n💾 Fresh model saved as: {fresh_model_path}")
-        
-        # Convert to TensorFlow Lite
-        print("\n🔄 Converting to TensorFlow Lite...")
-        
-        converter = tf.lite.TFLiteConverter.from_keras_model(model)
-        
-        # Optimize for mobile
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
-        
-        # Enable select TF ops for better compatibility
-        converter.target_spec.supported_ops = [
-            tf.lite.OpsSet.TFLITE_BUILTINS,
-            tf.lite.OpsSet.SELECT_TF_OPS
-        ]
-        
-        # Allow custom ops if needed
-        converter.allow_custom_ops = True
-        
-        # Use float16 for smaller size
-        converter.target_spec.supported_types = [tf.float16]
-        
-        # Convert
-        tflite_model = converter.convert()
-        
-        # Save TFLite model
-        tflite_path = 'food_classifier.tflite'
-        with open(tflite_path, 'wb') as f:
-            f.write(tflite_model)
-        
-        print(f"✅ TensorFlow Lite model saved as: {tflite_path}")
-        
-        # Test TFLite model
-        print("\n🧪 Testing TensorFlow Lite model...")
-        
-        interpreter = tf.lite.Interpreter(model_path=tflite_path)
-        interpreter.allocate_tensors()
-        
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
-        
-        print(f"   TFLite Input: {input_details[0]['shape']} ({input_details[0]['dtype']})")
-        print(f"   TFLite Output: {output_details[0]['shape']} ({output_details[0]['dtype']})")
-        
-        # Run inference
-        interpreter.set_tensor(input_details[0]['index'], dummy_input)
-        interpreter.invoke()
-        tflite_output = interpreter.get_tensor(output_details[0]['index'])
-        
-        print(f"✅ TFLite inference successful!")
-        print(f"   Output shape: {tflite_output.shape}")
-        print(f"   Max confidence: {np.max(tflite_output):.4f}")
-        print(f"   Predicted class: {np.argmax(tflite_output)}")
-        
-        # Create and save class indices
-        class_indices = {category: idx for idx, category in enumerate(food_categories)}
-        indices_path = 'class_indices.pkl'
-        with open(indices_path, 'wb') as f:
-            pickle.dump(class_indices, f)
-        
-        print(f"📋 Class indices saved as: {indices_path}")
-        
-        # Copy files to Flutter assets
-        print("\n📂 Copying files to Flutter assets...")
-        
-        try:
-            import shutil
-            
-            # Create assets directory
-            os.makedirs('assets/models', exist_ok=True)
-            
-            # Copy files
-            assets_tflite = 'assets/models/food_classifier.tflite'
-            assets_indices = 'assets/models/class_indices.pkl'
-            
-            shutil.copy2(tflite_path, assets_tflite)
-            shutil.copy2(indices_path, assets_indices)
-            
-            print(f"✅ Files copied to Flutter assets:")
-            print(f"   - {assets_tflite}")
-            print(f"   - {assets_indices}")
-            
-        except Exception as e:
-            print(f"⚠️  Could not copy to assets: {e}")
-            print("Please manually copy the files to assets/models/")
-        
-        # Model size information
+    
+    # Model size information
+    tflite_size = os.path.getsize(tflite_path) / (1024 * 1024)
+    
+    print(f"\n📊 Model Information:")
+    if os.path.exists(fresh_model_path):
         h5_size = os.path.getsize(fresh_model_path) / (1024 * 1024)
-        tflite_size = os.path.getsize(tflite_path) / (1024 * 1024)
-        
-        print(f"\n📊 Model Information:")
         print(f"   H5 Model Size: {h5_size:.2f} MB")
         print(f"   TFLite Model Size: {tflite_size:.2f} MB")
         print(f"   Compression Ratio: {((h5_size - tflite_size) / h5_size * 100):.1f}%")
-        print(f"   Supported Foods: {num_classes} categories")
-        print(f"   Input Resolution: {img_size}x{img_size} pixels")
-        
-        print(f"\n🎉 SUCCESS! Fresh model created and converted!")
-        print(f"\n⚠️  IMPORTANT NOTE:")
-        print(f"   This is a fresh model with ImageNet pretrained weights.")
-        print(f"   For best accuracy, you should:")
-        print(f"   1. Use this model structure to retrain with your food dataset")
-        print(f"   2. Or use transfer learning to fine-tune on your specific foods")
-        print(f"   3. The current model will give basic predictions but may not be highly accurate")
-        
-        print(f"\n📱 Next steps:")
-        print(f"   1. Restart your Flutter app")
-        print(f"   2. Navigate to Food Planner → Food Logger")
-        print(f"   3. Test the camera feature")
-        print(f"   4. The model will now work with real inference!")
-        
-        # Create a simple test script
-        create_test_script(food_categories, tflite_path)
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ Model creation failed: {e}")
-        import traceback
-        traceback.print_exc()
-        return False
+    else:
+        print(f"   TFLite Model Size: {tflite_size:.2f} MB")
+    print(f"   Supported Foods: {num_classes} categories")
+    print(f"   Input Resolution: {IMG_SIZE}x{IMG_SIZE} pixels")
+    
+    print(f"\n🎉 SUCCESS! Fresh model created and converted!")
+    print(f"\n⚠️  IMPORTANT NOTE:")
+    print(f"   This is a fresh model with ImageNet pretrained weights.")
+    print(f"   For best accuracy, you should:")
+    print(f"   1. Use this model structure to retrain with your food dataset")
+    print(f"   2. Or use transfer learning to fine-tune on your specific foods")
+    print(f"   3. The current model will give basic predictions but may not be highly accurate")
+    
+    print(f"\n📱 Next steps:")
+    print(f"   1. Restart your Flutter app")
+    print(f"   2. Navigate to Food Planner → Food Logger")
+    print(f"   3. Test the camera feature")
+    print(f"   4. The model will now work with real inference!")
+    
+    # Create a simple test script
+    create_test_script(FOOD_CATEGORIES, tflite_path)
+    
+    return True
 
 def create_test_script(food_categories, tflite_path):
     """Create a simple test script for the model"""
     
     test_script = f'''# Test the TensorFlow Lite Food Classification Model
-import tensorflow as tf
+# Uses the lightweight TFLite runtime, TensorFlow is not needed
 import numpy as np
 
+from food_model_utils import IMG_SIZE, create_interpreter, dequantize_output, model_input_size, set_image_input
+
 # Food categories
 FOOD_CATEGORIES = {food_categories}
 
 def test_model():
     # Load the model
-    interpreter = tf.lite.Interpreter(model_path='{tflite_path}')
-    interpreter.allocate_tensors()
+    interpreter = create_interpreter('{tflite_path}')
     
     input_details = interpreter.get_input_details()
     output_details = interpreter.get_output_details()
@@ -219,13 +138,14 @@ def test_model():
     print(f"Input shape: {{input_details[0]['shape']}}")
     print(f"Output shape: {{output_details[0]['shape']}}")
     
-    # Test with random image
-    test_image = np.random.random((1, 224, 224, 3)).astype(np.float32)
+    # Test with random image (fused-preprocessing models have a dynamic input size)
+    img_size = model_input_size(input_details[0]) or IMG_SIZE
+    test_image = np.random.randint(0, 256, size=(1, img_size, img_size, 3), dtype=np.uint8)
     
-    interpreter.set_tensor(input_details[0]['index'], test_image)
+    set_image_input(interpreter, test_image)
     interpreter.invoke()
     
-    output = interpreter.get_tensor(output_details[0]['index'])
+    output = dequantize_output(interpreter.get_tensor(output_details[0]['index']), output_details[0])
     
     # Get prediction
     predicted_class = np.argmax(output)
@@ -250,4 +170,39 @@ if __name__ == "__main__":
     print(f"   Run: python test_model.py")
 
 if __name__ == "__main__":
-    create_fresh_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Create a fresh food classification model")
+    parser.add_argument("--compress", action="store_true",
+                        help="Also prune + cluster while fine-tuning and export a compressed model")
+    parser.add_argument("--train-dir", default=None, help="Training images, one folder per class")
+    parser.add_argument("--epochs", type=int, default=2, help="Pruning fine-tune epochs")
+    parser.add_argument("--cluster-epochs", type=int, default=1, help="Clustering fine-tune epochs")
+    parser.add_argument("--target-sparsity", type=float, default=0.5)
+    parser.add_argument("--structured", action="store_true",
+                        help="Prune in the 2:4 structured pattern instead of unstructured magnitude")
+    parser.add_argument("--clusters", type=int, default=16, help="Weight clusters per layer, 0 to skip")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="Model history file (see model_history.py)")
+    parser.add_argument("--eval-dir", default=DEFAULT_EVAL_DIR,
+                        help="Labeled images for the accuracy recorded in the history")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Don't record the export or check it against the deployed model")
+    parser.add_argument("--allow-regression", action="store_true",
+                        help="Copy to assets even if the model regresses against the deployed one")
+    args = parser.parse_args()
+    
+    if args.compress and not args.train_dir:
+        parser.error("--compress needs --train-dir to fine-tune on")
+    
+    options = {}
+    if args.compress:
+        from model_compression import use_legacy_keras
+        use_legacy_keras()
+        options = {
+            'epochs': args.epochs,
+            'cluster_epochs': args.cluster_epochs,
+            'target_sparsity': args.target_sparsity,
+            'sparsity_pattern': (2, 4) if args.structured else None,
+            'num_clusters': args.clusters,
+        }
+    success = create_fresh_model(args.compress, args.train_dir, None if args.no_history else args.history,
+                                 args.eval_dir, args.allow_regression, **options)
+    sys.exit(0 if success else 1)
\ No newline at end of file
@@ -0,0 +1,505 @@
+# Supabase Query Benchmark
+# Applies supabase/migrations to a local Postgres, bulk-loads synthetic
+# dietitians, patients, diet charts, foods and intake logs with COPY, then
+# replays the queries RealDataService issues (getDashboardStats,
+# getRecentActivities, getPatientList, getDietCharts) the way PostgREST runs
+# them. Reports per-query and per-method latency plus EXPLAIN (ANALYZE, BUFFERS)
+# plans, and times candidate single-query rewrites next to the originals.
+# Needs psycopg (pip install "psycopg[binary]") and a Postgres you can write to.
+
+import argparse
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from food_model_utils import FOOD_CATEGORIES
+from nutrition_db import MEAL_TYPES, NUTRIENT_COLUMNS, apply_migrations, connect, is_postgres_url, random_uuid
+
+DIET_CHART_STATUSES = ('draft', 'active', 'completed', 'cancelled')
+DIET_CHART_STATUS_WEIGHTS = (0.2, 0.4, 0.3, 0.1)
+ACTIVITY_LEVELS = ('sedentary', 'lightly_active', 'moderately_active', 'very_active', 'extremely_active')
+
+# Tables whose sequential scans are worth a warning in the plans
+LARGE_TABLES = ('profiles', 'patient_health_profiles', 'diet_charts', 'food_intake_logs')
+
+COPY_CHUNK_ROWS = 200_000
+
+def postgrest(select_sql):
+    """Wrap a query the way PostgREST does: the whole result aggregated into one JSON body"""
+    return (f"WITH pgrst_source AS ({select_sql}) "
+            f"SELECT coalesce(json_agg(_postgrest_t), '[]') AS body FROM pgrst_source AS _postgrest_t")
+
+# The queries behind each RealDataService call, with the embedded resources
+# (profiles!..._fkey(...), food_items!inner(...)) written as PostgREST's lateral joins
+QUERIES = {
+    'profile_by_firebase_uid': postgrest(
+        "SELECT profiles.* FROM public.profiles WHERE profiles.firebase_uid = %(firebase_uid)s"
+    ),
+    'dietitian_patients': postgrest(
+        "SELECT phc.patient_id FROM public.patient_health_profiles phc WHERE phc.dietitian_id = %(user_id)s"
+    ),
+    'dietitian_active_charts': postgrest(
+        "SELECT dc.id FROM public.diet_charts dc WHERE dc.dietitian_id = %(user_id)s AND dc.status = 'active'"
+    ),
+    'dietitian_charts': postgrest(
+        "SELECT dc.id FROM public.diet_charts dc WHERE dc.dietitian_id = %(user_id)s"
+    ),
+    'patient_charts': postgrest(
+        "SELECT dc.id FROM public.diet_charts dc WHERE dc.patient_id = %(user_id)s"
+    ),
+    'patient_month_logs': postgrest(
+        "SELECT l.id FROM public.food_intake_logs l "
+        "WHERE l.patient_id = %(user_id)s AND l.consumed_at >= %(month_start)s"
+    ),
+    'patient_active_charts': postgrest(
+        "SELECT dc.id FROM public.diet_charts dc WHERE dc.patient_id = %(user_id)s AND dc.status = 'active'"
+    ),
+    'recent_patients': postgrest(
+        "SELECT phc.created_at, row_to_json(p) AS profiles FROM public.patient_health_profiles phc "
+        "LEFT JOIN LATERAL (SELECT profiles_1.full_name FROM public.profiles profiles_1 "
+        "WHERE profiles_1.id = phc.patient_id) p ON TRUE "
+        "WHERE phc.dietitian_id = %(user_id)s ORDER BY phc.created_at DESC LIMIT 3"
+    ),
+    'recent_charts': postgrest(
+        "SELECT dc.updated_at, dc.name, row_to_json(p) AS profiles FROM public.diet_charts dc "
+        "LEFT JOIN LATERAL (SELECT profiles_1.full_name FROM public.profiles profiles_1 "
+        "WHERE profiles_1.id = dc.patient_id) p ON TRUE "
+        "WHERE dc.dietitian_id = %(user_id)s ORDER BY dc.updated_at DESC LIMIT 2"
+    ),
+    'recent_logs': postgrest(
+        "SELECT l.consumed_at, l.meal_type, row_to_json(f) AS food_items FROM public.food_intake_logs l "
+        "INNER JOIN LATERAL (SELECT food_items_1.name FROM public.food_items food_items_1 "
+        "WHERE food_items_1.id = l.food_item_id) f ON TRUE "
+        "WHERE l.patient_id = %(user_id)s ORDER BY l.consumed_at DESC LIMIT 5"
+    ),
+    'patient_list': postgrest(
+        "SELECT phc.patient_id, phc.height, phc.weight, phc.created_at, row_to_json(p) AS profiles "
+        "FROM public.patient_health_profiles phc "
+        "LEFT JOIN LATERAL (SELECT profiles_1.full_name, profiles_1.email, profiles_1.phone "
+        "FROM public.profiles profiles_1 WHERE profiles_1.id = phc.patient_id) p ON TRUE "
+        "WHERE phc.dietitian_id = %(user_id)s ORDER BY phc.created_at DESC"
+    ),
+    # Issued once per row of patient_list
+    'patient_list_charts': postgrest(
+        "SELECT dc.id, dc.status, dc.name FROM public.diet_charts dc "
+        "WHERE dc.patient_id = %(patient_id)s AND dc.dietitian_id = %(user_id)s"
+    ),
+    'diet_charts_by_dietitian': postgrest(
+        "SELECT dc.*, row_to_json(p) AS profiles FROM public.diet_charts dc "
+        "LEFT JOIN LATERAL (SELECT profiles_1.full_name, profiles_1.email FROM public.profiles profiles_1 "
+        "WHERE profiles_1.id = dc.patient_id) p ON TRUE "
+        "WHERE dc.dietitian_id = %(user_id)s ORDER BY dc.created_at DESC"
+    ),
+    'diet_charts_by_patient': postgrest(
+        "SELECT dc.*, row_to_json(p) AS profiles FROM public.diet_charts dc "
+        "LEFT JOIN LATERAL (SELECT profiles_1.full_name, profiles_1.email FROM public.profiles profiles_1 "
+        "WHERE profiles_1.id = dc.patient_id) p ON TRUE "
+        "WHERE dc.patient_id = %(user_id)s ORDER BY dc.created_at DESC"
+    ),
+}
+
+# Candidate rewrites, one round trip each, compared against the methods they replace
+REWRITES = {
+    'dashboard_stats_dietitian_single': (
+        "SELECT (SELECT count(*) FROM public.patient_health_profiles WHERE dietitian_id = %(user_id)s) AS total_patients, "
+        "count(*) FILTER (WHERE status = 'active') AS active_plans, count(*) AS diet_charts "
+        "FROM public.diet_charts WHERE dietitian_id = %(user_id)s"
+    ),
+    'dashboard_stats_patient_single': (
+        "SELECT count(*) AS diet_charts, count(*) FILTER (WHERE status = 'active') AS active_plans, "
+        "(SELECT count(*) FROM public.food_intake_logs "
+        " WHERE patient_id = %(user_id)s AND consumed_at >= %(month_start)s) AS month_logs "
+        "FROM public.diet_charts WHERE patient_id = %(user_id)s"
+    ),
+    'patient_list_single': postgrest(
+        "SELECT phc.patient_id, phc.height, phc.weight, phc.created_at, row_to_json(p) AS profiles, "
+        "coalesce(c.charts, '[]') AS diet_charts "
+        "FROM public.patient_health_profiles phc "
+        "LEFT JOIN LATERAL (SELECT profiles_1.full_name, profiles_1.email, profiles_1.phone "
+        "FROM public.profiles profiles_1 WHERE profiles_1.id = phc.patient_id) p ON TRUE "
+        "LEFT JOIN LATERAL (SELECT json_agg(json_build_object('id', dc.id, 'status', dc.status, 'name', dc.name)) AS charts "
+        "FROM public.diet_charts dc WHERE dc.patient_id = phc.patient_id AND dc.dietitian_id = %(user_id)s) c ON TRUE "
+        "WHERE phc.dietitian_id = %(user_id)s ORDER BY phc.created_at DESC"
+    ),
+}
+
+# RealDataService methods: role and the queries they run in sequence (each
+# starts with the profile lookup in getCurrentUserProfile)
+METHODS = {
+    'getDashboardStats[dietitian]': ('dietitian', ['profile_by_firebase_uid', 'dietitian_patients',
+                                                   'dietitian_active_charts', 'dietitian_charts']),
+    'getDashboardStats[patient]': ('patient', ['profile_by_firebase_uid', 'patient_charts',
+                                               'patient_month_logs', 'patient_active_charts']),
+    'getRecentActivities[dietitian]': ('dietitian', ['profile_by_firebase_uid', 'recent_patients', 'recent_charts']),
+    'getRecentActivities[patient]': ('patient', ['profile_by_firebase_uid', 'recent_logs']),
+    'getPatientList': ('dietitian', ['profile_by_firebase_uid', 'patient_list']),
+    'getDietCharts[dietitian]': ('dietitian', ['profile_by_firebase_uid', 'diet_charts_by_dietitian']),
+    'getDietCharts[patient]': ('patient', ['profile_by_firebase_uid', 'diet_charts_by_patient']),
+}
+
+# Rewrites timed against the method they would replace
+REWRITE_TARGETS = {
+    'dashboard_stats_dietitian_single': 'getDashboardStats[dietitian]',
+    'dashboard_stats_patient_single': 'getDashboardStats[patient]',
+    'patient_list_single': 'getPatientList',
+}
+
+def copy_rows(conn, table, columns, lines):
+    """COPY tab-separated text lines into table, in chunks; returns the row count"""
+    count = 0
+    with conn.cursor() as cursor:
+        with cursor.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            chunk = []
+            for line in lines:
+                chunk.append(line)
+                if len(chunk) >= COPY_CHUNK_ROWS:
+                    copy.write('\n'.join(chunk) + '\n')
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                copy.write('\n'.join(chunk) + '\n')
+                count += len(chunk)
+    return count
+
+def random_timestamps(rng, count, start, days):
+    """count UTC timestamps, as Postgres text, uniformly spread over days from start"""
+    seconds = rng.integers(0, days * 86400, size=count)
+    stamps = (np.datetime64(start, 's') + seconds).astype(str)
+    return [f"{stamp}+00" for stamp in stamps]
+
+def skewed_weights(rng, count, sigma=1.0):
+    """Log-normal activity weights: a few users with much more data than most"""
+    weights = rng.lognormal(0.0, sigma, size=count)
+    return weights / weights.sum()
+
+def load_synthetic_data(conn, num_patients=100_000, num_dietitians=500, num_foods=500, num_logs=5_000_000,
+                        charts_per_patient=2.0, days=365, seed=0):
+    """Bulk-load realistic, skewed synthetic rows with COPY; returns row counts per table"""
+    id_rng = random.Random(seed)
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('now', 'D') - np.timedelta64(days, 'D')
+    counts = {}
+
+    dietitian_ids = [random_uuid(id_rng) for _ in range(num_dietitians)]
+    patient_ids = [random_uuid(id_rng) for _ in range(num_patients)]
+    food_ids = [random_uuid(id_rng) for _ in range(num_foods)]
+
+    with conn.transaction():
+        # Skip triggers (handle_new_user on auth.users) and FK checks while loading
+        conn.execute("SET LOCAL session_replication_role = replica")
+
+        users = [(user_id, f"dietitian{i}@example.com", 'dietitian', f"Dietitian {i}")
+                 for i, user_id in enumerate(dietitian_ids)]
+        users += [(user_id, f"patient{i}@example.com", 'patient', f"Patient {i}")
+                  for i, user_id in enumerate(patient_ids)]
+        counts['auth.users'] = copy_rows(conn, 'auth.users', ('id', 'email'),
+                                         (f"{user_id}\t{email}" for user_id, email, _, _ in users))
+
+        created = random_timestamps(rng, len(users), start, days)
+        counts['profiles'] = copy_rows(
+            conn, 'public.profiles', ('id', 'email', 'full_name', 'role', 'phone', 'firebase_uid', 'created_at'),
+            (f"{user_id}\t{email}\t{name}\t{role}\t+9190000{i:05d}\tfirebase-{user_id}\t{created[i]}"
+             for i, (user_id, email, role, name) in enumerate(users))
+        )
+
+        # Some dietitians look after far more patients than others
+        assigned = rng.choice(num_dietitians, size=num_patients, p=skewed_weights(rng, num_dietitians))
+        heights = rng.uniform(145, 195, size=num_patients)
+        weights = rng.uniform(40, 120, size=num_patients)
+        activity = rng.integers(0, len(ACTIVITY_LEVELS), size=num_patients)
+        created = random_timestamps(rng, num_patients, start, days)
+        counts['patient_health_profiles'] = copy_rows(
+            conn, 'public.patient_health_profiles',
+            ('patient_id', 'dietitian_id', 'height', 'weight', 'activity_level', 'created_at'),
+            (f"{patient_ids[i]}\t{dietitian_ids[assigned[i]]}\t{heights[i]:.2f}\t{weights[i]:.2f}\t"
+             f"{ACTIVITY_LEVELS[activity[i]]}\t{created[i]}" for i in range(num_patients))
+        )
+
+        charts = rng.poisson(charts_per_patient, size=num_patients)
+        chart_patients = np.repeat(np.arange(num_patients), charts)
+        statuses = rng.choice(len(DIET_CHART_STATUSES), size=len(chart_patients), p=DIET_CHART_STATUS_WEIGHTS)
+        targets = rng.uniform(1400, 2800, size=len(chart_patients))
+        created = random_timestamps(rng, len(chart_patients), start, days)
+        updated = random_timestamps(rng, len(chart_patients), start, days)
+        counts['diet_charts'] = copy_rows(
+            conn, 'public.diet_charts',
+            ('patient_id', 'dietitian_id', 'name', 'start_date', 'status', 'target_calories',
+             'created_at', 'updated_at'),
+            (f"{patient_ids[p]}\t{dietitian_ids[assigned[p]]}\tPlan {i}\t{created[i][:10]}\t"
+             f"{DIET_CHART_STATUSES[statuses[i]]}\t{targets[i]:.2f}\t{created[i]}\t{max(created[i], updated[i])}"
+             for i, p in enumerate(chart_patients))
+        )
+
+        nutrients = rng.uniform(0, 50, size=(num_foods, len(NUTRIENT_COLUMNS)))
+        nutrients[:, 0] = rng.uniform(20, 500, size=num_foods)
+        food_names = [FOOD_CATEGORIES[i % len(FOOD_CATEGORIES)] +
+                      (f" {i // len(FOOD_CATEGORIES)}" if i >= len(FOOD_CATEGORIES) else '')
+                      for i in range(num_foods)]
+        counts['food_items'] = copy_rows(
+            conn, 'public.food_items', ('id', 'name', 'category') + NUTRIENT_COLUMNS,
+            ('\t'.join([food_ids[i], food_names[i], 'indian'] + [f"{value:.2f}" for value in nutrients[i]])
+             for i in range(num_foods))
+        )
+
+        # Intake logs: ids come from gen_random_uuid(), activity is skewed per patient
+        activity = skewed_weights(rng, num_patients, sigma=1.2)
+
+        def log_lines():
+            for offset in range(0, num_logs, COPY_CHUNK_ROWS):
+                size = min(COPY_CHUNK_ROWS, num_logs - offset)
+                patients = rng.choice(num_patients, size=size, p=activity)
+                foods = rng.integers(0, num_foods, size=size)
+                quantities = np.round(rng.uniform(0.25, 3.0, size=size), 2)
+                calories = nutrients[foods, 0] * quantities
+                meals = rng.integers(0, len(MEAL_TYPES), size=size)
+                consumed = random_timestamps(rng, size, start, days)
+                for i in range(size):
+                    yield (f"{patient_ids[patients[i]]}\t{food_ids[foods[i]]}\t{quantities[i]:.2f}\t"
+                           f"{MEAL_TYPES[meals[i]]}\t{consumed[i]}\t{calories[i]:.2f}")
+
+        counts['food_intake_logs'] = copy_rows(
+            conn, 'public.food_intake_logs',
+            ('patient_id', 'food_item_id', 'quantity', 'meal_type', 'consumed_at', 'calories_consumed'),
+            log_lines()
+        )
+
+    conn.execute("ANALYZE")
+    return counts
+
+def reset_database(conn):
+    """Drop everything the migrations and loader created"""
+    conn.execute("DROP SCHEMA IF EXISTS public CASCADE")
+    conn.execute("CREATE SCHEMA public")
+    conn.execute("DROP SCHEMA IF EXISTS auth, supabase_migrations CASCADE")
+
+def sample_users(conn, role, count, seed=0):
+    """(profile id, firebase uid) of random users with the given role"""
+    conn.execute("SELECT setseed(%s)", (((seed % 1000) / 1000.0),))
+    return conn.execute(
+        "SELECT id, firebase_uid FROM public.profiles WHERE role = %s ORDER BY random() LIMIT %s",
+        (role, count)
+    ).fetchall()
+
+def heaviest_users(conn):
+    """The dietitian with the most patients and the patient with the most logs, for EXPLAIN"""
+    dietitian = conn.execute(
+        "SELECT p.id, p.firebase_uid FROM public.profiles p JOIN "
+        "(SELECT dietitian_id, count(*) AS n FROM public.patient_health_profiles GROUP BY dietitian_id "
+        " ORDER BY n DESC LIMIT 1) top ON top.dietitian_id = p.id"
+    ).fetchone()
+    patient = conn.execute(
+        "SELECT p.id, p.firebase_uid FROM public.profiles p JOIN "
+        "(SELECT patient_id, count(*) AS n FROM public.food_intake_logs GROUP BY patient_id "
+        " ORDER BY n DESC LIMIT 1) top ON top.patient_id = p.id"
+    ).fetchone()
+    return {'dietitian': dietitian, 'patient': patient}
+
+def query_params(user, month, patient_id=None):
+    user_id, firebase_uid = user
+    return {'user_id': user_id, 'firebase_uid': firebase_uid, 'month_start': month,
+            'patient_id': patient_id}
+
+def timed_query(conn, sql, params):
+    """Run a query and fetch everything; returns (milliseconds, rows)"""
+    start = time.perf_counter()
+    rows = conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) * 1000, rows
+
+def run_method(conn, name, user, month, query_times):
+    """Replay one RealDataService method for user; returns total ms and round trips"""
+    _, query_names = METHODS[name]
+    params = query_params(user, month)
+    total_ms, round_trips = 0.0, 0
+    for query_name in query_names:
+        elapsed, rows = timed_query(conn, QUERIES[query_name], params)
+        query_times.setdefault(query_name, []).append(elapsed)
+        total_ms += elapsed
+        round_trips += 1
+
+        if query_name == 'patient_list':
+            # getPatientList fetches each patient's diet charts separately
+            for patient in rows[0][0]:
+                elapsed, _ = timed_query(conn, QUERIES['patient_list_charts'],
+                                         query_params(user, month, patient['patient_id']))
+                query_times.setdefault('patient_list_charts', []).append(elapsed)
+                total_ms += elapsed
+                round_trips += 1
+    return total_ms, round_trips
+
+def latency_stats(values):
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        'count': int(values.size),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'max_ms': round(float(values.max()), 3),
+    }
+
+def month_start():
+    """Start of the current month (UTC), the cutoff getDashboardStats counts logs from"""
+    return np.datetime64('now', 'M').astype('datetime64[s]').astype(str) + '+00'
+
+def benchmark(conn, iterations=200, seed=0):
+    """Replay every method and rewrite for sampled users; returns latency stats"""
+    month = month_start()
+    users = {role: sample_users(conn, role, iterations, seed) for role in ('dietitian', 'patient')}
+    query_times, method_report = {}, {}
+
+    for name, (role, _) in METHODS.items():
+        # One unmeasured pass to warm the plan and buffer caches
+        run_method(conn, name, users[role][0], month, {})
+        totals, trips = [], []
+        for user in users[role]:
+            total_ms, round_trips = run_method(conn, name, user, month, query_times)
+            totals.append(total_ms)
+            trips.append(round_trips)
+        method_report[name] = {**latency_stats(totals), 'mean_round_trips': round(float(np.mean(trips)), 1)}
+
+    rewrite_report = {}
+    for name, sql in REWRITES.items():
+        role, _ = METHODS[REWRITE_TARGETS[name]]
+        timed_query(conn, sql, query_params(users[role][0], month))
+        times = [timed_query(conn, sql, query_params(user, month))[0] for user in users[role]]
+        rewrite_report[name] = {**latency_stats(times), 'replaces': REWRITE_TARGETS[name]}
+
+    return {
+        'methods': method_report,
+        'queries': {name: latency_stats(times) for name, times in query_times.items()},
+        'rewrites': rewrite_report,
+    }
+
+def plan_nodes(plan):
+    """Flatten an EXPLAIN (FORMAT JSON) plan tree"""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+def query_role(name):
+    """Role of the users a query or rewrite runs for"""
+    if name in REWRITE_TARGETS:
+        return METHODS[REWRITE_TARGETS[name]][0]
+    if name == 'patient_list_charts':
+        return 'dietitian'
+    return next(role for role, queries in METHODS.values() if name in queries)
+
+def explain_queries(conn, month):
+    """EXPLAIN (ANALYZE, BUFFERS) every query for the heaviest dietitian and patient"""
+    import psycopg
+
+    heaviest = heaviest_users(conn)
+    # Bind parameters client-side so EXPLAIN sees literal values, like a custom plan
+    cursor = psycopg.ClientCursor(conn)
+    plans = {}
+    for name, sql in list(QUERIES.items()) + list(REWRITES.items()):
+        user = heaviest[query_role(name)]
+        patient_id = None
+        if name == 'patient_list_charts':
+            patient_id = conn.execute("SELECT patient_id FROM public.patient_health_profiles "
+                                      "WHERE dietitian_id = %s LIMIT 1", (user[0],)).fetchone()[0]
+        params = query_params(user, month, patient_id)
+
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0][0]
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", params)
+        text = '\n'.join(row[0] for row in cursor.fetchall())
+
+        nodes = list(plan_nodes(plan['Plan']))
+        plans[name] = {
+            'execution_ms': plan.get('Execution Time'),
+            'planning_ms': plan.get('Planning Time'),
+            'seq_scans': sorted({node['Relation Name'] for node in nodes
+                                 if node['Node Type'] == 'Seq Scan' and node.get('Relation Name') in LARGE_TABLES}),
+            'sorts': sum(node['Node Type'] == 'Sort' for node in nodes),
+            'shared_blocks_read': plan['Plan'].get('Shared Read Blocks', 0),
+            'plan': text,
+        }
+    return plans
+
+def print_report(report):
+    print("\n📊 RealDataService methods (ms per call, all round trips)")
+    print(f"   {'method':34s} {'p50':>9s} {'p95':>9s} {'max':>9s} {'trips':>7s}")
+    for name, stats in report['methods'].items():
+        print(f"   {name:34s} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['max_ms']:9.2f} "
+              f"{stats['mean_round_trips']:7.1f}")
+
+    print("\n🔎 Queries (ms per execution)")
+    for name, stats in report['queries'].items():
+        print(f"   {name:34s} {stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['max_ms']:9.2f}")
+
+    print("\n🔁 Single-query rewrites")
+    for name, stats in report['rewrites'].items():
+        original = report['methods'][stats['replaces']]
+        speedup = original['p50_ms'] / max(stats['p50_ms'], 1e-6)
+        print(f"   {name:34s} p50 {stats['p50_ms']:8.2f} ms vs {original['p50_ms']:8.2f} ms "
+              f"({speedup:.1f}x, replaces {stats['replaces']})")
+
+    plans = report.get('plans', {})
+    if plans:
+        print("\n🧭 EXPLAIN for the heaviest dietitian / patient")
+        for name, plan in plans.items():
+            warning = ''
+            if plan['seq_scans']:
+                warning = f"  ⚠️  Seq Scan on {', '.join(plan['seq_scans'])}"
+            print(f"   {name:34s} {plan['execution_ms']:9.2f} ms, {plan['sorts']} sort(s), "
+                  f"{plan['shared_blocks_read']} blocks read{warning}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load synthetic data into the Supabase schema and benchmark RealDataService queries")
+    parser.add_argument("--db", required=True, help="postgresql:// URL of a local database")
+    parser.add_argument("--reset", action="store_true",
+                        help="Drop the public, auth and supabase_migrations schemas first (destroys their data)")
+    parser.add_argument("--load", action="store_true", help="Bulk-load synthetic data before benchmarking")
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--dietitians", type=int, default=500)
+    parser.add_argument("--foods", type=int, default=500)
+    parser.add_argument("--logs", type=int, default=5_000_000)
+    parser.add_argument("--charts-per-patient", type=float, default=2.0)
+    parser.add_argument("--days", type=int, default=365, help="Days of history to spread timestamps over")
+    parser.add_argument("--iterations", type=int, default=200, help="Users sampled per method")
+    parser.add_argument("--no-explain", action="store_true", help="Skip EXPLAIN (ANALYZE, BUFFERS)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--report", default="db_benchmark.json", help="JSON report with latencies and plans")
+    args = parser.parse_args()
+
+    print("🐘 Supabase Schema Query Benchmark")
+    print("=" * 50)
+
+    if not is_postgres_url(args.db):
+        print("❌ --db must be a postgresql:// URL")
+        sys.exit(1)
+
+    conn = connect(args.db)
+    conn.autocommit = True
+
+    if args.reset:
+        print("🧹 Dropping public, auth and supabase_migrations schemas")
+        reset_database(conn)
+
+    applied = apply_migrations(conn)
+    print(f"📜 Migrations applied: {len(applied)}" + (f" ({', '.join(applied)})" if applied else " (up to date)"))
+
+    if args.load:
+        print(f"\n📥 Loading {args.patients:,} patients, {args.dietitians:,} dietitians, {args.logs:,} intake logs")
+        start = time.perf_counter()
+        counts = load_synthetic_data(conn, args.patients, args.dietitians, args.foods, args.logs,
+                                     args.charts_per_patient, args.days, args.seed)
+        elapsed = time.perf_counter() - start
+        for table, count in counts.items():
+            print(f"   {table:26s} {count:>12,} rows")
+        print(f"   Loaded in {elapsed:.1f} s ({sum(counts.values()) / elapsed:,.0f} rows/s)")
+
+    print(f"\n⏱️  Replaying queries for {args.iterations} users per method...")
+    report = benchmark(conn, args.iterations, args.seed)
+    if not args.no_explain:
+        report['plans'] = explain_queries(conn, month_start())
+    report['table_rows'] = {
+        table: conn.execute(f"SELECT count(*) FROM public.{table}").fetchone()[0] for table in LARGE_TABLES
+    }
+    print_report(report)
+
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\n💾 Report saved as: {args.report}")
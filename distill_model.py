@@ -0,0 +1,255 @@
+# Knowledge Distillation for the Food Classifier
+# Trains a compact student (MobileNetV3-Small or a tiny separable CNN) on the
+# existing MobileNetV2 model's soft predictions plus the true labels, then
+# exports it through the same TFLite conversion recipes and reports size,
+# latency and top-1/top-3 accuracy against the teacher.
+
+import argparse
+import json
+import sys
+
+import tensorflow as tf
+
+from benchmark_model import benchmark_models
+from convert_model import VARIANT_RECIPES, add_preprocessing, apply_recipe, make_representative_data_gen
+from food_model_utils import (
+    list_class_images, load_class_labels, load_labeled_images, normalize_image, predict_tflite, stratified_sample
+)
+from parity_check import top_k_accuracy, top_k_agreement
+from training_data import load_image_dataset
+
+# What the student has to hit to replace the teacher on low-end phones
+TARGET_SIZE_MB = 1.0
+TARGET_P50_MS = 10.0
+
+def build_mobilenetv3_student(num_classes, img_size=160, alpha=0.75, weights='imagenet', minimalistic=False):
+    """MobileNetV3-Small backbone with a linear classifier (outputs logits)"""
+    # Keras only ships minimalistic ImageNet weights for alpha 1.0
+    if minimalistic and weights == 'imagenet' and alpha != 1.0:
+        raise ValueError(f"No ImageNet weights for minimalistic MobileNetV3-Small at alpha {alpha:g}, "
+                         f"use alpha 1.0 or random weights")
+    backbone = tf.keras.applications.MobileNetV3Small(
+        input_shape=(img_size, img_size, 3),
+        alpha=alpha,
+        minimalistic=minimalistic,
+        include_top=False,
+        weights=weights,
+        pooling='avg',
+        # Inputs are already scaled to [-1, 1] like the teacher's
+        include_preprocessing=False
+    )
+    inputs = tf.keras.Input(shape=(img_size, img_size, 3))
+    x = backbone(inputs)
+    x = tf.keras.layers.Dropout(0.2)(x)
+    outputs = tf.keras.layers.Dense(num_classes, name='logits')(x)
+    variant = 'small_minimalistic' if minimalistic else 'small'
+    return tf.keras.Model(inputs, outputs, name=f'student_mobilenetv3_{variant}_{alpha:g}_{img_size}')
+
+def build_tiny_cnn_student(num_classes, img_size=128, widths=(32, 64, 128, 256)):
+    """Stack of stride-2 depthwise-separable blocks, roughly 100k parameters"""
+    inputs = tf.keras.Input(shape=(img_size, img_size, 3))
+    x = tf.keras.layers.Conv2D(widths[0], 3, strides=2, padding='same', use_bias=False)(inputs)
+    x = tf.keras.layers.BatchNormalization()(x)
+    x = tf.keras.layers.ReLU(6.0)(x)
+    for width in widths:
+        x = tf.keras.layers.SeparableConv2D(width, 3, strides=2, padding='same', use_bias=False)(x)
+        x = tf.keras.layers.BatchNormalization()(x)
+        x = tf.keras.layers.ReLU(6.0)(x)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    x = tf.keras.layers.Dropout(0.2)(x)
+    outputs = tf.keras.layers.Dense(num_classes, name='logits')(x)
+    return tf.keras.Model(inputs, outputs, name=f'student_tiny_cnn_{img_size}')
+
+STUDENTS = {
+    'mobilenetv3_small': build_mobilenetv3_student,
+    'tiny_cnn': build_tiny_cnn_student,
+}
+
+class Distiller(tf.keras.Model):
+    """Trains the student on hard labels plus temperature-softened teacher outputs
+
+    Batches come at the teacher's resolution so its soft targets are computed
+    on sharp images; the student sees them downscaled to its own input size.
+    """
+
+    def __init__(self, student, teacher, temperature=4.0, alpha=0.3):
+        super().__init__()
+        self.student = student
+        self.teacher = teacher
+        self.teacher.trainable = False
+        self.temperature = temperature
+        # Weight of the hard-label loss; the rest goes to the distillation loss
+        self.alpha = alpha
+        self.student_loss_fn = tf.keras.losses.CategoricalCrossentropy(from_logits=True)
+        self.distillation_loss_fn = tf.keras.losses.KLDivergence()
+        self.student_size = student.input_shape[1]
+
+    def call(self, x, training=False):
+        if x.shape[1] != self.student_size:
+            x = tf.image.resize(x, (self.student_size, self.student_size))
+        return self.student(x, training=training)
+
+    def compute_loss(self, x=None, y=None, y_pred=None, sample_weight=None, **kwargs):
+        # The teacher ends in softmax, log-probabilities are its logits up to a constant
+        teacher_logits = tf.math.log(tf.clip_by_value(self.teacher(x, training=False), 1e-7, 1.0))
+
+        student_loss = self.student_loss_fn(y, y_pred)
+        distillation_loss = self.distillation_loss_fn(
+            tf.nn.softmax(teacher_logits / self.temperature),
+            tf.nn.softmax(y_pred / self.temperature)
+        ) * self.temperature ** 2
+        return self.alpha * student_loss + (1 - self.alpha) * distillation_loss
+
+def distill(teacher, student, train_ds, val_ds=None, epochs=10, learning_rate=1e-3,
+            temperature=4.0, alpha=0.3):
+    """Train the student against the teacher and return it with a softmax output"""
+    distiller = Distiller(student, teacher, temperature, alpha)
+    distiller.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        metrics=['accuracy']
+    )
+    callbacks = [tf.keras.callbacks.ReduceLROnPlateau(monitor='loss', factor=0.5, patience=2)]
+    distiller.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=callbacks, verbose=2)
+
+    # Same output contract as the teacher: class probabilities
+    outputs = tf.keras.layers.Softmax(name='probabilities')(student.output)
+    return tf.keras.Model(student.input, outputs, name=student.name)
+
+def export_student(model, tflite_path, variant='dynamic_int8', calibration_samples=None,
+                   fused_preprocessing=False):
+    """Convert the student with one of the standard conversion recipes"""
+    recipe = VARIANT_RECIPES[variant]
+    representative_dataset = None
+    if recipe.get('representative_dataset'):
+        # Full-integer models already take uint8 input with the normalization in the input scale
+        if fused_preprocessing:
+            raise ValueError("Fused preprocessing only applies to float and dynamic-range variants")
+        representative_dataset = make_representative_data_gen(calibration_samples,
+                                                              img_size=model.input_shape[1])
+    if fused_preprocessing:
+        model = add_preprocessing(model)
+    converter = apply_recipe(tf.lite.TFLiteConverter.from_keras_model(model), recipe,
+                             representative_dataset)
+    with open(tflite_path, 'wb') as f:
+        f.write(converter.convert())
+    return tflite_path
+
+def compare_with_teacher(teacher, student_path, student_img_size, eval_dir, class_names,
+                         samples_per_class=25, runs=50):
+    """Size, latency and accuracy of the student next to the teacher"""
+    timing = benchmark_models([student_path], max_threads=1, batch_sizes=(1,), runs=runs,
+                              xnnpack_modes=(True,))[0]
+    if 'error' in timing:
+        raise RuntimeError(f"Benchmark failed: {timing['error']}")
+
+    teacher_images, labels, _ = load_labeled_images(eval_dir, samples_per_class,
+                                                    teacher.input_shape[1], class_names)
+    teacher_probs = teacher.predict(normalize_image(teacher_images), verbose=0)
+
+    student_images = load_labeled_images(eval_dir, samples_per_class, student_img_size, class_names)[0]
+    student_probs = predict_tflite(student_path, student_images)
+
+    return {
+        'student': student_path,
+        'size_mb': timing['model_size_mb'],
+        'p50_ms': timing['latency']['p50_ms'],
+        'p90_ms': timing['latency']['p90_ms'],
+        'teacher_top1_accuracy': top_k_accuracy(labels, teacher_probs, 1),
+        'teacher_top3_accuracy': top_k_accuracy(labels, teacher_probs, 3),
+        'student_top1_accuracy': top_k_accuracy(labels, student_probs, 1),
+        'student_top3_accuracy': top_k_accuracy(labels, student_probs, 3),
+        'top1_agreement': top_k_agreement(teacher_probs, student_probs, 1),
+        'top3_agreement': top_k_agreement(teacher_probs, student_probs, 3),
+        'images': int(len(labels)),
+    }
+
+def print_comparison(report, max_top3_drop):
+    print(f"\n{'':<10}{'Top1 acc':>10}{'Top3 acc':>10}")
+    print(f"{'Teacher':<10}{report['teacher_top1_accuracy']:>10.3f}{report['teacher_top3_accuracy']:>10.3f}")
+    print(f"{'Student':<10}{report['student_top1_accuracy']:>10.3f}{report['student_top3_accuracy']:>10.3f}")
+    print(f"\n   Agreement with teacher: top-1 {report['top1_agreement']:.3f} | top-3 {report['top3_agreement']:.3f}")
+    print(f"   Student size: {report['size_mb']:.2f} MB (target < {TARGET_SIZE_MB} MB)")
+    print(f"   Student latency: p50 {report['p50_ms']:.2f} ms | p90 {report['p90_ms']:.2f} ms "
+          f"(target < {TARGET_P50_MS} ms)")
+
+    top3_drop = report['teacher_top3_accuracy'] - report['student_top3_accuracy']
+    report['targets_met'] = {
+        'size': report['size_mb'] < TARGET_SIZE_MB,
+        'latency': report['p50_ms'] < TARGET_P50_MS,
+        'top3_accuracy': top3_drop <= max_top3_drop,
+    }
+    for name, met in report['targets_met'].items():
+        print(f"   {'✅' if met else '⚠️ '} {name}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Distill the food classifier into a small student model")
+    parser.add_argument("--teacher", default="food_classifier_final.h5", help="Teacher Keras/H5 model")
+    parser.add_argument("--train-dir", required=True, help="Training images, one folder per class")
+    parser.add_argument("--eval-dir", required=True, help="Held-out images, one folder per class")
+    parser.add_argument("--student", default="mobilenetv3_small", choices=list(STUDENTS))
+    parser.add_argument("--img-size", type=int, default=160, help="Student input resolution")
+    parser.add_argument("--alpha", type=float, default=0.75, help="MobileNetV3 width multiplier")
+    parser.add_argument("--minimalistic", action="store_true",
+                        help="MobileNetV3 without SE blocks and hard-swish (ImageNet weights need --alpha 1.0)")
+    parser.add_argument("--no-pretrained", action="store_true",
+                        help="Start the MobileNetV3 student from random weights instead of ImageNet")
+    parser.add_argument("--epochs", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--temperature", type=float, default=4.0, help="Softmax temperature for soft targets")
+    parser.add_argument("--label-weight", type=float, default=0.3,
+                        help="Weight of the hard-label loss (1 - this goes to the teacher)")
+    parser.add_argument("--variant", default="dynamic_int8", choices=list(VARIANT_RECIPES),
+                        help="TFLite conversion recipe")
+    parser.add_argument("--fused-preprocessing", action="store_true",
+                        help="Student takes raw uint8 images (see convert_model.py)")
+    parser.add_argument("--eval-samples-per-class", type=int, default=25)
+    parser.add_argument("--max-top3-drop", type=float, default=0.02,
+                        help="Allowed top-3 accuracy drop versus the teacher")
+    parser.add_argument("--output", default="food_classifier_student.tflite", help="Student TFLite path")
+    parser.add_argument("--report", default="distill_report.json", help="JSON report path")
+    args = parser.parse_args()
+    if args.fused_preprocessing and VARIANT_RECIPES[args.variant].get('representative_dataset'):
+        parser.error(f"--fused-preprocessing cannot be combined with --variant {args.variant}")
+    if args.minimalistic and not args.no_pretrained and args.alpha != 1.0:
+        parser.error("--minimalistic ImageNet weights only exist for --alpha 1.0 (or pass --no-pretrained)")
+
+    print("🎓 Food Classifier Distillation")
+    print("=" * 50)
+
+    class_names = load_class_labels()
+    teacher = tf.keras.models.load_model(args.teacher)
+    print(f"👩‍🏫 Teacher: {args.teacher} ({teacher.count_params():,} params)")
+
+    if args.student == 'mobilenetv3_small':
+        student = build_mobilenetv3_student(len(class_names), args.img_size, args.alpha,
+                                            None if args.no_pretrained else 'imagenet', args.minimalistic)
+    else:
+        student = build_tiny_cnn_student(len(class_names), args.img_size)
+    print(f"🧑‍🎓 Student: {student.name} ({student.count_params():,} params)")
+
+    # Decoded at the teacher's resolution, the Distiller downscales for the student
+    train_ds, val_ds = load_image_dataset(args.train_dir, class_names, teacher.input_shape[1], args.batch_size,
+                                          validation_split=0.1)
+    student = distill(teacher, student, train_ds, val_ds, args.epochs, args.learning_rate,
+                      args.temperature, args.label_weight)
+
+    calibration_samples = None
+    if VARIANT_RECIPES[args.variant].get('representative_dataset'):
+        calibration_samples = stratified_sample(list_class_images(args.train_dir, class_names), 10)
+    export_student(student, args.output, args.variant, calibration_samples, args.fused_preprocessing)
+    print(f"✅ Student TensorFlow Lite model saved as: {args.output}")
+
+    report = compare_with_teacher(teacher, args.output, args.img_size, args.eval_dir, class_names,
+                                  args.eval_samples_per_class)
+    print_comparison(report, args.max_top3_drop)
+
+    report.update({'teacher': args.teacher, 'student_architecture': student.name,
+                   'student_params': int(student.count_params()), 'variant': args.variant,
+                   'temperature': args.temperature, 'label_weight': args.label_weight})
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Distillation report saved to: {args.report}")
+
+    if not all(report['targets_met'].values()):
+        sys.exit(1)
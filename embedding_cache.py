@@ -0,0 +1,214 @@
+# Cached Backbone Embeddings for Head Retraining
+# The MobileNetV2 backbone is frozen, so its pooled 1280-d output for an image
+# never changes. This runs the backbone once per image, stores the embeddings
+# in a memory-mapped float16 .npy keyed by image content hash, and trains and
+# evaluates the Dense head straight from the cache. Only new images get embedded.
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tensorflow as tf
+
+from conversion_cache import hash_file
+from food_model_utils import list_class_images, load_class_labels
+from training_data import AUTOTUNE, decode_and_normalize, split_class_images
+
+DEFAULT_EMBEDDING_CACHE_DIR = 'embedding_cache'
+EMBEDDINGS_FILE = 'embeddings.npy'
+INDEX_FILE = 'index.json'
+
+class EmbeddingCache:
+    """Float16 embeddings in a memory-mapped .npy, one row per image content hash"""
+
+    def __init__(self, cache_dir, dim):
+        self.cache_dir = cache_dir
+        self.array_path = os.path.join(cache_dir, EMBEDDINGS_FILE)
+        self.index_path = os.path.join(cache_dir, INDEX_FILE)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.index = {'dim': dim, 'count': 0, 'rows': {}}
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        if self.index['dim'] != dim:
+            raise ValueError(f"{cache_dir} holds {self.index['dim']}-d embeddings, expected {dim}-d")
+
+        self.embeddings = None
+        if os.path.exists(self.array_path):
+            self.embeddings = np.load(self.array_path, mmap_mode='r+')
+
+    def __len__(self):
+        return self.index['count']
+
+    def __contains__(self, key):
+        return key in self.index['rows']
+
+    def _reserve(self, extra):
+        """Grow the backing file (doubling) so extra more rows fit"""
+        capacity = 0 if self.embeddings is None else self.embeddings.shape[0]
+        needed = self.index['count'] + extra
+        if needed <= capacity:
+            return
+
+        staging_path = self.array_path + '.tmp'
+        grown = np.lib.format.open_memmap(staging_path, mode='w+', dtype=np.float16,
+                                          shape=(max(needed, 2 * capacity, 1024), self.index['dim']))
+        if self.embeddings is not None:
+            grown[:self.index['count']] = self.embeddings[:self.index['count']]
+        grown.flush()
+        del grown
+        self.embeddings = None
+        os.replace(staging_path, self.array_path)
+        self.embeddings = np.load(self.array_path, mmap_mode='r+')
+
+    def add(self, keys, vectors):
+        """Append embeddings for keys not already cached"""
+        self._reserve(len(keys))
+        start = self.index['count']
+        self.embeddings[start:start + len(keys)] = np.asarray(vectors, dtype=np.float16)
+        for offset, key in enumerate(keys):
+            self.index['rows'][key] = start + offset
+        self.index['count'] = start + len(keys)
+
+    def get(self, keys):
+        """Embeddings for keys as a float32 array, in order"""
+        rows = [self.index['rows'][key] for key in keys]
+        return np.asarray(self.embeddings[rows], dtype=np.float32)
+
+    def save(self):
+        """Flush the array, then atomically replace the index"""
+        if self.embeddings is not None:
+            self.embeddings.flush()
+        staging_path = self.index_path + '.tmp'
+        with open(staging_path, 'w') as f:
+            json.dump(self.index, f)
+        os.replace(staging_path, self.index_path)
+
+def split_classifier(model):
+    """(feature_extractor, head) sharing layers with a backbone + GlobalAveragePooling2D + head model
+
+    Training the head trains the original model's head layers in place.
+    """
+    layers = [layer for layer in model.layers if not isinstance(layer, tf.keras.layers.InputLayer)]
+    pool_index = next((i for i, layer in enumerate(layers)
+                       if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D)), None)
+    if pool_index is None:
+        raise ValueError("Model has no GlobalAveragePooling2D layer to cut at")
+
+    inputs = tf.keras.Input(shape=model.input_shape[1:])
+    x = inputs
+    for layer in layers[:pool_index + 1]:
+        x = layer(x)
+    feature_extractor = tf.keras.Model(inputs, x, name='feature_extractor')
+
+    head_inputs = tf.keras.Input(shape=(x.shape[-1],))
+    x = head_inputs
+    for layer in layers[pool_index + 1:]:
+        x = layer(x)
+    return feature_extractor, tf.keras.Model(head_inputs, x, name='head')
+
+def backbone_fingerprint(feature_extractor):
+    """Hash of the backbone weights and input size, so each backbone gets its own cache"""
+    digest = hashlib.sha256(str(feature_extractor.input_shape).encode())
+    for weights in feature_extractor.get_weights():
+        digest.update(np.ascontiguousarray(weights).tobytes())
+    return digest.hexdigest()[:16]
+
+def hash_images(paths, workers=8):
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(hash_file, paths))
+
+def embed_images(feature_extractor, paths, batch_size=64):
+    """Run the backbone over image files with the training preprocessing"""
+    img_size = feature_extractor.input_shape[1]
+    dataset = tf.data.Dataset.from_tensor_slices(paths)
+    dataset = dataset.map(lambda path: decode_and_normalize(tf.io.read_file(path), img_size),
+                          num_parallel_calls=AUTOTUNE)
+    return feature_extractor.predict(dataset.batch(batch_size).prefetch(AUTOTUNE), verbose=0)
+
+def update_cache(cache, feature_extractor, paths, batch_size=64):
+    """Embed images missing from the cache; returns the content hash of every path"""
+    keys = hash_images(paths)
+    missing = {}
+    for path, key in zip(paths, keys):
+        if key not in cache and key not in missing:
+            missing[key] = path
+
+    print(f"🧠 {len(paths) - len(missing)} images cached, {len(missing)} to embed")
+    if missing:
+        start = time.perf_counter()
+        vectors = embed_images(feature_extractor, list(missing.values()), batch_size)
+        cache.add(list(missing), vectors)
+        cache.save()
+        elapsed = time.perf_counter() - start
+        print(f"   Embedded {len(missing)} images in {elapsed:.1f} s ({len(missing) / elapsed:.0f} images/s)")
+    return keys
+
+def train_head(head, train_x, train_y, val_x=None, val_y=None, epochs=20, batch_size=64,
+               learning_rate=1e-3):
+    """Fit the head on cached embeddings (one-hot labels)"""
+    head.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                 loss='categorical_crossentropy', metrics=['accuracy'])
+    validation_data = (val_x, val_y) if val_x is not None and len(val_x) else None
+    callbacks = [tf.keras.callbacks.EarlyStopping(
+        monitor='val_accuracy' if validation_data else 'accuracy', patience=5, restore_best_weights=True
+    )]
+    return head.fit(train_x, train_y, validation_data=validation_data, epochs=epochs,
+                    batch_size=batch_size, callbacks=callbacks, verbose=2).history
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the classification head from cached backbone embeddings")
+    parser.add_argument("--data-dir", required=True, help="Images, one folder per class")
+    parser.add_argument("--model", default="food_classifier_final.h5",
+                        help="Keras/H5 model whose backbone is embedded and head retrained")
+    parser.add_argument("--cache-dir", default=DEFAULT_EMBEDDING_CACHE_DIR)
+    parser.add_argument("--validation-split", type=float, default=0.1)
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--extract-only", action="store_true", help="Only update the embedding cache")
+    parser.add_argument("--output", default="food_classifier_head_trained.h5", help="Output H5 model path")
+    args = parser.parse_args()
+
+    print("🧊 Food Classifier Head Training from Cached Embeddings")
+    print("=" * 50)
+
+    class_names = load_class_labels()
+    model = tf.keras.models.load_model(args.model)
+    feature_extractor, head = split_classifier(model)
+    fingerprint = backbone_fingerprint(feature_extractor)
+    cache = EmbeddingCache(os.path.join(args.cache_dir, fingerprint), feature_extractor.output_shape[-1])
+    print(f"📂 Cache: {cache.cache_dir} ({len(cache)} embeddings)")
+
+    train, validation = split_class_images(list_class_images(args.data_dir, class_names),
+                                           args.validation_split)
+    if not train:
+        print(f"❌ No training images found in: {args.data_dir}")
+        sys.exit(1)
+    samples = train + validation
+    keys = update_cache(cache, feature_extractor, [path for path, _ in samples], args.batch_size)
+    if args.extract_only:
+        sys.exit(0)
+
+    embeddings = cache.get(keys)
+    labels = tf.keras.utils.to_categorical([label for _, label in samples], len(class_names))
+    train_x, train_y = embeddings[:len(train)], labels[:len(train)]
+    val_x, val_y = embeddings[len(train):], labels[len(train):]
+
+    start = time.perf_counter()
+    history = train_head(head, train_x, train_y, val_x, val_y, args.epochs, args.batch_size,
+                         args.learning_rate)
+    print(f"\n⏱️  Head trained in {time.perf_counter() - start:.1f} s")
+    if len(val_x):
+        loss, accuracy = head.evaluate(val_x, val_y, verbose=0)
+        print(f"   Validation accuracy: {accuracy:.3f} (loss {loss:.3f})")
+
+    # The head shares its layers with the full model
+    model.save(args.output)
+    print(f"💾 Model with retrained head saved as: {args.output}")
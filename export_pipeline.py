@@ -0,0 +1,630 @@
+# Staged Model Export Pipeline
+# One load -> repair -> compress -> convert -> verify -> publish flow behind
+# convert_model.py, fix_and_convert_model.py and create_fresh_model.py. The
+# Keras model stays in memory from stage to stage and is converted from a
+# concrete function, so the .h5 is loaded once and no temporary SavedModel is
+# written. Each stage output is cached under .export_pipeline/ with a key
+# covering its input and settings: unchanged stages are skipped, and
+# `--stages convert` reruns only the conversion from the cached model.
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import sys
+import time
+
+import tensorflow as tf
+
+from conversion_cache import ConversionCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_CACHE_MB, hash_file, hash_source
+from convert_model import (
+    FLOAT16_RECIPE, INT8_RECIPE, RELAXED_RECIPE, VARIANT_RECIPES, add_preprocessing, apply_recipe,
+    check_ops, make_representative_data_gen, select_calibration_samples, test_tflite_model
+)
+from create_fresh_model import build_model
+from fix_and_convert_model import build_fixed_model
+from food_model_utils import IMG_SIZE, load_class_labels, runtime_profile_path
+from model_compression import COMPRESSED_RECIPE, use_legacy_keras
+from model_history import ASSETS_MODEL_PATH, DEFAULT_EVAL_DIR, DEFAULT_HISTORY, check_deployed, record_model
+
+STAGES = ('load', 'repair', 'compress', 'convert', 'verify', 'publish')
+REPAIR_MODES = ('auto', 'rebuild', 'none')
+DEFAULT_WORK_DIR = '.export_pipeline'
+ASSETS_DIR = os.path.dirname(ASSETS_MODEL_PATH)
+
+# Float model recipe and the one retried if it fails to convert
+CONVERSION_RECIPES = {
+    'fp16': (FLOAT16_RECIPE, RELAXED_RECIPE),
+    'dynamic_int8': (RELAXED_RECIPE, None),
+    'fp32': (VARIANT_RECIPES['fp32'], None),
+    'compressed': (COMPRESSED_RECIPE, None),
+}
+
+# Strict variants: TFLite builtin kernels only, so the app never needs the
+# Flex delegate. Conversion fails instead of silently adding Flex ops.
+BUILTINS_ONLY = {'supported_ops': ['TFLITE_BUILTINS'], 'allow_custom_ops': False}
+
+def conversion_recipes(variant='fp16', builtins_only=False):
+    """(recipe, fallback recipe) for the float model, optionally without Flex/custom ops"""
+    recipe, fallback = CONVERSION_RECIPES[variant]
+    if builtins_only:
+        recipe = {**recipe, **BUILTINS_ONLY}
+        fallback = {**fallback, **BUILTINS_ONLY} if fallback else None
+    return recipe, fallback
+
+def model_runs(model):
+    """True if the model runs a dummy batch, i.e. it needs no repair"""
+    try:
+        model(tf.random.normal([1] + list(model.input_shape[1:])))
+        return True
+    except Exception as e:
+        print(f"⚠️  Model test failed: {e}")
+        return False
+
+def load_keras_model(h5_path, repair='auto', num_classes=None):
+    """Load an H5 model the way the load and repair stages do, without the stage cache
+
+    'rebuild' never deserializes the H5 model: the fixed architecture is built
+    in code and the weights are streamed from the file.
+    """
+    if repair not in REPAIR_MODES:
+        raise ValueError(f"Unknown repair mode: {repair} (choose from {', '.join(REPAIR_MODES)})")
+    num_classes = num_classes or len(load_class_labels())
+    if repair != 'rebuild':
+        print(f"📂 Loading {h5_path}")
+        try:
+            model = tf.keras.models.load_model(h5_path, compile=False)
+        except Exception as e:
+            if repair == 'none':
+                raise
+            print(f"⚠️  Keras could not load the model: {e}")
+        else:
+            if repair == 'none' or model_runs(model):
+                return model
+    print("Rebuilding the architecture from the H5 weights...")
+    return build_fixed_model(h5_path, num_classes)
+
+def concrete_function(model):
+    """Inference concrete function of a Keras model with a dynamic batch dimension"""
+    model_input = model.inputs[0]
+    spec = tf.TensorSpec([None] + list(model_input.shape[1:]), model_input.dtype, name='image')
+    return tf.function(lambda image: model(image, training=False)).get_concrete_function(spec)
+
+def convert_concrete(model, recipe, representative_dataset=None):
+    """Convert an in-memory Keras model to a TFLite flatbuffer
+
+    No trackable object is passed, so the converter freezes the variables
+    into constants instead of emitting (uninitialized) resource variables.
+    """
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete_function(model)])
+    return apply_recipe(converter, recipe, representative_dataset).convert()
+
+def stage_key(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:24]
+
+def cache_entries(outputs):
+    """Conversion cache file names of the {variant: path} outputs of the convert stage"""
+    return {f'{variant}.tflite': path for variant, path in outputs.items()}
+
+class ExportPipeline:
+    """Export stages sharing one in-memory model, with every stage output cached
+
+    source is an .h5 path or 'fresh' for a new ImageNet-initialized model.
+    repair 'auto' rebuilds the architecture only if the model fails to load
+    or run, 'rebuild' always does. compress is None or the pruning/clustering
+    options (train_dir, epochs, cluster_epochs, target_sparsity,
+    sparsity_pattern, num_clusters). history_path=None skips the model
+    history and the regression check before publishing, cache=None the
+    conversion cache.
+    """
+
+    def __init__(self, source, output_path='food_classifier.tflite', work_dir=DEFAULT_WORK_DIR,
+                 repair='auto', compress=None, recipe=FLOAT16_RECIPE, fallback_recipe=RELAXED_RECIPE,
+                 fused_preprocessing=False, fused_input_size=None, int8_output=None, calibration_dir=None,
+                 samples_per_class=10, builtins_only=False, class_names=None, labels_path=None,
+                 history_path=DEFAULT_HISTORY, eval_dir=DEFAULT_EVAL_DIR, allow_regression=False,
+                 cache=None, force=False, source_name='export_pipeline'):
+        if repair not in REPAIR_MODES:
+            raise ValueError(f"Unknown repair mode: {repair} (choose from {', '.join(REPAIR_MODES)})")
+        self.source = source
+        self.output_path = output_path
+        self.work_dir = work_dir
+        self.repair = repair
+        self.compress = compress
+        self.recipe = recipe
+        self.fallback_recipe = fallback_recipe
+        self.fused_preprocessing = fused_preprocessing
+        self.fused_input_size = fused_input_size
+        self.int8_output = int8_output if calibration_dir else None
+        self.calibration_dir = calibration_dir
+        self.samples_per_class = samples_per_class
+        self.builtins_only = builtins_only
+        self.class_names = list(class_names) if class_names else load_class_labels()
+        # Written next to the model and published with it when set
+        self.labels_path = labels_path
+        self.history_path = history_path
+        self.eval_dir = eval_dir
+        self.allow_regression = allow_regression
+        self.cache = cache
+        self.force = force
+        self.source_name = source_name
+
+        os.makedirs(work_dir, exist_ok=True)
+        self.manifest_path = os.path.join(work_dir, 'manifest.json')
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                self.manifest = json.load(f)
+
+        self.model = None
+        self.model_path = None
+        # Compressed model converted by the compress stage, reused by convert
+        self.compressed_tflite = None
+        self.load_failed = False
+        self.tflite_paths = {}
+        self.records = {}
+        self.calibration_samples = None
+        self.failed_stage = None
+        self.converted_from_cache = False
+        # Computed by run(), which reports a missing source or calibration set as a failed stage
+        self.keys = {}
+
+    def _stage_keys(self):
+        """Cache key of every stage from its input key and its own settings"""
+        keys = {}
+        if self.source == 'fresh':
+            keys['load'] = stage_key('fresh', len(self.class_names), hash_source(inspect.getsourcefile(build_model)))
+        else:
+            keys['load'] = stage_key('h5', hash_file(self.source))
+        keys['repair'] = keys['load'] if self.repair == 'none' else stage_key(
+            keys['load'], self.repair, len(self.class_names), hash_source(inspect.getsourcefile(build_fixed_model)))
+        keys['compress'] = keys['repair'] if not self.compress else stage_key(keys['repair'], self.compress)
+
+        calibration_hashes = []
+        if self.int8_output:
+            try:
+                self.calibration_samples = select_calibration_samples(self.calibration_dir, self.samples_per_class)
+            except ValueError as e:
+                # Only the INT8 model needs calibration data, the float model is still exported
+                print(f"⚠️  {e}, skipping INT8 model")
+                self.int8_output = None
+        if self.int8_output:
+            calibration_hashes = [hash_file(path) for path, _ in self.calibration_samples]
+        keys['convert'] = stage_key(keys['compress'], self.recipe, self.fallback_recipe, self.fused_preprocessing,
+                                    self.fused_input_size, INT8_RECIPE if self.int8_output else None,
+                                    calibration_hashes, tf.__version__)
+        keys['verify'] = stage_key(keys['convert'], self.builtins_only, self.history_path, self.eval_dir)
+        # Publishing depends on what is deployed right now, so it always runs
+        keys['publish'] = keys['verify']
+        return keys
+
+    def _cached(self, stage):
+        """Manifest entry of a stage if it ran with the current key and its outputs still exist"""
+        entry = self.manifest.get(stage)
+        if self.force or entry is None or entry['key'] != self.keys[stage]:
+            return None
+        if not all(os.path.exists(path) for path in entry['outputs'].values()):
+            return None
+        return entry
+
+    def _finish(self, stage, outputs, started, **extra):
+        self.manifest[stage] = {
+            'key': self.keys[stage],
+            'outputs': outputs,
+            'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'seconds': round(time.perf_counter() - started, 2),
+            **extra,
+        }
+        with open(self.manifest_path, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+
+    def _restore(self, first_stage):
+        """Pick up the cached outputs of the stages before first_stage"""
+        for stage in STAGES[:STAGES.index(first_stage)]:
+            entry = self.manifest.get(stage)
+            if entry is None or entry['key'] != self.keys[stage]:
+                raise RuntimeError(f"No cached '{stage}' output for these settings, "
+                                   f"run the pipeline from '{stage}' first")
+            self._apply(stage, entry)
+
+    def _apply(self, stage, entry):
+        outputs = entry['outputs']
+        if 'model' in outputs and outputs['model'] != self.model_path:
+            self.model, self.model_path = None, outputs['model']
+        if stage == 'compress':
+            self.compressed_tflite = outputs.get('tflite')
+        if stage == 'convert':
+            self.tflite_paths = dict(outputs)
+        if stage == 'verify':
+            self.records = entry.get('records', {})
+
+    def keras_model(self):
+        """The current model, loaded from the last stage output only if it isn't in memory yet"""
+        if self.model is None:
+            print(f"📂 Loading {self.model_path}")
+            self.model = tf.keras.models.load_model(self.model_path, compile=False)
+        return self.model
+
+    def _save_model(self, stage):
+        path = os.path.join(self.work_dir, f'{stage}.h5')
+        self.model.save(path)
+        self.model_path = path
+        return path
+
+    def _reuse(self, stage):
+        entry = self._cached(stage)
+        if entry is None:
+            return False
+        print(f"♻️  {stage}: unchanged since {entry['finished_at']}, reusing cached output")
+        self._apply(stage, entry)
+        return True
+
+    def load(self):
+        started = time.perf_counter()
+        if self._reuse('load'):
+            return True
+        if self.source == 'fresh':
+            print(f"🏗️  Building a fresh MobileNetV2 model ({len(self.class_names)} classes)")
+            self.model = build_model(len(self.class_names), IMG_SIZE)
+            self._save_model('load')
+        elif self.repair == 'rebuild':
+            # The repair stage streams the weights from the file, no need to deserialize it here
+            self.model_path = self.source
+        else:
+            # A model Keras cannot load is rebuilt from its weights by the repair stage
+            print(f"📂 Loading {self.source}")
+            self.model_path = self.source
+            try:
+                self.model = tf.keras.models.load_model(self.source, compile=False)
+            except Exception as e:
+                print(f"⚠️  Keras could not load the model: {e}")
+                self.model, self.load_failed = None, True
+        self._finish('load', {'model': self.model_path}, started)
+        return True
+
+    def repair_model(self):
+        started = time.perf_counter()
+        if self.repair == 'none' or self._reuse('repair'):
+            if self.repair == 'none':
+                self._finish('repair', {'model': self.model_path}, started)
+            return True
+
+        if self.repair == 'auto' and not self.load_failed:
+            try:
+                runs = model_runs(self.keras_model())
+            except Exception as e:
+                # Restored from a cached load of a model Keras cannot read
+                print(f"⚠️  Keras could not load the model: {e}")
+                runs = False
+            if runs:
+                print("✅ Model loads and runs, no repair needed")
+                self._finish('repair', {'model': self.model_path}, started)
+                return True
+            print("Rebuilding the architecture from the H5 weights...")
+
+        self.model = build_fixed_model(self.model_path, len(self.class_names))
+        self._finish('repair', {'model': self._save_model('repair')}, started)
+        return True
+
+    def compress_model(self):
+        started = time.perf_counter()
+        if not self.compress or self._reuse('compress'):
+            if not self.compress:
+                self._finish('compress', {'model': self.model_path}, started)
+            return True
+
+        from model_compression import (
+            BASELINE_RECIPE, cluster_model, compression_report, export_tflite, fine_tune_baseline,
+            print_compression_report, prune_model
+        )
+        from training_data import load_image_dataset
+
+        options = self.compress
+        model = self.keras_model()
+        print("\n🗜️  Compression stage (pruning + clustering)...")
+        train_ds, val_ds = load_image_dataset(options['train_dir'], self.class_names,
+                                              img_size=model.input_shape[1], validation_split=0.1)
+
+        # Fine-tune the whole network so pruned backbone weights can recover
+        for layer in model.layers:
+            layer.trainable = True
+
+        # The baseline is a copy (the tfmot wrappers share layers with the model
+        # they wrap) given the same fine-tuning and converter settings, so only
+        # the compression differs
+        baseline_model = fine_tune_baseline(
+            model, train_ds, val_ds, epochs=options.get('epochs', 2),
+            cluster_epochs=options.get('cluster_epochs', 1) if options.get('num_clusters') else 0)
+        baseline_path = export_tflite(baseline_model, os.path.join(self.work_dir, 'compress_baseline.tflite'),
+                                      BASELINE_RECIPE)
+
+        compressed = prune_model(model, train_ds, val_ds, epochs=options.get('epochs', 2),
+                                 target_sparsity=options.get('target_sparsity', 0.5),
+                                 sparsity_pattern=options.get('sparsity_pattern'))
+        if options.get('num_clusters'):
+            compressed = cluster_model(compressed, train_ds, val_ds, epochs=options.get('cluster_epochs', 1),
+                                       num_clusters=options['num_clusters'])
+
+        compressed_path = export_tflite(compressed, options.get('output', 'food_classifier_compressed.tflite'),
+                                        COMPRESSED_RECIPE)
+        print(f"✅ Compressed TensorFlow Lite model saved as: {compressed_path}")
+        rows = compression_report(baseline_model, compressed, baseline_path, compressed_path, val_ds)
+        print_compression_report(rows)
+
+        report_path = options.get('report_path', 'compression_report.json')
+        with open(report_path, 'w') as f:
+            json.dump({'target_sparsity': options.get('target_sparsity', 0.5),
+                       'sparsity_pattern': options.get('sparsity_pattern'),
+                       'num_clusters': options.get('num_clusters'), 'models': rows}, f, indent=2)
+        print(f"💾 Compression report saved to: {report_path}")
+
+        self.model = compressed
+        self.compressed_tflite = compressed_path
+        self._finish('compress', {'model': self._save_model('compress'), 'tflite': compressed_path}, started)
+        return True
+
+    def _conversion_outputs(self):
+        outputs = {'float': self.output_path}
+        if self.int8_output:
+            outputs['int8'] = self.int8_output
+        return outputs
+
+    def _fetch_converted(self):
+        """Restore the converted models from the conversion cache, True on a hit
+
+        The cache is content-addressed by the convert stage key, so it also
+        restores models that were overwritten since.
+        """
+        if self.force or self.cache is None:
+            return False
+        outputs = self._conversion_outputs()
+        if not self.cache.fetch(self.keys['convert'], cache_entries(outputs)):
+            return False
+        self.tflite_paths = outputs
+        return True
+
+    def _convert_float(self):
+        float_model = self.keras_model()
+        if self.fused_preprocessing:
+            print("🧩 Fusing uint8 resize + normalization into the model graph")
+            float_model = add_preprocessing(float_model, self.fused_input_size)
+
+        print("🔄 Converting to TensorFlow Lite from the in-memory model...")
+        try:
+            tflite_model = convert_concrete(float_model, self.recipe)
+        except Exception as e:
+            if self.fallback_recipe is None:
+                print(f"❌ Conversion failed: {e}")
+                return False
+            print(f"⚠️  First conversion attempt failed: {e}")
+            print("Trying with relaxed settings...")
+            tflite_model = convert_concrete(float_model, self.fallback_recipe)
+        with open(self.output_path, 'wb') as f:
+            f.write(tflite_model)
+        print(f"✅ Model successfully converted and saved to: {self.output_path}")
+        return True
+
+    def convert(self):
+        started = time.perf_counter()
+        outputs = self._conversion_outputs()
+        if self.converted_from_cache or self._fetch_converted():
+            print(f"♻️  convert: unchanged, reusing {', '.join(outputs.values())}")
+            self._finish('convert', outputs, started, reused=True)
+            return True
+
+        if self.compressed_tflite and self.recipe == COMPRESSED_RECIPE and not self.fused_preprocessing:
+            # The compress stage already converted this model with the same recipe
+            shutil.copy2(self.compressed_tflite, self.output_path)
+            print(f"✅ Reusing the compress-stage conversion, saved to: {self.output_path}")
+        elif not self._convert_float():
+            return False
+
+        if self.int8_output:
+            print("🔢 Converting to full-integer (uint8) TensorFlow Lite...")
+            model = self.keras_model()
+            representative_data = make_representative_data_gen(self.calibration_samples,
+                                                                img_size=model.input_shape[1])
+            try:
+                int8_model = convert_concrete(model, INT8_RECIPE, representative_data)
+            except Exception as e:
+                print(f"❌ INT8 conversion failed: {e}")
+                return False
+            with open(self.int8_output, 'wb') as f:
+                f.write(int8_model)
+            print(f"✅ INT8 model saved to: {self.int8_output}")
+
+        if self.cache is not None:
+            self.cache.store(self.keys['convert'], cache_entries(outputs))
+        self.tflite_paths = outputs
+        self._finish('convert', outputs, started)
+        return True
+
+    def converter_config(self):
+        return {
+            'source': self.source,
+            'repair': self.repair,
+            'compress': self.compress,
+            'recipe': self.recipe,
+            'fallback_recipe': self.fallback_recipe,
+            'fused_preprocessing': self.fused_preprocessing,
+            'fused_input_size': self.fused_input_size,
+            'pipeline_key': self.keys['convert'],
+        }
+
+    def verify(self):
+        started = time.perf_counter()
+        if self._reuse('verify'):
+            return True
+
+        for variant, path in self.tflite_paths.items():
+            if not test_tflite_model(path):
+                return False
+            if not check_ops(path, self.builtins_only):
+                return False
+
+        self.records = {}
+        if self.history_path is not None:
+            for variant, path in self.tflite_paths.items():
+                source = self.source_name if variant == 'float' else f"{self.source_name}:{variant}"
+                config = self.converter_config()
+                if variant == 'int8':
+                    config.update(recipe=INT8_RECIPE, fallback_recipe=None, samples_per_class=self.samples_per_class)
+                self.records[variant] = record_model(path, source, config, self.history_path, self.eval_dir)
+        self._finish('verify', dict(self.tflite_paths), started, records=self.records)
+        return True
+
+    def publish(self):
+        """Copy the models (and labels) to assets unless they regress against the deployed ones"""
+        started = time.perf_counter()
+        os.makedirs(ASSETS_DIR, exist_ok=True)
+        published = True
+        for variant, path in self.tflite_paths.items():
+            assets_path = ASSETS_MODEL_PATH if variant == 'float' else os.path.join(
+                ASSETS_DIR, f'food_classifier_{variant}.tflite')
+            record = self.records.get(variant)
+            if record is not None and not self.allow_regression and not check_deployed(
+                    record, assets_path, self.history_path, eval_dir=self.eval_dir):
+                print(f"⛔ Not copied to {assets_path}, rerun with --allow-regression to replace it anyway")
+                published = False
+                continue
+            shutil.copy2(path, assets_path)
+            print(f"🚀 Model copied to: {assets_path}")
+            if os.path.exists(runtime_profile_path(assets_path)):
+                print(f"🎛️  {runtime_profile_path(assets_path)} was tuned for the previous model, "
+                      f"rerun: python autotune_runtime.py {assets_path}")
+
+        if published and self.labels_path:
+            with open(self.labels_path, 'wb') as f:
+                pickle.dump({name: index for index, name in enumerate(self.class_names)}, f)
+            shutil.copy2(self.labels_path, os.path.join(ASSETS_DIR, 'class_indices.pkl'))
+            print(f"📋 Class indices saved as {self.labels_path} and copied to {ASSETS_DIR}/class_indices.pkl")
+
+        self._finish('publish', {}, started, published=published)
+        return published
+
+    def run(self, stages=STAGES):
+        """Run the given stages in pipeline order; False as soon as one fails"""
+        stages = [stage for stage in STAGES if stage in stages]
+        self.failed_stage = None
+        self.converted_from_cache = False
+        try:
+            self.keys = self._stage_keys()
+            # A conversion cache hit makes the model stages unnecessary: don't
+            # load, repair or compress a model that won't be converted
+            model_stages = STAGES[:STAGES.index('convert')]
+            if 'convert' in stages and self._fetch_converted():
+                print(f"♻️  Converted models found in the conversion cache, skipping {', '.join(model_stages)}")
+                self.converted_from_cache = True
+                stages = [stage for stage in stages if stage not in model_stages]
+            else:
+                self._restore(stages[0])
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"❌ Stage '{stages[0]}' failed: {e}")
+            self.failed_stage = stages[0]
+            return False
+        steps = {'load': self.load, 'repair': self.repair_model, 'compress': self.compress_model,
+                 'convert': self.convert, 'verify': self.verify, 'publish': self.publish}
+
+        for stage in stages:
+            print(f"\n▶️  Stage: {stage}")
+            started = time.perf_counter()
+            try:
+                ok = steps[stage]()
+            except Exception as e:
+                print(f"❌ Stage '{stage}' failed: {e}")
+                import traceback
+                traceback.print_exc()
+                ok = False
+            print(f"   {stage} took {time.perf_counter() - started:.1f} s")
+            if not ok:
+                self.failed_stage = stage
+                return False
+        return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Staged export of the food classifier to TensorFlow Lite")
+    parser.add_argument("--source", default="food_classifier_final.h5",
+                        help="Input H5 model, or 'fresh' for a new ImageNet-initialized model")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES),
+                        help="Stages to run; earlier stages come from the cache")
+    parser.add_argument("--output", default="food_classifier.tflite", help="Output TFLite model path")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="Stage outputs and manifest")
+    parser.add_argument("--repair", default="auto", choices=REPAIR_MODES,
+                        help="Rebuild the architecture from the H5 weights: when needed, always or never")
+    parser.add_argument("--variant", default=None, choices=list(CONVERSION_RECIPES),
+                        help="Float model recipe (default: fp16, or compressed with --compress)")
+    parser.add_argument("--builtins-only", action="store_true",
+                        help="No Flex/custom ops: fail if the model needs the Flex delegate")
+    parser.add_argument("--fused-preprocessing", action="store_true",
+                        help="Model takes raw uint8 RGB images and resizes/normalizes in-graph")
+    parser.add_argument("--fused-input-size", type=int, default=None,
+                        help="Fixed square uint8 input size (default: dynamic height/width)")
+    parser.add_argument("--calibration-dir", default="calibration_images",
+                        help="Real food photos (one folder per class) for the INT8 model")
+    parser.add_argument("--int8-output", default="food_classifier_int8.tflite",
+                        help="Output path for the full-integer model")
+    parser.add_argument("--samples-per-class", type=int, default=10, help="Calibration images sampled per class")
+    parser.add_argument("--compress", action="store_true", help="Prune + cluster while fine-tuning")
+    parser.add_argument("--train-dir", default=None, help="Training images for --compress")
+    parser.add_argument("--epochs", type=int, default=2, help="Pruning fine-tune epochs")
+    parser.add_argument("--cluster-epochs", type=int, default=1, help="Clustering fine-tune epochs")
+    parser.add_argument("--target-sparsity", type=float, default=0.5)
+    parser.add_argument("--structured", action="store_true", help="Prune in the 2:4 structured pattern")
+    parser.add_argument("--clusters", type=int, default=16, help="Weight clusters per layer, 0 to skip")
+    parser.add_argument("--labels", default=None, help="Write and publish class indices to this path")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="Model history file (see model_history.py)")
+    parser.add_argument("--eval-dir", default=DEFAULT_EVAL_DIR,
+                        help="Labeled images for the accuracy recorded in the history")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Don't record the export or check it against the deployed model")
+    parser.add_argument("--allow-regression", action="store_true",
+                        help="Copy to assets even if the model regresses against the deployed one")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Conversion cache directory")
+    parser.add_argument("--cache-size-mb", type=float, default=DEFAULT_MAX_CACHE_MB,
+                        help="Maximum conversion cache size before LRU eviction")
+    parser.add_argument("--force", action="store_true", help="Rerun stages even if their output is cached")
+    args = parser.parse_args()
+
+    if args.compress and not args.train_dir:
+        parser.error("--compress needs --train-dir to fine-tune on")
+    if args.compress:
+        use_legacy_keras()
+
+    compress = None
+    if args.compress:
+        compress = {
+            'train_dir': args.train_dir,
+            'epochs': args.epochs,
+            'cluster_epochs': args.cluster_epochs,
+            'target_sparsity': args.target_sparsity,
+            'sparsity_pattern': (2, 4) if args.structured else None,
+            'num_clusters': args.clusters,
+        }
+    recipe, fallback_recipe = conversion_recipes(args.variant or ('compressed' if args.compress else 'fp16'),
+                                                 args.builtins_only)
+    calibration_dir = args.calibration_dir if os.path.isdir(args.calibration_dir) else None
+
+    print("🏭 Food Classifier Export Pipeline")
+    print("=" * 50)
+
+    pipeline = ExportPipeline(
+        args.source, args.output, args.work_dir, args.repair, compress, recipe, fallback_recipe,
+        args.fused_preprocessing, args.fused_input_size, args.int8_output, calibration_dir,
+        args.samples_per_class, args.builtins_only, labels_path=args.labels,
+        history_path=None if args.no_history else args.history, eval_dir=args.eval_dir,
+        allow_regression=args.allow_regression, cache=ConversionCache(args.cache_dir, args.cache_size_mb),
+        force=args.force
+    )
+    success = pipeline.run(args.stages)
+    for stage in args.stages:
+        entry = pipeline.manifest.get(stage)
+        if entry is not None and entry['key'] == pipeline.keys.get(stage):
+            print(f"   {stage:<10}{entry['seconds']:>8.1f} s  {entry['finished_at']}")
+    print("\n✅ Export finished" if success else "\n❌ Export failed")
+    sys.exit(0 if success else 1)
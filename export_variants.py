@@ -0,0 +1,176 @@
+# Multi-Variant Model Exporter
+# Converts one loaded model to fp32, fp16, dynamic-range int8 and full int8
+# TensorFlow Lite variants in parallel worker processes, then evaluates each
+# on a held-out image set and prints a size / latency / accuracy matrix so
+# the fastest variant within an accuracy budget can be picked.
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import tensorflow as tf
+
+from benchmark_model import benchmark_config
+from convert_model import VARIANT_RECIPES, apply_recipe, make_representative_data_gen, select_calibration_samples
+from export_pipeline import load_keras_model
+from food_model_utils import load_class_labels, load_labeled_images, predict_tflite
+from parity_check import top_k_accuracy, top_k_agreement
+
+# Model rebuilt once per worker process from the parent's architecture + weights
+_worker_model = None
+
+def _init_worker(model_json, weights):
+    global _worker_model
+    _worker_model = tf.keras.models.model_from_json(model_json)
+    _worker_model.set_weights(weights)
+
+def _convert_variant(variant, output_path, calibration_samples):
+    recipe = VARIANT_RECIPES[variant]
+    representative_dataset = None
+    if recipe.get('representative_dataset'):
+        representative_dataset = make_representative_data_gen(
+            calibration_samples, img_size=_worker_model.input_shape[1]
+        )
+
+    start = time.perf_counter()
+    converter = apply_recipe(
+        tf.lite.TFLiteConverter.from_keras_model(_worker_model), recipe, representative_dataset
+    )
+    tflite_model = converter.convert()
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+
+    return {'variant': variant, 'path': output_path, 'convert_seconds': time.perf_counter() - start}
+
+def export_variants(model, output_dir, variants, calibration_samples=None, workers=None):
+    """Convert model to each variant in parallel worker processes"""
+    os.makedirs(output_dir, exist_ok=True)
+
+    if 'full_int8' in variants and not calibration_samples:
+        print("⚠️  No calibration images, skipping full_int8 variant")
+        variants = [variant for variant in variants if variant != 'full_int8']
+
+    # Ship the already-loaded model to workers instead of reloading the .h5
+    model_json = model.to_json()
+    weights = model.get_weights()
+    workers = workers or min(len(variants), os.cpu_count() or 1)
+
+    exported = {}
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker, initargs=(model_json, weights)) as executor:
+        futures = {
+            executor.submit(
+                _convert_variant, variant,
+                os.path.join(output_dir, f'food_classifier_{variant}.tflite'),
+                calibration_samples
+            ): variant
+            for variant in variants
+        }
+        for future in as_completed(futures):
+            variant = futures[future]
+            try:
+                result = future.result()
+                exported[variant] = result
+                print(f"✅ {variant}: {result['path']} ({result['convert_seconds']:.1f}s)")
+            except Exception as e:
+                print(f"❌ {variant} conversion failed: {e}")
+
+    return exported
+
+def evaluate_variants(exported, images, labels, runs=50, reference='fp32'):
+    """Size, latency and accuracy/agreement for every exported variant"""
+    probs = {variant: predict_tflite(info['path'], images) for variant, info in exported.items()}
+    reference_probs = probs.get(reference)
+
+    rows = []
+    for variant, info in exported.items():
+        timing = benchmark_config(info['path'], num_threads=1, use_xnnpack=True,
+                                  batch_sizes=(1,), runs=runs, warmup=5)
+        row = {
+            'variant': variant,
+            'path': info['path'],
+            'size_mb': os.path.getsize(info['path']) / (1024 * 1024),
+            'p50_ms': timing['latency']['p50_ms'],
+            'p90_ms': timing['latency']['p90_ms'],
+            'top1_accuracy': top_k_accuracy(labels, probs[variant], 1),
+            'top3_accuracy': top_k_accuracy(labels, probs[variant], 3),
+        }
+        if reference_probs is not None:
+            row['top1_agreement'] = top_k_agreement(reference_probs, probs[variant], 1)
+            row['top3_agreement'] = top_k_agreement(reference_probs, probs[variant], 3)
+        rows.append(row)
+
+    return sorted(rows, key=lambda row: row['p50_ms'])
+
+def pick_variant(rows, max_top1_drop):
+    """Fastest variant whose top-1 agreement with fp32 stays within budget"""
+    for row in rows:
+        if row.get('top1_agreement', 1.0) >= 1.0 - max_top1_drop:
+            return row
+    return None
+
+def print_matrix(rows):
+    print(f"\n{'Variant':<14}{'Size MB':>9}{'p50 ms':>9}{'p90 ms':>9}"
+          f"{'Top1 agr':>10}{'Top3 agr':>10}{'Top1 acc':>10}{'Top3 acc':>10}")
+    print("-" * 81)
+    for row in rows:
+        print(f"{row['variant']:<14}{row['size_mb']:>9.2f}{row['p50_ms']:>9.2f}{row['p90_ms']:>9.2f}"
+              f"{row.get('top1_agreement', float('nan')):>10.3f}{row.get('top3_agreement', float('nan')):>10.3f}"
+              f"{row['top1_accuracy']:>10.3f}{row['top3_accuracy']:>10.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and compare TFLite variants of the food classifier")
+    parser.add_argument("--h5", default="food_classifier_final.h5", help="Input H5 model path")
+    parser.add_argument("--output-dir", default="variants", help="Where to write the variants")
+    parser.add_argument("--variants", nargs="+", default=list(VARIANT_RECIPES), choices=list(VARIANT_RECIPES))
+    parser.add_argument("--eval-dir", required=True, help="Held-out images, one folder per class")
+    parser.add_argument("--eval-samples-per-class", type=int, default=25)
+    parser.add_argument("--calibration-dir", default="calibration_images",
+                        help="Real food photos (one folder per class) for full_int8")
+    parser.add_argument("--samples-per-class", type=int, default=10,
+                        help="Calibration images sampled per class")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel conversion processes")
+    parser.add_argument("--runs", type=int, default=50, help="Timed runs for latency")
+    parser.add_argument("--max-top1-drop", type=float, default=0.02,
+                        help="Accuracy budget: allowed top-1 disagreement with fp32")
+    parser.add_argument("--output", default="variant_matrix.json", help="JSON results path")
+    args = parser.parse_args()
+
+    print("🧪 Food Classifier Variant Export")
+    print("=" * 50)
+
+    model = load_keras_model(args.h5)
+    img_size = model.input_shape[1]
+
+    calibration_samples = None
+    if os.path.isdir(args.calibration_dir):
+        calibration_samples = select_calibration_samples(args.calibration_dir, args.samples_per_class)
+
+    exported = export_variants(model, args.output_dir, args.variants, calibration_samples, args.workers)
+    if not exported:
+        print("❌ No variants exported")
+        sys.exit(1)
+
+    print(f"\n📂 Loading held-out images from: {args.eval_dir}")
+    images, labels, _ = load_labeled_images(args.eval_dir, args.eval_samples_per_class,
+                                            img_size, load_class_labels())
+    print(f"   {len(images)} images")
+
+    rows = evaluate_variants(exported, images, labels, runs=args.runs)
+    print_matrix(rows)
+
+    recommended = pick_variant(rows, args.max_top1_drop)
+    if recommended:
+        print(f"\n🏆 Fastest variant within budget: {recommended['variant']} ({recommended['path']})")
+    else:
+        print(f"\n⚠️  No variant stays within a {args.max_top1_drop:.1%} top-1 budget")
+
+    with open(args.output, 'w') as f:
+        json.dump({'variants': rows, 'recommended': recommended and recommended['variant'],
+                   'max_top1_drop': args.max_top1_drop}, f, indent=2)
+    print(f"💾 Variant matrix saved to: {args.output}")
@@ -0,0 +1,145 @@
+# Fine-Tune the Food Classifier from TFRecords
+# Trains on the shards written by build_tfrecords.py: first the classification
+# head with the MobileNetV2 backbone frozen, then the top of the backbone at a
+# lower learning rate. The input pipeline is timed on its own so we can tell
+# whether a run is bound by the model or by data loading.
+
+import argparse
+import sys
+import time
+
+import tensorflow as tf
+
+from create_fresh_model import build_model
+from training_data import load_tfrecord_dataset, load_tfrecord_info
+
+# The pipeline should produce batches at least this much faster than training consumes them
+PIPELINE_HEADROOM = 1.5
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Training images/s per epoch"""
+
+    def __init__(self, batch_size):
+        super().__init__()
+        self.batch_size = batch_size
+        self.images_per_second = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.steps = 0
+        self.start = time.perf_counter()
+
+    def on_train_batch_end(self, batch, logs=None):
+        self.steps += 1
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self.start
+        self.images_per_second.append(self.steps * self.batch_size / elapsed)
+
+def measure_pipeline_throughput(dataset, batch_size, epochs=2):
+    """Images/s of the input pipeline alone (the first pass fills the cache)"""
+    for _ in dataset:
+        pass
+    start = time.perf_counter()
+    steps = 0
+    for _ in range(epochs):
+        for _ in dataset:
+            steps += 1
+    return steps * batch_size / (time.perf_counter() - start)
+
+def unfreeze_top_layers(model, num_layers):
+    """Make the last num_layers of the backbone trainable, keeping BatchNorm frozen"""
+    backbone = model.layers[0]
+    backbone.trainable = True
+    for layer in backbone.layers[:-num_layers]:
+        layer.trainable = False
+    for layer in backbone.layers:
+        if isinstance(layer, tf.keras.layers.BatchNormalization):
+            layer.trainable = False
+
+def finetune(model, train_ds, val_ds=None, epochs=5, fine_tune_epochs=5, unfreeze_layers=30,
+             learning_rate=1e-3, fine_tune_learning_rate=1e-5, batch_size=32):
+    """Train the head, then the top of the backbone; returns the merged history and throughput"""
+    throughput = ThroughputCallback(batch_size)
+    callbacks = [throughput, tf.keras.callbacks.EarlyStopping(
+        monitor='val_accuracy' if val_ds is not None else 'accuracy',
+        patience=3, restore_best_weights=True
+    )]
+
+    model.layers[0].trainable = False
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+                  loss='categorical_crossentropy', metrics=['accuracy'])
+    print(f"\n🏋️  Stage 1: classification head, {epochs} epochs")
+    history = model.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=callbacks,
+                        verbose=2).history
+
+    if fine_tune_epochs and unfreeze_layers:
+        unfreeze_top_layers(model, unfreeze_layers)
+        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=fine_tune_learning_rate),
+                      loss='categorical_crossentropy', metrics=['accuracy'])
+        print(f"\n🔓 Stage 2: top {unfreeze_layers} backbone layers, {fine_tune_epochs} epochs")
+        stage2 = model.fit(train_ds, validation_data=val_ds, epochs=fine_tune_epochs,
+                           callbacks=callbacks, verbose=2).history
+        history = {key: history.get(key, []) + stage2.get(key, []) for key in stage2}
+
+    return history, throughput.images_per_second
+
+def report_bottleneck(pipeline_ips, train_ips):
+    """Print whether training is bound by the model or by the input pipeline"""
+    print(f"\n📈 Input pipeline: {pipeline_ips:.0f} images/s | training: {train_ips:.0f} images/s")
+    if pipeline_ips < train_ips * PIPELINE_HEADROOM:
+        print(f"⚠️  Input pipeline has less than {PIPELINE_HEADROOM}x headroom, training may be "
+              "data-bound (try --encoding raw, more shards or a smaller --img-size)")
+        return False
+    print("✅ Training is bound by the model, not by data loading")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fine-tune the food classifier on TFRecord shards")
+    parser.add_argument("--records-dir", default="tfrecords", help="Output of build_tfrecords.py")
+    parser.add_argument("--model", help="Keras/H5 model to continue from (default: fresh MobileNetV2)")
+    parser.add_argument("--alpha", type=float, default=1.0, help="Width multiplier for a fresh model")
+    parser.add_argument("--no-pretrained", action="store_true",
+                        help="Start a fresh model from random weights instead of ImageNet")
+    parser.add_argument("--epochs", type=int, default=5, help="Head-only epochs")
+    parser.add_argument("--fine-tune-epochs", type=int, default=5, help="Epochs with the backbone top unfrozen")
+    parser.add_argument("--unfreeze-layers", type=int, default=30)
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--fine-tune-learning-rate", type=float, default=1e-5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--no-augment", action="store_true", help="Disable random crop/flip/colour jitter")
+    parser.add_argument("--cache", default="memory",
+                        help="'memory', 'none', or a file path to cache the records on disk")
+    parser.add_argument("--output", default="food_classifier_finetuned.h5", help="Output H5 model path")
+    args = parser.parse_args()
+
+    print("🍛 Food Classifier Fine-Tuning")
+    print("=" * 50)
+
+    info = load_tfrecord_info(args.records_dir)
+    img_size, class_names = info['img_size'], info['class_names']
+    cache = {'memory': True, 'none': False}.get(args.cache, args.cache)
+    train_ds = load_tfrecord_dataset(args.records_dir, 'train', args.batch_size,
+                                     augment=not args.no_augment, cache=cache)
+    val_ds = load_tfrecord_dataset(args.records_dir, 'validation', args.batch_size, cache=bool(cache))
+    print(f"📂 {info['splits']['train']['num_examples']} training images at {img_size}x{img_size} "
+          f"({info['encoding']}) from {args.records_dir}")
+
+    if args.model:
+        model = tf.keras.models.load_model(args.model)
+        if model.input_shape[1] != img_size:
+            print(f"❌ {args.model} expects {model.input_shape[1]}px input but the records are {img_size}px")
+            sys.exit(1)
+    else:
+        model = build_model(len(class_names), img_size, args.alpha,
+                            None if args.no_pretrained else 'imagenet')
+
+    pipeline_ips = measure_pipeline_throughput(train_ds, args.batch_size)
+    history, train_ips = finetune(model, train_ds, val_ds, args.epochs, args.fine_tune_epochs,
+                                  args.unfreeze_layers, args.learning_rate,
+                                  args.fine_tune_learning_rate, args.batch_size)
+    # The first epoch includes graph tracing, so use the steady-state epochs
+    report_bottleneck(pipeline_ips, max(train_ips[1:] or train_ips))
+
+    model.save(args.output)
+    print(f"💾 Fine-tuned model saved as: {args.output}")
+    print(f"   Convert with: python convert_model.py --h5 {args.output}")
@@ -1,216 +1,274 @@
 # Model Architecture Fixer and Converter
 # This script fixes architecture issues and converts to TensorFlow Lite
 
+import argparse
 import tensorflow as tf
 import numpy as np
 import os
-import pickle
+import re
+import shutil
+import sys
 
-def fix_and_convert_model():
-    """Fix model architecture and convert to TFLite"""
+import h5py
+
+from conversion_cache import ConversionCache
+from convert_model import RELAXED_RECIPE
+from food_model_utils import FOOD_CATEGORIES
+from model_history import DEFAULT_EVAL_DIR, DEFAULT_HISTORY
+
+def _normalize_weight_name(weight_name):
+    """'mobilenetv2_1.00_224/Conv1/kernel:0' -> 'Conv1/kernel'"""
+    if isinstance(weight_name, bytes):
+        weight_name = weight_name.decode('utf8')
+    parts = weight_name.split(':')[0].split('/')
+    return '/'.join(parts[-2:])
+
+def index_h5_weights(h5_model_path):
+    """Index weight datasets in a Keras H5 file by name and shape
+    
+    Reads only HDF5 metadata, no model is built and no weights are loaded.
+    Returns {'layer/weight': {'path': dataset path, 'shape': shape}}.
+    """
+    index = {}
+    with h5py.File(h5_model_path, 'r') as f:
+        root = f['model_weights'] if 'model_weights' in f else f
+        for layer_name in root.attrs['layer_names']:
+            group = root[layer_name]
+            for weight_name in group.attrs['weight_names']:
+                dataset = group[weight_name]
+                index[_normalize_weight_name(weight_name)] = {
+                    'path': dataset.name, 'shape': tuple(dataset.shape)
+                }
+    return index
+
+def read_backbone_config(h5_model_path):
+    """(alpha, img_size) from the MobileNetV2 layer name in the H5 file, e.g. mobilenetv2_0.50_160"""
+    with h5py.File(h5_model_path, 'r') as f:
+        root = f['model_weights'] if 'model_weights' in f else f
+        for layer_name in root.attrs['layer_names']:
+            if isinstance(layer_name, bytes):
+                layer_name = layer_name.decode('utf8')
+            match = re.match(r'mobilenetv2_([\d.]+)_(\d+)', layer_name)
+            if match:
+                return float(match.group(1)), int(match.group(2))
+    return 1.0, 224
+
+def iter_model_weights(model):
+    """Yield ('layer/weight', variable) for every weight, descending into nested models"""
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.Model):
+            yield from iter_model_weights(layer)
+            continue
+        for weight in layer.weights:
+            short_name = weight.name.split('/')[-1].split(':')[0]
+            yield f"{layer.name}/{short_name}", weight
+
+def transfer_h5_weights(model, h5_model_path):
+    """Copy weights straight from the H5 file into model, one dataset at a time
+    
+    Weights are matched by layer/weight name and shape; anything left over
+    (e.g. renamed Dense head layers) is matched by weight kind and shape when
+    that is unambiguous. Returns the model weights that could not be matched.
+    """
+    index = index_h5_weights(h5_model_path)
+    targets = list(iter_model_weights(model))
+    matches, unmatched = {}, []
+
+    for name, weight in targets:
+        entry = index.get(name)
+        if entry is not None and entry['shape'] == tuple(weight.shape):
+            matches[name] = name
+        else:
+            unmatched.append((name, weight))
+
+    # Second pass: renamed head layers (e.g. dense/dense_1 -> dense_1/predictions),
+    # unique kind + shape among unused datasets. Backbone layers keep their
+    # names, so they are never matched by shape alone.
+    head_names = {
+        f"{layer.name}/{weight.name.split('/')[-1].split(':')[0]}"
+        for layer in model.layers if not isinstance(layer, tf.keras.Model)
+        for weight in layer.weights
+    }
+    unused = {key: entry for key, entry in index.items() if key not in matches.values()}
+    still_unmatched = []
+    for name, weight in unmatched:
+        if name not in head_names:
+            still_unmatched.append((name, weight))
+            continue
+        kind = name.split('/')[-1]
+        candidates = [
+            key for key, entry in unused.items()
+            if key.split('/')[-1] == kind and entry['shape'] == tuple(weight.shape)
+        ]
+        if len(candidates) == 1:
+            matches[name] = candidates[0]
+            unused.pop(candidates[0])
+            print(f"   ↪️  {candidates[0]} -> {name} (matched by shape)")
+        else:
+            still_unmatched.append((name, weight))
+
+    weights_by_name = dict(targets)
+    with h5py.File(h5_model_path, 'r') as f:
+        for name, source in matches.items():
+            weights_by_name[name].assign(f[index[source]['path']][()])
+
+    print(f"✅ Transferred {len(matches)}/{len(targets)} weights from {h5_model_path}")
+    if still_unmatched:
+        print(f"⚠️  {len(still_unmatched)} weights had no match in the H5 file:")
+        for name, weight in still_unmatched:
+            print(f"   - {name} {tuple(weight.shape)}")
+    if unused:
+        print(f"⚠️  {len(unused)} H5 weights were not used:")
+        for key, entry in unused.items():
+            print(f"   - {key} {entry['shape']}")
+
+    return [name for name, _ in still_unmatched]
+
+def fill_from_imagenet(base_model, missing_names, alpha=1.0):
+    """Fill backbone weights missing from the H5 file with ImageNet weights"""
+    print(f"📥 Loading ImageNet weights for {len(missing_names)} missing backbone weights...")
+    imagenet_model = tf.keras.applications.MobileNetV2(
+        input_shape=base_model.input_shape[1:],
+        alpha=alpha,
+        include_top=False,
+        weights='imagenet'
+    )
+    imagenet_weights = dict(iter_model_weights(imagenet_model))
+    current_weights = dict(iter_model_weights(base_model))
+    for name in missing_names:
+        if name in imagenet_weights:
+            current_weights[name].assign(imagenet_weights[name])
+
+def build_fixed_model(h5_model_path, num_classes):
+    """Rebuild the model with a clean architecture and the weights from the H5 file"""
+    # Inspect the original weights without building the (possibly broken) model
+    print("📋 Indexing original model weights...")
+    weight_index = index_h5_weights(h5_model_path)
+    total_params = sum(int(np.prod(entry['shape'])) for entry in weight_index.values())
+    print(f"   {len(weight_index)} weight tensors, {total_params:,} parameters")
+    alpha, img_size = read_backbone_config(h5_model_path)
+    print(f"   MobileNetV2 alpha={alpha}, input {img_size}x{img_size}")
+    
+    # Create a new, clean model architecture
+    print("\n🏗️  Building new clean model architecture...")
+    
+    # Build new model with explicit architecture
+    inputs = tf.keras.Input(shape=(img_size, img_size, 3), name='input_layer')
+    
+    # Use MobileNetV2 as base (same as original training script),
+    # weights come from the H5 file below
+    base_model = tf.keras.applications.MobileNetV2(
+        input_shape=(img_size, img_size, 3),
+        alpha=alpha,
+        include_top=False,
+        weights=None
+    )
+    base_model.trainable = False  # Freeze base model
+    
+    # Add the same layers as in training script
+    x = base_model(inputs, training=False)
+    x = tf.keras.layers.GlobalAveragePooling2D(name='global_avg_pool')(x)
+    x = tf.keras.layers.Dropout(0.2, name='dropout_1')(x)
+    x = tf.keras.layers.Dense(128, activation='relu', name='dense_1')(x)
+    x = tf.keras.layers.Dropout(0.2, name='dropout_2')(x)
+    outputs = tf.keras.layers.Dense(num_classes, activation='softmax', name='predictions')(x)
+    
+    new_model = tf.keras.Model(inputs, outputs, name='food_classifier_fixed')
+    
+    # Compile the model
+    new_model.compile(
+        optimizer='adam',
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    
+    print("\n✅ New Model Architecture:")
+    new_model.summary()
+    
+    # Transfer all weights (backbone included) straight from the H5 file
+    print("\n🔄 Transferring weights from H5 file...")
+    
+    missing = transfer_h5_weights(new_model, h5_model_path)
+    backbone_names = {name for name, _ in iter_model_weights(base_model)}
+    missing_backbone = [name for name in missing if name in backbone_names]
+    if missing_backbone:
+        fill_from_imagenet(base_model, missing_backbone, alpha)
+    
+    # Test the new model
+    print("\n🧪 Testing new model...")
+    test_input = np.random.random((1, img_size, img_size, 3)).astype(np.float32)
+    test_output = new_model.predict(test_input, verbose=0)
+    print(f"✅ Model test successful! Output shape: {test_output.shape}")
+    print(f"Output probabilities sum: {np.sum(test_output):.4f}")
+    
+    return new_model
+
+def fix_and_convert_model(h5_model_path='food_classifier_final.h5', cache=None, history_path=DEFAULT_HISTORY,
+                          eval_dir=DEFAULT_EVAL_DIR, allow_regression=False):
+    """Fix model architecture and convert to TFLite
+    
+    Runs the export pipeline with the repair stage forced to rebuild the
+    architecture. The export is recorded in the model history (unless
+    history_path is None) and only copied to assets if it doesn't regress
+    against the deployed model, or allow_regression is set.
+    """
+    from export_pipeline import ExportPipeline
     
     print("🔧 Food Classification Model Fixer & Converter")
     print("=" * 60)
     
-    try:
-        # Load the original model to inspect its architecture
-        print("📋 Loading and analyzing original model...")
-        original_model = tf.keras.models.load_model('food_classifier_final.h5')
-        
-        print("\n📊 Original Model Architecture:")
-        original_model.summary()
-        
-        # Extract weights from the last layers
-        print("\n🔍 Extracting model weights...")
-        
-        # Get the MobileNetV2 base model weights
-        mobilenet_weights = []
-        dense_weights = []
-        
-        for layer in original_model.layers:
-            if hasattr(layer, 'get_weights') and len(layer.get_weights()) > 0:
-                weights = layer.get_weights()
-                if 'dense' in layer.name.lower():
-                    dense_weights.append((layer.name, weights))
-                    print(f"Found dense layer: {layer.name} with weights shape: {[w.shape for w in weights]}")
-        
-        # Create a new, clean model architecture
-        print("\n🏗️  Building new clean model architecture...")
-        
-        # Food categories (ensure this matches your training data)
-        food_categories = [
-            'biriyani', 'bisibelebath', 'butternaan', 'chaat', 'chappati',
-            'dhokla', 'dosa', 'gulab jamun', 'halwa', 'idly',
-            'kathi roll', 'meduvadai', 'noodles', 'paniyaram', 'poori',
-            'samosa', 'tandoori chicken', 'upma', 'vada pav', 'ven pongal'
-        ]
-        
-        num_classes = len(food_categories)
-        print(f"📝 Number of classes: {num_classes}")
-        
-        # Build new model with explicit architecture
-        inputs = tf.keras.Input(shape=(224, 224, 3), name='input_layer')
-        
-        # Use MobileNetV2 as base (same as original training script)
-        base_model = tf.keras.applications.MobileNetV2(
-            input_shape=(224, 224, 3),
-            include_top=False,
-            weights='imagenet'  # Use pretrained weights
-        )
-        base_model.trainable = False  # Freeze base model
-        
-        # Add the same layers as in training script
-        x = base_model(inputs, training=False)
-        x = tf.keras.layers.GlobalAveragePooling2D(name='global_avg_pool')(x)
-        x = tf.keras.layers.Dropout(0.2, name='dropout_1')(x)
-        x = tf.keras.layers.Dense(128, activation='relu', name='dense_1')(x)
-        x = tf.keras.layers.Dropout(0.2, name='dropout_2')(x)
-        outputs = tf.keras.layers.Dense(num_classes, activation='softmax', name='predictions')(x)
-        
-        new_model = tf.keras.Model(inputs, outputs, name='food_classifier_fixed')
-        
-        # Compile the model
-        new_model.compile(
-            optimizer='adam',
-            loss='categorical_crossentropy',
-            metrics=['accuracy']
-        )
-        
-        print("\n✅ New Model Architecture:")
-        new_model.summary()
-        
-        # Try to transfer weights from original model where possible
-        print("\n🔄 Attempting to transfer weights...")
-        
-        try:
-            # For the dense layers, try to extract and apply weights
-            if dense_weights:
-                # Find corresponding layers in new model
-                for layer_name, weights in dense_weights:
-                    for new_layer in new_model.layers:
-                        if 'dense' in new_layer.name and len(weights) > 0:
-                            try:
-                                # Check if shapes match
-                                if (len(weights) >= 2 and 
-                                    weights[0].shape[1] == new_layer.get_weights()[0].shape[1] and
-                                    weights[1].shape[0] == new_layer.get_weights()[1].shape[0]):
-                                    new_layer.set_weights(weights)
-                                    print(f"✅ Transferred weights for {new_layer.name}")
-                                    break
-                            except Exception as e:
-                                print(f"⚠️  Could not transfer weights for {new_layer.name}: {e}")
-            
-            print("✅ Weight transfer completed")
-            
-        except Exception as e:
-            print(f"⚠️  Weight transfer failed: {e}")
-            print("Using base MobileNetV2 weights only")
-        
-        # Test the new model
-        print("\n🧪 Testing new model...")
-        test_input = np.random.random((1, 224, 224, 3)).astype(np.float32)
-        test_output = new_model.predict(test_input, verbose=0)
-        print(f"✅ Model test successful! Output shape: {test_output.shape}")
-        print(f"Output probabilities sum: {np.sum(test_output):.4f}")
-        
-        # Save the fixed model
-        fixed_model_path = 'food_classifier_fixed.h5'
-        new_model.save(fixed_model_path)
-        print(f"💾 Fixed model saved as: {fixed_model_path}")
-        
-        # Now convert to TensorFlow Lite
-        print("\n🔄 Converting to TensorFlow Lite...")
-        
-        converter = tf.lite.TFLiteConverter.from_keras_model(new_model)
-        
-        # Set converter options for best compatibility
-        converter.optimizations = [tf.lite.Optimize.DEFAULT]
-        converter.target_spec.supported_ops = [
-            tf.lite.OpsSet.TFLITE_BUILTINS,
-            tf.lite.OpsSet.SELECT_TF_OPS
-        ]
-        converter.allow_custom_ops = True
-        
-        # Convert
-        tflite_model = converter.convert()
-        
-        # Save TFLite model
-        tflite_path = 'food_classifier.tflite'
-        with open(tflite_path, 'wb') as f:
-            f.write(tflite_model)
-        
-        print(f"✅ TensorFlow Lite model saved as: {tflite_path}")
-        
-        # Test the TFLite model
-        print("\n🧪 Testing TensorFlow Lite model...")
-        interpreter = tf.lite.Interpreter(model_path=tflite_path)
-        interpreter.allocate_tensors()
-        
-        input_details = interpreter.get_input_details()
-        output_details = interpreter.get_output_details()
-        
-        print(f"Input shape: {input_details[0]['shape']}")
-        print(f"Output shape: {output_details[0]['shape']}")
-        
-        # Test inference
-        interpreter.set_tensor(input_details[0]['index'], test_input)
-        interpreter.invoke()
-        tflite_output = interpreter.get_tensor(output_details[0]['index'])
-        
-        print(f"✅ TFLite inference successful!")
-        print(f"Output shape: {tflite_output.shape}")
-        print(f"Max confidence: {np.max(tflite_output):.4f}")
-        print(f"Predicted class: {np.argmax(tflite_output)}")
-        
-        # Save class indices
-        class_indices = {category: idx for idx, category in enumerate(food_categories)}
-        with open('class_indices_fixed.pkl', 'wb') as f:
-            pickle.dump(class_indices, f)
-        
-        print(f"📋 Class indices saved as: class_indices_fixed.pkl")
-        
-        # Copy to assets
-        try:
-            import shutil
-            assets_model_path = 'assets/models/food_classifier.tflite'
-            assets_indices_path = 'assets/models/class_indices.pkl'
-            
-            os.makedirs('assets/models', exist_ok=True)
-            shutil.copy2(tflite_path, assets_model_path)
-            shutil.copy2('class_indices_fixed.pkl', assets_indices_path)
-            
-            print(f"\n🚀 Files copied to assets:")
-            print(f"   - {assets_model_path}")
-            print(f"   - {assets_indices_path}")
-            
-        except Exception as e:
-            print(f"⚠️  Could not copy to assets: {e}")
-        
-        # Model info
-        original_size = os.path.getsize('food_classifier_final.h5') / (1024 * 1024)
-        fixed_size = os.path.getsize(fixed_model_path) / (1024 * 1024)
-        tflite_size = os.path.getsize(tflite_path) / (1024 * 1024)
-        
-        print(f"\n📊 Model Size Comparison:")
-        print(f"   Original H5: {original_size:.2f} MB")
-        print(f"   Fixed H5: {fixed_size:.2f} MB") 
-        print(f"   TFLite: {tflite_size:.2f} MB")
-        print(f"   Compression: {((original_size - tflite_size) / original_size * 100):.1f}%")
-        
-        print(f"\n🎉 SUCCESS! Model conversion completed!")
-        print(f"\n📱 Next steps:")
-        print(f"   1. Restart your Flutter app")
-        print(f"   2. Go to Food Planner → Food Logger")
-        print(f"   3. Test the camera feature")
-        print(f"   4. Enjoy AI-powered food recognition!")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ Model fixing failed: {e}")
-        import traceback
-        traceback.print_exc()
+    fixed_model_path = 'food_classifier_fixed.h5'
+    tflite_path = 'food_classifier.tflite'
+    print(f"📝 Number of classes: {len(FOOD_CATEGORIES)}")
+    
+    pipeline = ExportPipeline(
+        h5_model_path, tflite_path, repair='rebuild', recipe=RELAXED_RECIPE, fallback_recipe=None,
+        class_names=FOOD_CATEGORIES, labels_path='class_indices_fixed.pkl', history_path=history_path,
+        eval_dir=eval_dir, allow_regression=allow_regression, cache=cache, force=cache is None,
+        source_name='fix_and_convert_model'
+    )
+    if not pipeline.run():
+        print("❌ Model fixing failed")
         return False
+    
+    if pipeline.converted_from_cache:
+        print(f"♻️  Converted model came from the conversion cache, {fixed_model_path} left as is")
+    else:
+        shutil.copy2(pipeline.model_path, fixed_model_path)
+        print(f"💾 Fixed model saved as: {fixed_model_path}")
+    
+    # Model info
+    original_size = os.path.getsize(h5_model_path) / (1024 * 1024)
+    tflite_size = os.path.getsize(tflite_path) / (1024 * 1024)
+    
+    print(f"\n📊 Model Size Comparison:")
+    print(f"   Original H5: {original_size:.2f} MB")
+    if os.path.exists(fixed_model_path):
+        print(f"   Fixed H5: {os.path.getsize(fixed_model_path) / (1024 * 1024):.2f} MB")
+    print(f"   TFLite: {tflite_size:.2f} MB")
+    print(f"   Compression: {((original_size - tflite_size) / original_size * 100):.1f}%")
+    
+    print(f"\n🎉 SUCCESS! Model conversion completed!")
+    print(f"\n📱 Next steps:")
+    print(f"   1. Restart your Flutter app")
+    print(f"   2. Go to Food Planner → Food Logger")
+    print(f"   3. Test the camera feature")
+    print(f"   4. Enjoy AI-powered food recognition!")
+    
+    return True
 
 if __name__ == "__main__":
-    fix_and_convert_model()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Rebuild the food classifier architecture and convert to TFLite")
+    parser.add_argument("--h5", default="food_classifier_final.h5", help="Input H5 model path")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="Model history file (see model_history.py)")
+    parser.add_argument("--eval-dir", default=DEFAULT_EVAL_DIR,
+                        help="Labeled images for the accuracy recorded in the history")
+    parser.add_argument("--no-history", action="store_true",
+                        help="Don't record the export or check it against the deployed model")
+    parser.add_argument("--allow-regression", action="store_true",
+                        help="Copy to assets even if the model regresses against the deployed one")
+    args = parser.parse_args()
+    
+    success = fix_and_convert_model(args.h5, ConversionCache(), None if args.no_history else args.history,
+                                    args.eval_dir, args.allow_regression)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,265 @@
+# Shared helpers for the Food Classification model scripts
+# Labels, dataset layout and image preprocessing live here so every script
+# feeds the model exactly the way the Flutter app does.
+# Only NumPy and Pillow are imported at module level; the TFLite runtime is
+# imported on first use and TensorFlow is never needed for inference.
+
+import json
+import os
+import pickle
+import random
+
+import numpy as np
+from PIL import Image
+
+# Food categories (must match class_indices.pkl and FoodClassificationService)
+FOOD_CATEGORIES = [
+    'biriyani', 'bisibelebath', 'butternaan', 'chaat', 'chappati',
+    'dhokla', 'dosa', 'gulab jamun', 'halwa', 'idly',
+    'kathi roll', 'meduvadai', 'noodles', 'paniyaram', 'poori',
+    'samosa', 'tandoori chicken', 'upma', 'vada pav', 'ven pongal'
+]
+
+IMG_SIZE = 224
+
+# Same normalization as FoodClassificationService (imageMean / imageStd)
+IMAGE_MEAN = 127.5
+IMAGE_STD = 127.5
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def load_class_labels(indices_path='class_indices.pkl'):
+    """Load class labels ordered by model output index"""
+    if not os.path.exists(indices_path):
+        return list(FOOD_CATEGORIES)
+
+    with open(indices_path, 'rb') as f:
+        class_indices = pickle.load(f)
+
+    return [name for name, _ in sorted(class_indices.items(), key=lambda item: item[1])]
+
+def list_images(image_dir):
+    """List every image file below a directory, sorted for reproducibility"""
+    image_paths = []
+    for root, _, files in os.walk(image_dir):
+        for name in files:
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                image_paths.append(os.path.join(root, name))
+    return sorted(image_paths)
+
+def list_class_images(data_dir, class_names=None):
+    """List images in a <data_dir>/<class name>/ layout, grouped by class index"""
+    class_names = class_names or FOOD_CATEGORIES
+    images_by_class = {}
+
+    for class_index, class_name in enumerate(class_names):
+        class_dir = os.path.join(data_dir, class_name)
+        if os.path.isdir(class_dir):
+            images_by_class[class_index] = list_images(class_dir)
+        else:
+            images_by_class[class_index] = []
+
+    return images_by_class
+
+def stratified_sample(images_by_class, samples_per_class, seed=0):
+    """Pick up to samples_per_class images per class, interleaved across classes"""
+    rng = random.Random(seed)
+    picked = {}
+    for class_index, paths in images_by_class.items():
+        paths = list(paths)
+        rng.shuffle(paths)
+        picked[class_index] = paths[:samples_per_class]
+
+    # Round-robin so a truncated stream still covers every class
+    samples = []
+    for i in range(samples_per_class):
+        for class_index in sorted(picked):
+            if i < len(picked[class_index]):
+                samples.append((picked[class_index][i], class_index))
+    return samples
+
+def load_image(image_path, img_size=IMG_SIZE):
+    """Decode an image file to a uint8 RGB array of shape (img_size, img_size, 3)
+    
+    img_size=None keeps the original size, for models that resize in-graph.
+    """
+    with Image.open(image_path) as image:
+        image = image.convert('RGB')
+        if img_size is not None:
+            image = image.resize((img_size, img_size), Image.BILINEAR)
+        return np.asarray(image, dtype=np.uint8)
+
+def normalize_image(image):
+    """Scale uint8 pixels to the [-1, 1] range the model was trained on"""
+    return (np.asarray(image, dtype=np.float32) - IMAGE_MEAN) / IMAGE_STD
+
+def prepare_input(images, input_detail):
+    """Convert a batch of uint8 RGB images to what the model input expects"""
+    dtype = input_detail['dtype']
+    if dtype == np.float32:
+        return normalize_image(images)
+
+    scale, zero_point = input_detail['quantization']
+    if not scale:
+        # Raw pixel input, preprocessing happens inside the model
+        return np.asarray(images).astype(dtype)
+
+    quantized = np.round(normalize_image(images) / scale + zero_point)
+    limits = np.iinfo(dtype)
+    return np.clip(quantized, limits.min, limits.max).astype(dtype)
+
+def model_input_size(input_detail):
+    """Square input resolution, or None if height/width are dynamic (fused preprocessing)"""
+    signature = input_detail.get('shape_signature')
+    if signature is not None and len(signature) == 4 and (signature[1] < 0 or signature[2] < 0):
+        return None
+    return int(input_detail['shape'][1])
+
+def set_image_input(interpreter, images):
+    """Set a uint8 image batch as the model input, resizing the input tensor to fit"""
+    input_detail = interpreter.get_input_details()[0]
+    if tuple(input_detail['shape']) != images.shape:
+        interpreter.resize_tensor_input(input_detail['index'], list(images.shape))
+        interpreter.allocate_tensors()
+        input_detail = interpreter.get_input_details()[0]
+    interpreter.set_tensor(input_detail['index'], prepare_input(images, input_detail))
+
+def dequantize_output(output, output_detail):
+    """Convert model output back to float probabilities"""
+    scale, zero_point = output_detail['quantization']
+    if output_detail['dtype'] == np.float32 or not scale:
+        return np.asarray(output, dtype=np.float32)
+    return (output.astype(np.float32) - zero_point) * scale
+
+_tflite_runtime = None
+
+def load_tflite_runtime():
+    """Import the lightest available TFLite runtime
+    
+    Prefers ai_edge_litert, then tflite_runtime, and only falls back to
+    full TensorFlow (several seconds and hundreds of MB to import) when
+    neither is installed. Returns (runtime name, Interpreter, OpResolverType).
+    """
+    global _tflite_runtime
+    if _tflite_runtime is not None:
+        return _tflite_runtime
+
+    try:
+        from ai_edge_litert import interpreter as runtime
+        _tflite_runtime = ('ai_edge_litert', runtime.Interpreter, runtime.OpResolverType)
+    except ImportError:
+        try:
+            from tflite_runtime import interpreter as runtime
+            _tflite_runtime = ('tflite_runtime', runtime.Interpreter, runtime.OpResolverType)
+        except ImportError:
+            import tensorflow as tf
+            _tflite_runtime = ('tensorflow', tf.lite.Interpreter, tf.lite.experimental.OpResolverType)
+
+    return _tflite_runtime
+
+def create_interpreter(model_path, num_threads=None, use_xnnpack=True):
+    """Create a TFLite interpreter with tensors allocated
+    
+    use_xnnpack=False disables the default XNNPACK delegate so the
+    reference builtin kernels are used instead.
+    """
+    _, interpreter_class, op_resolver_type = load_tflite_runtime()
+
+    kwargs = {}
+    if not use_xnnpack:
+        kwargs['experimental_op_resolver_type'] = op_resolver_type.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+
+    interpreter = interpreter_class(model_path=model_path, num_threads=num_threads, **kwargs)
+    interpreter.allocate_tensors()
+    return interpreter
+
+RUNTIME_PROFILE_SUFFIX = '.runtime.json'
+
+# Used when a model has no runtime profile (matches FoodClassificationService)
+DEFAULT_RUNTIME_SETTINGS = {'num_threads': 1, 'use_xnnpack': True, 'batch_size': 1}
+
+def runtime_profile_path(model_path):
+    """Runtime profile written by autotune_runtime.py next to the model"""
+    return os.path.splitext(model_path)[0] + RUNTIME_PROFILE_SUFFIX
+
+def load_runtime_settings(model_path, objective='latency'):
+    """Tuned interpreter settings for the model: num_threads, use_xnnpack, batch_size
+
+    objective is 'latency' (single images, the app) or 'throughput' (batch
+    workers). Falls back to DEFAULT_RUNTIME_SETTINGS when the profile is
+    missing, unreadable or was tuned for a different model file.
+    """
+    settings = dict(DEFAULT_RUNTIME_SETTINGS, source=None)
+    profile_path = runtime_profile_path(model_path)
+    if not os.path.exists(profile_path):
+        return settings
+
+    try:
+        with open(profile_path) as f:
+            profile = json.load(f)
+        tuned = profile['objectives'][objective]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"⚠️  Ignoring runtime profile {profile_path}: {e}")
+        return settings
+
+    from conversion_cache import hash_file
+    if os.path.exists(model_path) and profile.get('modelSha256') != hash_file(model_path):
+        print(f"⚠️  Ignoring runtime profile {profile_path}: tuned for a different model, rerun autotune_runtime.py")
+        return settings
+
+    # A profile tuned on a bigger machine must not oversubscribe this one
+    settings['num_threads'] = max(1, min(int(tuned['numThreads']), os.cpu_count() or 1))
+    settings['use_xnnpack'] = bool(tuned['useXnnpack'])
+    settings['batch_size'] = max(1, int(tuned['batchSize']))
+    settings['source'] = profile_path
+    return settings
+
+def predict_tflite(model_path, images, batch_size=32):
+    """Probabilities for a uint8 image array from a TFLite model"""
+    from batch_classify import BatchInterpreter
+    interpreter = BatchInterpreter(model_path)
+    return np.concatenate([
+        interpreter.predict(images[i:i + batch_size]) for i in range(0, len(images), batch_size)
+    ])
+
+def top_k_predictions(probabilities, labels, k=3):
+    """Top-k {foodName, confidence} dicts, same shape as FoodPrediction"""
+    top_indices = np.argsort(probabilities)[-k:][::-1]
+    return [
+        {'foodName': labels[idx], 'confidence': round(float(probabilities[idx]), 6)}
+        for idx in top_indices
+    ]
+
+def classification_result(predictions):
+    """Top-k predictions in the FoodClassificationResult shape used by the app"""
+    return {
+        'primaryPrediction': predictions[0]['foodName'],
+        'confidence': predictions[0]['confidence'],
+        'topPredictions': predictions,
+    }
+
+def load_labeled_images(data_dir, samples_per_class=None, img_size=IMG_SIZE, class_names=None, seed=0):
+    """Load a <data_dir>/<class name>/ image set into memory
+
+    Returns (images, labels, paths) with images as a uint8 (N, H, W, 3)
+    array. Unreadable files are skipped.
+    """
+    images_by_class = list_class_images(data_dir, class_names)
+    if samples_per_class is None:
+        samples_per_class = max((len(paths) for paths in images_by_class.values()), default=0)
+    samples = stratified_sample(images_by_class, samples_per_class, seed)
+
+    images, labels, paths = [], [], []
+    for image_path, class_index in samples:
+        try:
+            images.append(load_image(image_path, img_size))
+        except Exception as e:
+            print(f"⚠️  Skipping unreadable image {image_path}: {e}")
+            continue
+        labels.append(class_index)
+        paths.append(image_path)
+
+    if not images:
+        raise ValueError(f"No images found in: {data_dir}")
+
+    return np.stack(images), np.asarray(labels), paths
@@ -0,0 +1,453 @@
+# Food Classification Inference Server
+# Small asyncio HTTP service around the TFLite model for web uploads and
+# backlog jobs. Concurrent requests are queued and coalesced into micro-batches
+# (up to --max-batch-size, waiting at most --max-wait-ms) that run on a pool of
+# pre-allocated interpreters. Re-uploaded and near-duplicate images are served
+# from a perceptual-hash classification cache without touching the queue.
+# Responses use the app's FoodClassificationResult shape. Only the stdlib,
+# NumPy, Pillow and the TFLite runtime are needed.
+#
+#   python inference_server.py serve --model food_classifier.tflite
+#   curl --data-binary @meal.jpg http://127.0.0.1:8080/classify
+#   python inference_server.py loadgen --images test_images --concurrency 32
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from batch_classify import BatchInterpreter, InterpreterPool
+from classification_cache import (
+    DEFAULT_MAX_DISTANCE, DEFAULT_MAX_ENTRIES, DEFAULT_TTL_SECONDS, HASH_FUNCTIONS, ClassificationCache
+)
+from food_model_utils import (
+    classification_result, list_images, load_class_labels, load_image, load_runtime_settings,
+    top_k_predictions
+)
+
+MAX_BODY_BYTES = 20 * 1024 * 1024
+
+STATUS_TEXT = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+               413: 'Payload Too Large', 500: 'Internal Server Error', 503: 'Service Unavailable'}
+
+def batch_buckets(max_batch_size):
+    """Padded batch sizes: powers of two up to max_batch_size, plus max_batch_size itself"""
+    buckets, size = [], 1
+    while size < max_batch_size:
+        buckets.append(size)
+        size *= 2
+    return buckets + [max_batch_size]
+
+class BucketedInterpreter:
+    """One pre-allocated BatchInterpreter per batch bucket, so serving never reallocates tensors
+
+    Batches are zero-padded up to the next bucket size.
+    """
+
+    def __init__(self, model_path, num_threads=1, use_xnnpack=True, buckets=(1,)):
+        self.buckets = sorted(buckets)
+        self.interpreters = {}
+        for bucket in self.buckets:
+            interpreter = BatchInterpreter(model_path, num_threads, use_xnnpack)
+            # Allocates tensors for this batch size and warms up the kernels
+            interpreter.predict(np.zeros((bucket, interpreter.img_size, interpreter.img_size, 3), np.uint8))
+            self.interpreters[bucket] = interpreter
+        self.img_size = self.interpreters[self.buckets[0]].img_size
+
+    def predict(self, images):
+        count = len(images)
+        bucket = next((size for size in self.buckets if size >= count), None)
+        if bucket is None:
+            raise ValueError(f"Batch of {count} exceeds the largest bucket {self.buckets[-1]}")
+        if bucket > count:
+            padding = np.zeros((bucket - count,) + images.shape[1:], dtype=images.dtype)
+            images = np.concatenate([images, padding])
+        return self.interpreters[bucket].predict(images)[:count]
+
+def percentiles(values):
+    if not values:
+        return {'p50_ms': None, 'p90_ms': None, 'p99_ms': None, 'max_ms': None}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'p50_ms': round(float(p50), 3), 'p90_ms': round(float(p90), 3),
+            'p99_ms': round(float(p99), 3), 'max_ms': round(float(max(values)), 3)}
+
+class ServerMetrics:
+    """Request counters, queue depth / batch size histograms and recent latencies"""
+
+    def __init__(self, window=10000):
+        self.started = time.time()
+        self.counters = Counter()
+        self.batch_sizes = Counter()
+        # Queue depth seen by each arriving request, in power-of-two buckets
+        self.queue_depths = Counter()
+        self.latency_ms = deque(maxlen=window)
+        self.queue_wait_ms = deque(maxlen=window)
+        self.inference_ms = deque(maxlen=window)
+
+    def record_enqueue(self, depth):
+        self.queue_depths[0 if depth == 0 else 1 << (depth.bit_length() - 1)] += 1
+
+    def record_batch(self, size, queue_waits_ms, inference_ms):
+        self.counters['batches'] += 1
+        self.batch_sizes[size] += 1
+        self.queue_wait_ms.extend(queue_waits_ms)
+        self.inference_ms.append(inference_ms)
+
+    def snapshot(self, queue_depth):
+        batches = self.counters['batches']
+        return {
+            'uptime_s': round(time.time() - self.started, 1),
+            'requests': dict(self.counters),
+            'queue_depth': queue_depth,
+            'queue_depth_histogram': {str(depth): count for depth, count in sorted(self.queue_depths.items())},
+            'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+            'mean_batch_size': round(sum(size * count for size, count in self.batch_sizes.items())
+                                     / batches, 2) if batches else None,
+            'latency': percentiles(list(self.latency_ms)),
+            'queue_wait': percentiles(list(self.queue_wait_ms)),
+            'batch_inference': percentiles(list(self.inference_ms)),
+        }
+
+class MicroBatcher:
+    """Coalesces queued images into batches and runs them on the interpreter pool"""
+
+    def __init__(self, pool, workers, max_batch_size=16, max_wait_ms=5.0, max_queue=256, metrics=None):
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_queue = max_queue
+        self.metrics = metrics or ServerMetrics()
+        self.queue = asyncio.Queue()
+        # One batch in flight per interpreter; the rest wait in the queue
+        self.slots = asyncio.Semaphore(workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._batch_loop())
+
+    async def submit(self, image):
+        """Queue one uint8 image and wait for its probabilities"""
+        depth = self.queue.qsize()
+        if depth >= self.max_queue:
+            raise OverflowError(f"Queue full ({depth} requests waiting)")
+        self.metrics.record_enqueue(depth)
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((image, future, time.perf_counter()))
+        return await future
+
+    async def _batch_loop(self):
+        while True:
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            # The deadline is counted from when the oldest request arrived
+            deadline = batch[0][2] + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    if self.queue.empty():
+                        break
+                    batch.append(self.queue.get_nowait())
+                    continue
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            asyncio.create_task(self._run_batch(batch))
+
+    def _predict(self, images):
+        interpreter = self.pool.acquire()
+        try:
+            return interpreter.predict(images)
+        finally:
+            self.pool.release(interpreter)
+
+    async def _run_batch(self, batch):
+        try:
+            dispatched = time.perf_counter()
+            images = np.stack([image for image, _, _ in batch])
+            probabilities = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._predict, images
+            )
+            self.metrics.record_batch(len(batch),
+                                      [(dispatched - queued) * 1000 for _, _, queued in batch],
+                                      (time.perf_counter() - dispatched) * 1000)
+            for (_, future, _), row in zip(batch, probabilities):
+                if not future.done():
+                    future.set_result(row)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.slots.release()
+
+async def read_http_message(reader):
+    """Read one HTTP/1.1 request or response: (start line, lower-cased headers, body)"""
+    start_line = await reader.readline()
+    if not start_line:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    length = int(headers.get('content-length', 0))
+    if length > MAX_BODY_BYTES:
+        raise OverflowError(f"Body of {length} bytes exceeds {MAX_BODY_BYTES}")
+    body = await reader.readexactly(length) if length else b''
+    return start_line.decode('latin-1').strip(), headers, body
+
+def http_response(status, payload):
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n")
+    return head.encode('latin-1') + body
+
+class InferenceServer:
+    """HTTP front end: POST /classify (raw image bytes), GET /metrics, GET /healthz"""
+
+    def __init__(self, batcher, labels, img_size, top_k=3, decode_threads=4, cache=None):
+        self.batcher = batcher
+        self.labels = labels
+        self.img_size = img_size
+        self.top_k = top_k
+        self.cache = cache
+        self.decode_pool = ThreadPoolExecutor(max_workers=decode_threads)
+
+    def _decode(self, body):
+        image = load_image(io.BytesIO(body), self.img_size)
+        return image, self.cache.hash_image(image) if self.cache is not None else None
+
+    async def classify(self, body):
+        metrics = self.batcher.metrics
+        start = time.perf_counter()
+        try:
+            image, key = await asyncio.get_running_loop().run_in_executor(self.decode_pool, self._decode, body)
+        except Exception as e:
+            metrics.counters['bad_request'] += 1
+            return 400, {'error': f"Could not decode image: {e}"}
+
+        probabilities = self.cache.get(key) if self.cache is not None else None
+        if probabilities is not None:
+            metrics.counters['cache_hits'] += 1
+            metrics.counters['classified'] += 1
+            metrics.latency_ms.append((time.perf_counter() - start) * 1000)
+            return 200, classification_result(top_k_predictions(probabilities, self.labels, self.top_k))
+
+        try:
+            probabilities = await self.batcher.submit(image)
+        except OverflowError as e:
+            metrics.counters['rejected'] += 1
+            return 503, {'error': str(e)}
+        except Exception as e:
+            metrics.counters['failed'] += 1
+            return 500, {'error': str(e)}
+
+        if self.cache is not None:
+            self.cache.put(key, probabilities)
+        metrics.counters['classified'] += 1
+        metrics.latency_ms.append((time.perf_counter() - start) * 1000)
+        return 200, classification_result(top_k_predictions(probabilities, self.labels, self.top_k))
+
+    async def route(self, method, path, body):
+        if path == '/classify':
+            if method != 'POST':
+                return 405, {'error': 'POST the image bytes to /classify'}
+            return await self.classify(body)
+        if path == '/metrics':
+            snapshot = self.batcher.metrics.snapshot(self.batcher.queue.qsize())
+            if self.cache is not None:
+                snapshot['cache'] = self.cache.snapshot()
+            return 200, snapshot
+        if path == '/healthz':
+            return 200, {'status': 'ok'}
+        return 404, {'error': f"Unknown path: {path}"}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    message = await read_http_message(reader)
+                except OverflowError as e:
+                    writer.write(http_response(413, {'error': str(e)}))
+                    break
+                if message is None:
+                    break
+                start_line, headers, body = message
+                method, path = start_line.split()[:2]
+                status, payload = await self.route(method, path.split('?')[0], body)
+                writer.write(http_response(status, payload))
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+async def serve(model_path, labels, host='127.0.0.1', port=8080, workers=2, num_threads=1,
+                max_batch_size=16, max_wait_ms=5.0, max_queue=256, top_k=3, cache=None, use_xnnpack=True):
+    buckets = batch_buckets(max_batch_size)
+    print(f"🤖 Loading {workers} worker(s) x {len(buckets)} batch sizes {buckets} from: {model_path}")
+    start = time.perf_counter()
+    pool = InterpreterPool(model_path, workers, num_threads,
+                           factory=partial(BucketedInterpreter, buckets=buckets), use_xnnpack=use_xnnpack)
+    probe = pool.acquire()
+    img_size = probe.img_size
+    pool.release(probe)
+    print(f"   Interpreters ready in {time.perf_counter() - start:.1f} s")
+
+    batcher = MicroBatcher(pool, workers, max_batch_size, max_wait_ms, max_queue)
+    batcher.start()
+    app = InferenceServer(batcher, labels, img_size, top_k, cache=cache)
+    server = await asyncio.start_server(app.handle_connection, host, port)
+    print(f"🚀 Serving on http://{host}:{port} (POST /classify, GET /metrics)")
+    async with server:
+        await server.serve_forever()
+
+async def http_request(reader, writer, host, method, path, body=b''):
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/octet-stream\r\nContent-Length: {len(body)}\r\n\r\n")
+                 .encode('latin-1') + body)
+    await writer.drain()
+    status_line, _, response = await read_http_message(reader)
+    return int(status_line.split()[1]), response
+
+async def run_loadgen(host, port, bodies, concurrency=16, duration=10.0):
+    """Closed-loop load: each connection sends its next request as soon as the last one returns"""
+    latencies, statuses = [], Counter()
+
+    async def client(seed):
+        rng = random.Random(seed)
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            while time.perf_counter() < stop_at:
+                start = time.perf_counter()
+                status, _ = await http_request(reader, writer, host, 'POST', '/classify', rng.choice(bodies))
+                statuses[status] += 1
+                if status == 200:
+                    latencies.append((time.perf_counter() - start) * 1000)
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    stop_at = start + duration
+    await asyncio.gather(*(client(seed) for seed in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    reader, writer = await asyncio.open_connection(host, port)
+    server_metrics = json.loads((await http_request(reader, writer, host, 'GET', '/metrics'))[1])
+    writer.close()
+
+    return {
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests': sum(statuses.values()),
+        'statuses': {str(status): count for status, count in statuses.items()},
+        'throughput_rps': len(latencies) / elapsed,
+        'latency': percentiles(latencies),
+        'server': server_metrics,
+    }
+
+def print_loadgen(result):
+    latency = result['latency']
+    server = result['server']
+    print(f"\n📊 {result['requests']} requests in {result['seconds']:.1f} s "
+          f"at concurrency {result['concurrency']}: {result['throughput_rps']:.1f} req/s")
+    print(f"   Statuses: {result['statuses']}")
+    if latency['p50_ms'] is not None:
+        print(f"   Latency: p50 {latency['p50_ms']:.1f} ms | p90 {latency['p90_ms']:.1f} ms | "
+              f"p99 {latency['p99_ms']:.1f} ms | max {latency['max_ms']:.1f} ms")
+    print(f"   Server mean batch size: {server['mean_batch_size']}")
+    if 'cache' in server:
+        print(f"   Server cache hit rate: {server['cache']['hit_rate']} ({server['cache']['entries']} entries)")
+    print(f"   Batch sizes: {server['batch_size_histogram']}")
+    print(f"   Queue depth on arrival: {server['queue_depth_histogram']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Food classification inference server with micro-batching")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="Run the HTTP inference server")
+    serve_parser.add_argument("--model", default="food_classifier.tflite", help="TFLite model path")
+    serve_parser.add_argument("--labels", default="class_indices.pkl", help="Class indices pickle")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                              help="Interpreters running batches in parallel")
+    serve_parser.add_argument("--num-threads", type=int, default=None,
+                              help="Threads per interpreter (default: runtime profile, else 1)")
+    serve_parser.add_argument("--xnnpack", choices=["on", "off"], default=None,
+                              help="XNNPACK delegate (default: runtime profile, else on)")
+    serve_parser.add_argument("--max-batch-size", type=int, default=16)
+    serve_parser.add_argument("--max-wait-ms", type=float, default=5.0,
+                              help="Longest a request waits for its batch to fill")
+    serve_parser.add_argument("--max-queue", type=int, default=256,
+                              help="Queued requests before new ones get 503")
+    serve_parser.add_argument("--top-k", type=int, default=3)
+    serve_parser.add_argument("--no-cache", action="store_true", help="Run the model for every request")
+    serve_parser.add_argument("--cache-distance", type=int, default=DEFAULT_MAX_DISTANCE,
+                              help="Largest Hamming distance between hashes served from the cache (0 = exact)")
+    serve_parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_ENTRIES, help="Cached images")
+    serve_parser.add_argument("--cache-ttl", type=float, default=DEFAULT_TTL_SECONDS,
+                              help="Seconds an entry stays valid")
+    serve_parser.add_argument("--hash-method", default="phash", choices=list(HASH_FUNCTIONS))
+
+    loadgen_parser = commands.add_parser("loadgen", help="Measure server throughput and tail latency")
+    loadgen_parser.add_argument("--images", required=True, help="Folder of images to send")
+    loadgen_parser.add_argument("--host", default="127.0.0.1")
+    loadgen_parser.add_argument("--port", type=int, default=8080)
+    loadgen_parser.add_argument("--concurrency", type=int, default=16, help="Parallel connections")
+    loadgen_parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load")
+    loadgen_parser.add_argument("--max-images", type=int, default=64, help="Distinct images to cycle through")
+    loadgen_parser.add_argument("--output", help="Optional JSON results path")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        print("🍽️  Food Classification Inference Server")
+        print("=" * 50)
+        runtime = load_runtime_settings(args.model, 'throughput')
+        if runtime['source']:
+            print(f"🎛️  Runtime profile: {runtime['num_threads']} thread(s), "
+                  f"XNNPACK {'on' if runtime['use_xnnpack'] else 'off'}")
+        use_xnnpack = runtime['use_xnnpack'] if args.xnnpack is None else args.xnnpack == 'on'
+        cache = None
+        if not args.no_cache:
+            cache = ClassificationCache(args.cache_size, args.cache_ttl, args.cache_distance, args.hash_method)
+        try:
+            asyncio.run(serve(args.model, load_class_labels(args.labels), args.host, args.port,
+                              args.workers, args.num_threads or runtime['num_threads'], args.max_batch_size,
+                              args.max_wait_ms, args.max_queue, args.top_k, cache, use_xnnpack))
+        except KeyboardInterrupt:
+            print("\n👋 Server stopped")
+    else:
+        image_paths = list_images(args.images)[:args.max_images]
+        if not image_paths:
+            print(f"❌ No images found in: {args.images}")
+            sys.exit(1)
+        bodies = []
+        for image_path in image_paths:
+            with open(image_path, 'rb') as f:
+                bodies.append(f.read())
+
+        print(f"🔥 Load test: {args.concurrency} connections for {args.duration:.0f} s, "
+              f"{len(bodies)} images -> http://{args.host}:{args.port}")
+        result = asyncio.run(run_loadgen(args.host, args.port, bodies, args.concurrency, args.duration))
+        print_loadgen(result)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(result, f, indent=2)
+            print(f"💾 Load test results saved to: {args.output}")
@@ -1,8 +1,16 @@
+import 'dart:convert';
 import 'dart:io';
+import 'package:crypto/crypto.dart';
+import 'package:flutter/services.dart' show rootBundle;
 // import 'package:tflite/tflite.dart';  // TODO: Uncomment for ML integration
 
 class FoodClassificationService {
   static bool _initialized = false;
+  static RuntimeProfile _runtimeProfile = const RuntimeProfile();
+
+  static const String _modelAsset = 'assets/models/food_classifier.tflite';
+  // Written by autotune_runtime.py next to the model
+  static const String _runtimeProfileAsset = 'assets/models/food_classifier.runtime.json';
   
   // Food categories from the training model
   static const List<String> _foodCategories = [
@@ -18,15 +26,16 @@ class FoodClassificationService {
     
     try {
       print('🤖 Initializing Food Classification Service...');
+      _runtimeProfile = await _loadRuntimeProfile();
       
       // TODO: Uncomment for real TensorFlow Lite integration
       /*
       String? result = await Tflite.loadModel(
-        model: "assets/models/food_classifier.tflite",
+        model: _modelAsset,
         labels: "", // We'll use our own labels
-        numThreads: 1,
+        numThreads: _runtimeProfile.numThreads,
         isAsset: true,
-        useGpuDelegate: false,
+        useGpuDelegate: _runtimeProfile.useGpuDelegate,
       );
       
       if (result != null) {
@@ -49,6 +58,36 @@ class FoodClassificationService {
     }
   }
 
+  /// Load the tuned interpreter settings, falling back to the defaults
+  ///
+  /// A profile tuned for another model file (not rerun after an export) or
+  /// with XNNPACK off, which the plugin can't turn off, is ignored.
+  static Future<RuntimeProfile> _loadRuntimeProfile() async {
+    try {
+      final profile = jsonDecode(await rootBundle.loadString(_runtimeProfileAsset));
+      final model = await rootBundle.load(_modelAsset);
+      final modelHash = sha256.convert(
+        model.buffer.asUint8List(model.offsetInBytes, model.lengthInBytes),
+      ).toString();
+      if (profile['modelSha256'] != modelHash) {
+        print('⚠️  Runtime profile was tuned for a different model, using defaults');
+        return const RuntimeProfile();
+      }
+
+      final latency = profile['objectives']['latency'];
+      if (latency['useXnnpack'] == false) {
+        print('⚠️  Runtime profile was tuned without XNNPACK, using defaults');
+        return const RuntimeProfile();
+      }
+      final runtimeProfile = RuntimeProfile.fromJson(latency);
+      print('🎛️  Runtime profile: $runtimeProfile');
+      return runtimeProfile;
+    } catch (e) {
+      print('⚠️  No runtime profile, using defaults: $e');
+      return const RuntimeProfile();
+    }
+  }
+
   /// Classify food image using AI model (currently demo mode)
   static Future<FoodClassificationResult?> classifyFood(File imageFile) async {
     if (!_initialized) {
@@ -413,6 +452,9 @@ The integration is 95% complete - just uncomment the ML code when ready!
   /// Check if real TensorFlow Lite model is loaded
   static bool get isRealAI => false; // Will be true when ML is enabled
 
+  /// Interpreter settings in use
+  static RuntimeProfile get runtimeProfile => _runtimeProfile;
+
   /// Get all supported food categories
   static List<String> get supportedFoods => List.unmodifiable(_foodCategories);
 
@@ -424,6 +466,31 @@ The integration is 95% complete - just uncomment the ML code when ready!
   }
 }
 
+/// Interpreter settings tuned by autotune_runtime.py for single-image latency
+class RuntimeProfile {
+  final int numThreads;
+  final bool useGpuDelegate;
+
+  const RuntimeProfile({
+    this.numThreads = 1,
+    this.useGpuDelegate = false,
+  });
+
+  factory RuntimeProfile.fromJson(Map<String, dynamic> json) {
+    final threads = (json['numThreads'] as num?)?.toInt() ?? 1;
+    return RuntimeProfile(
+      // Never ask for more threads than this device has
+      numThreads: threads.clamp(1, Platform.numberOfProcessors),
+      useGpuDelegate: json['useGpuDelegate'] as bool? ?? false,
+    );
+  }
+
+  @override
+  String toString() {
+    return 'RuntimeProfile(threads: $numThreads, gpu: $useGpuDelegate)';
+  }
+}
+
 /// Represents a food classification result
 class FoodClassificationResult {
   final String primaryPrediction;
@@ -0,0 +1,288 @@
+# Confidence-Gated Model Cascade
+# Most dishes are easy to recognise, so a small first-stage model (e.g. the
+# distilled student from distill_model.py) answers every image it is sure about
+# and only uncertain images escalate to the full 224px MobileNetV2. The gate is
+# the first stage's top-1 confidence or its top-1/top-2 margin.
+# `calibrate` runs both models once over a labeled validation set, replays every
+# threshold offline (escalation rate, mean latency, accuracy) and saves the
+# fastest threshold within the accuracy budget; `classify` uses that config.
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from food_model_utils import (
+    create_interpreter, dequantize_output, list_class_images, load_class_labels, load_image,
+    model_input_size, set_image_input, stratified_sample, top_k_predictions
+)
+
+GATE_CRITERIA = ('confidence', 'margin')
+DEFAULT_CONFIG = 'cascade_config.json'
+
+def gate_scores(probabilities, criterion='confidence'):
+    """First-stage certainty per image: top-1 probability, or top-1 minus top-2"""
+    top_two = np.sort(np.atleast_2d(probabilities), axis=1)[:, -2:]
+    if criterion == 'confidence':
+        return top_two[:, 1]
+    return top_two[:, 1] - top_two[:, 0]
+
+class CascadeStage:
+    """Single-image interpreter for one stage of the cascade"""
+
+    def __init__(self, model_path, num_threads=1):
+        self.model_path = model_path
+        self.interpreter = create_interpreter(model_path, num_threads=num_threads)
+        # None for fused preprocessing, which takes the decoded image as is
+        self.img_size = model_input_size(self.interpreter.get_input_details()[0])
+        self.output_detail = self.interpreter.get_output_details()[0]
+
+    def resize(self, image):
+        """uint8 image at this stage's input resolution"""
+        if self.img_size is None or image.shape[:2] == (self.img_size, self.img_size):
+            return image
+        resized = Image.fromarray(image).resize((self.img_size, self.img_size), Image.BILINEAR)
+        return np.asarray(resized, dtype=np.uint8)
+
+    def predict(self, image):
+        """Float probabilities for one uint8 image at this stage's resolution"""
+        set_image_input(self.interpreter, image[None, ...])
+        self.interpreter.invoke()
+        output = self.interpreter.get_tensor(self.output_detail['index'])
+        return dequantize_output(output, self.output_detail)[0]
+
+class CascadeClassifier:
+    """Small model first; the full model is loaded and run only for uncertain images"""
+
+    def __init__(self, small_model, full_model, threshold, criterion='confidence', num_threads=1):
+        if criterion not in GATE_CRITERIA:
+            raise ValueError(f"Unknown gate criterion: {criterion} (choose from {', '.join(GATE_CRITERIA)})")
+        self.small = CascadeStage(small_model, num_threads)
+        self.full_model = full_model
+        self.threshold = threshold
+        self.criterion = criterion
+        self.num_threads = num_threads
+        self._full = None
+        self.stats = {'first_stage': 0, 'escalated': 0}
+
+    @classmethod
+    def from_config(cls, config_path=DEFAULT_CONFIG, num_threads=1):
+        with open(config_path) as f:
+            config = json.load(f)
+        return cls(config['small_model'], config['full_model'], config['threshold'],
+                   config['criterion'], num_threads)
+
+    @property
+    def full(self):
+        if self._full is None:
+            self._full = CascadeStage(self.full_model, self.num_threads)
+        return self._full
+
+    def classify(self, image):
+        """(probabilities, stage name, gate score) for a uint8 image at its original size"""
+        probabilities = self.small.predict(self.small.resize(image))
+        score = float(gate_scores(probabilities, self.criterion)[0])
+        if score >= self.threshold:
+            self.stats['first_stage'] += 1
+            return probabilities, 'small', score
+        self.stats['escalated'] += 1
+        return self.full.predict(self.full.resize(image)), 'full', score
+
+def run_stages(small_model, full_model, data_dir, class_names, samples_per_class=None,
+               num_threads=1, warmup=3):
+    """Per-image probabilities and single-image latency of both models on labeled images
+
+    Every image is decoded once at its original size and resized per stage,
+    as in CascadeClassifier.classify.
+    """
+    stages = {'small': CascadeStage(small_model, num_threads), 'full': CascadeStage(full_model, num_threads)}
+    images_by_class = list_class_images(data_dir, class_names)
+    if samples_per_class is None:
+        samples_per_class = max((len(paths) for paths in images_by_class.values()), default=0)
+    samples = stratified_sample(images_by_class, samples_per_class)
+    if not samples:
+        raise ValueError(f"No images found in: {data_dir}")
+
+    probs = {name: [] for name in stages}
+    latency_ms = {name: [] for name in stages}
+    labels = []
+    for image_path, class_index in samples:
+        try:
+            image = load_image(image_path, img_size=None)
+        except Exception as e:
+            print(f"⚠️  Skipping unreadable image {image_path}: {e}")
+            continue
+        labels.append(class_index)
+        for name, stage in stages.items():
+            resized = stage.resize(image)
+            if len(labels) == 1:
+                # Kernel preparation and delegate setup happen on the first invokes
+                for _ in range(warmup):
+                    stage.predict(resized)
+            start = time.perf_counter()
+            probs[name].append(stage.predict(resized))
+            latency_ms[name].append((time.perf_counter() - start) * 1000)
+
+    if probs['small'][0].shape != probs['full'][0].shape:
+        raise ValueError(f"Models disagree on the number of classes: "
+                         f"{probs['small'][0].shape[0]} vs {probs['full'][0].shape[0]}")
+    return ({name: np.stack(values) for name, values in probs.items()},
+            {name: np.asarray(values) for name, values in latency_ms.items()},
+            np.asarray(labels))
+
+def _top_k_hits(labels, probs, k):
+    top_k = np.argsort(-probs, axis=1, kind='stable')[:, :k]
+    return np.any(top_k == labels[:, None], axis=1)
+
+def sweep_thresholds(probs, latency_ms, labels, thresholds, criterion='confidence'):
+    """Escalation rate, latency and accuracy of the cascade at each threshold"""
+    scores = gate_scores(probs['small'], criterion)
+    rows = []
+    for threshold in thresholds:
+        escalate = scores < threshold
+        cascade_probs = np.where(escalate[:, None], probs['full'], probs['small'])
+        cascade_ms = latency_ms['small'] + np.where(escalate, latency_ms['full'], 0.0)
+        answered = ~escalate
+        rows.append({
+            'threshold': float(threshold),
+            'escalation_rate': float(np.mean(escalate)),
+            'mean_ms': float(np.mean(cascade_ms)),
+            'p90_ms': float(np.percentile(cascade_ms, 90)),
+            'top1_accuracy': float(np.mean(_top_k_hits(labels, cascade_probs, 1))),
+            'top3_accuracy': float(np.mean(_top_k_hits(labels, cascade_probs, 3))),
+            # How often the first stage is right on the images it keeps
+            'first_stage_precision': (float(np.mean(_top_k_hits(labels[answered], probs['small'][answered], 1)))
+                                      if answered.any() else None),
+        })
+    return rows
+
+def stage_summary(probs, latency_ms, labels, name):
+    return {
+        'mean_ms': float(np.mean(latency_ms[name])),
+        'p90_ms': float(np.percentile(latency_ms[name], 90)),
+        'top1_accuracy': float(np.mean(_top_k_hits(labels, probs[name], 1))),
+        'top3_accuracy': float(np.mean(_top_k_hits(labels, probs[name], 3))),
+    }
+
+def pick_threshold(rows, full, max_accuracy_drop):
+    """Fastest threshold whose top-1 accuracy stays within max_accuracy_drop of the full model"""
+    within_budget = [row for row in rows if row['top1_accuracy'] >= full['top1_accuracy'] - max_accuracy_drop]
+    if not within_budget:
+        return None
+    return min(within_budget, key=lambda row: (row['mean_ms'], -row['top1_accuracy']))
+
+def print_sweep(rows, small, full, chosen):
+    print(f"\n{'':2}{'Threshold':>10}{'Escalated':>11}{'Mean ms':>9}{'p90 ms':>9}"
+          f"{'Speedup':>9}{'Top1 acc':>10}{'Top3 acc':>10}")
+    print("-" * 70)
+    for name, stage in (('small only', small), ('full only', full)):
+        print(f"  {name:>10}{'':>11}{stage['mean_ms']:>9.2f}{stage['p90_ms']:>9.2f}"
+              f"{full['mean_ms'] / stage['mean_ms']:>8.1f}x{stage['top1_accuracy']:>10.3f}{stage['top3_accuracy']:>10.3f}")
+    for row in rows:
+        marker = '★ ' if row is chosen else '  '
+        print(f"{marker}{row['threshold']:>10.2f}{row['escalation_rate']:>11.1%}{row['mean_ms']:>9.2f}"
+              f"{row['p90_ms']:>9.2f}{full['mean_ms'] / row['mean_ms']:>8.1f}x"
+              f"{row['top1_accuracy']:>10.3f}{row['top3_accuracy']:>10.3f}")
+    if chosen is not None:
+        print("\n★ = fastest threshold within the accuracy budget")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Confidence-gated small/full model cascade")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = commands.add_parser("calibrate", help="Pick the gate threshold on a validation set")
+    calibrate_parser.add_argument("--small-model", default="food_classifier_student.tflite",
+                                  help="First-stage TFLite model")
+    calibrate_parser.add_argument("--full-model", default="food_classifier.tflite", help="Full TFLite model")
+    calibrate_parser.add_argument("--val-dir", required=True, help="Validation images, one folder per class")
+    calibrate_parser.add_argument("--labels", default="class_indices.pkl", help="Class indices pickle")
+    calibrate_parser.add_argument("--samples-per-class", type=int, help="Limit validation images per class")
+    calibrate_parser.add_argument("--criterion", default="confidence", choices=GATE_CRITERIA,
+                                  help="Top-1 probability or top-1/top-2 margin")
+    calibrate_parser.add_argument("--step", type=float, default=0.05, help="Threshold grid spacing")
+    calibrate_parser.add_argument("--max-accuracy-drop", type=float, default=0.01,
+                                  help="Largest top-1 accuracy loss against the full model")
+    calibrate_parser.add_argument("--num-threads", type=int, default=1)
+    calibrate_parser.add_argument("--config", default=DEFAULT_CONFIG, help="Where to write the chosen gate")
+    calibrate_parser.add_argument("--report", default="cascade_report.json", help="JSON sweep report path")
+
+    classify_parser = commands.add_parser("classify", help="Classify images through the cascade")
+    classify_parser.add_argument("images", nargs="+", help="Image files to classify")
+    classify_parser.add_argument("--config", default=DEFAULT_CONFIG, help="Config written by calibrate")
+    classify_parser.add_argument("--labels", default="class_indices.pkl", help="Class indices pickle")
+    classify_parser.add_argument("--num-threads", type=int, default=1)
+    classify_parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    class_names = load_class_labels(args.labels)
+
+    if args.command == "calibrate":
+        print("🪜 Food Classifier Cascade Calibration")
+        print("=" * 50)
+        probs, latency_ms, labels = run_stages(args.small_model, args.full_model, args.val_dir, class_names,
+                                               args.samples_per_class, args.num_threads)
+        print(f"🖼️  {len(labels)} validation images")
+
+        thresholds = np.round(np.arange(0.0, 1.0 + args.step / 2, args.step), 6)
+        rows = sweep_thresholds(probs, latency_ms, labels, thresholds, args.criterion)
+        small = stage_summary(probs, latency_ms, labels, 'small')
+        full = stage_summary(probs, latency_ms, labels, 'full')
+        chosen = pick_threshold(rows, full, args.max_accuracy_drop)
+        print_sweep(rows, small, full, chosen)
+
+        report = {
+            'small_model': args.small_model,
+            'full_model': args.full_model,
+            'criterion': args.criterion,
+            'images': int(len(labels)),
+            'max_accuracy_drop': args.max_accuracy_drop,
+            'small': small,
+            'full': full,
+            'thresholds': rows,
+            'chosen': chosen,
+        }
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Sweep report saved to: {args.report}")
+
+        if chosen is None:
+            print(f"❌ No threshold keeps top-1 accuracy within {args.max_accuracy_drop:.1%} of the full model")
+            sys.exit(1)
+
+        config = {
+            'small_model': args.small_model,
+            'full_model': args.full_model,
+            'criterion': args.criterion,
+            'threshold': chosen['threshold'],
+            'expected': {key: chosen[key] for key in ('escalation_rate', 'mean_ms', 'top1_accuracy', 'top3_accuracy')},
+        }
+        with open(args.config, 'w') as f:
+            json.dump(config, f, indent=2)
+        print(f"✅ Gate: {args.criterion} >= {chosen['threshold']:.2f} escalates {chosen['escalation_rate']:.1%} "
+              f"of images, {full['mean_ms'] / chosen['mean_ms']:.1f}x faster than the full model")
+        print(f"💾 Cascade config saved to: {args.config}")
+    else:
+        cascade = CascadeClassifier.from_config(args.config, args.num_threads)
+        print(f"🪜 Cascade: {cascade.small.model_path} -> {cascade.full_model} "
+              f"({cascade.criterion} < {cascade.threshold:.2f} escalates)")
+
+        elapsed_ms = []
+        for image_path in args.images:
+            try:
+                image = load_image(image_path, img_size=None)
+            except Exception as e:
+                print(json.dumps({'path': image_path, 'error': str(e)}))
+                continue
+            start = time.perf_counter()
+            probabilities, stage, score = cascade.classify(image)
+            elapsed_ms.append((time.perf_counter() - start) * 1000)
+            print(json.dumps({'path': image_path, 'stage': stage, 'gateScore': round(score, 6),
+                              'predictions': top_k_predictions(probabilities, class_names, args.top_k)}))
+
+        if elapsed_ms:
+            total = cascade.stats['first_stage'] + cascade.stats['escalated']
+            print(f"\n⏱️  {total} images: {cascade.stats['escalated']} escalated "
+                  f"({cascade.stats['escalated'] / total:.1%}), mean {np.mean(elapsed_ms):.2f} ms per image")
@@ -0,0 +1,210 @@
+# Model Compression: Magnitude Pruning and Weight Clustering
+# Optional fine-tuning stage used by create_fresh_model. Pruning zeroes the
+# smallest weights (optionally in a structured 2:4 pattern), clustering then
+# shares a small set of centroid values per layer while keeping those zeros,
+# so the exported .tflite compresses far better for download.
+#
+# Needs tensorflow-model-optimization, which only supports the Keras 2 API:
+#   pip install tensorflow-model-optimization tf_keras
+# and TF_USE_LEGACY_KERAS=1 in the environment before tf.keras is first used
+# (use_legacy_keras() sets it; the --compress entry points call it).
+
+import gzip
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from benchmark_model import benchmark_config
+from convert_model import apply_recipe
+
+# Pruned weights are stored in the sparse format XNNPACK runs natively; it only
+# has sparse float kernels, so weights stay float and the zeros and shared
+# cluster values are what shrink the download
+COMPRESSED_RECIPE = {
+    'optimizations': ['EXPERIMENTAL_SPARSITY'],
+    'supported_ops': ['TFLITE_BUILTINS'],
+    'allow_custom_ops': False,
+}
+
+# Same converter settings without sparse encoding, for the unpruned baseline
+BASELINE_RECIPE = {
+    'supported_ops': ['TFLITE_BUILTINS'],
+    'allow_custom_ops': False,
+}
+
+def use_legacy_keras():
+    """Select the Keras 2 API for tfmot; TensorFlow reads this on the first tf.keras access"""
+    os.environ.setdefault('TF_USE_LEGACY_KERAS', '1')
+
+def compressible_layers():
+    # Conv2D covers the 1x1 expand/project convolutions that hold most weights.
+    # Looked up on use so importing this module doesn't pick the Keras version.
+    return (tf.keras.layers.Conv2D, tf.keras.layers.Dense)
+
+def load_tfmot():
+    """Import tensorflow_model_optimization, which needs the Keras 2 API"""
+    if not tf.keras.__name__.startswith('tf_keras'):
+        raise RuntimeError(
+            "Compression needs Keras 2: pip install tf_keras and set TF_USE_LEGACY_KERAS=1 "
+            "before tf.keras is first used"
+        )
+    try:
+        import tensorflow_model_optimization as tfmot
+    except ImportError:
+        raise ImportError("Compression needs tensorflow-model-optimization: "
+                          "pip install tensorflow-model-optimization")
+    return tfmot
+
+def _wrap_layers(model, wrap, skip_layers=()):
+    """Clone model wrapping every Conv2D/Dense layer, descending into nested models
+
+    tfmot only wraps layers of the model it is given, and the backbone is a
+    nested MobileNetV2 model, so nested models are cloned recursively.
+    """
+    def clone(layer):
+        if isinstance(layer, tf.keras.Model):
+            return _wrap_layers(layer, wrap, skip_layers)
+        if isinstance(layer, compressible_layers()) and layer.name not in skip_layers:
+            return wrap(layer)
+        return layer
+
+    return tf.keras.models.clone_model(model, clone_function=clone)
+
+def _fine_tune(model, train_ds, val_ds, epochs, learning_rate, callbacks=()):
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=learning_rate),
+        loss='categorical_crossentropy',
+        metrics=['accuracy']
+    )
+    model.fit(train_ds, validation_data=val_ds, epochs=epochs, callbacks=list(callbacks), verbose=2)
+
+def fine_tune_baseline(model, train_ds, val_ds=None, epochs=2, cluster_epochs=0,
+                       learning_rate=1e-4, cluster_learning_rate=1e-5):
+    """Copy of model fine-tuned like prune_model + cluster_model, without their wrappers
+
+    The unpruned baseline of the compression report, so that only the
+    pruning and clustering differ between the two models.
+    """
+    baseline = tf.keras.models.clone_model(model)
+    baseline.set_weights(model.get_weights())
+    for layer in baseline.layers:
+        layer.trainable = True
+    print(f"🏋️  Fine-tuning the unpruned baseline for {epochs + cluster_epochs} epochs")
+    _fine_tune(baseline, train_ds, val_ds, epochs, learning_rate)
+    if cluster_epochs:
+        _fine_tune(baseline, train_ds, val_ds, cluster_epochs, cluster_learning_rate)
+    return baseline
+
+def prune_model(model, train_ds, val_ds=None, epochs=2, target_sparsity=0.5,
+                sparsity_pattern=None, learning_rate=1e-4):
+    """Magnitude-prune Conv2D/Dense kernels while fine-tuning, then strip the wrappers
+
+    sparsity_pattern=(2, 4) prunes in the structured 2:4 pattern instead of
+    ramping up to target_sparsity. The classifier layer is left dense.
+    """
+    prune = load_tfmot().sparsity.keras
+
+    if sparsity_pattern:
+        prune_params = {'sparsity_m_by_n': tuple(sparsity_pattern)}
+        print(f"✂️  Pruning to {sparsity_pattern[0]}:{sparsity_pattern[1]} structured sparsity "
+              f"over {epochs} epochs")
+    else:
+        end_step = max(epochs * int(tf.data.experimental.cardinality(train_ds)) - 1, 1)
+        # Masks are only updated every `frequency` steps, so short runs still reach the target
+        prune_params = {'pruning_schedule': prune.PolynomialDecay(
+            initial_sparsity=0.0, final_sparsity=target_sparsity, begin_step=0, end_step=end_step,
+            frequency=min(100, max(end_step // 10, 1))
+        )}
+        print(f"✂️  Pruning to {target_sparsity:.0%} sparsity over {epochs} epochs")
+
+    pruned = _wrap_layers(model, lambda layer: prune.prune_low_magnitude(layer, **prune_params),
+                          skip_layers={model.layers[-1].name})
+    _fine_tune(pruned, train_ds, val_ds, epochs, learning_rate, [prune.UpdatePruningStep()])
+    return prune.strip_pruning(pruned)
+
+def cluster_model(model, train_ds, val_ds=None, epochs=1, num_clusters=16, learning_rate=1e-5):
+    """Cluster Conv2D/Dense kernels to num_clusters shared values, keeping pruned zeros"""
+    cluster = load_tfmot().clustering.keras
+
+    print(f"🎯 Clustering weights to {num_clusters} centroids over {epochs} epochs")
+    clustered = _wrap_layers(model, lambda layer: cluster.cluster_weights(
+        layer,
+        number_of_clusters=num_clusters,
+        cluster_centroids_init=cluster.CentroidInitialization.KMEANS_PLUS_PLUS,
+        preserve_sparsity=True
+    ), skip_layers={model.layers[-1].name})
+    _fine_tune(clustered, train_ds, val_ds, epochs, learning_rate)
+    # strip_clustering names every restored kernel plain 'kernel:0', which the
+    # H5 format can't save; a clone gets fresh, unique variable names
+    stripped = cluster.strip_clustering(clustered)
+    restored = tf.keras.models.clone_model(stripped)
+    restored.set_weights(stripped.get_weights())
+    return restored
+
+def iter_kernels(model):
+    """Yield (layer name, kernel array) for every Conv2D/Dense layer, nested models included"""
+    for layer in model.layers:
+        if isinstance(layer, tf.keras.Model):
+            yield from iter_kernels(layer)
+        elif isinstance(layer, compressible_layers()):
+            yield layer.name, layer.kernel.numpy()
+
+def model_sparsity(model):
+    """Fraction of zero kernel weights, plus the median number of distinct values per kernel"""
+    zeros = total = 0
+    unique_values = []
+    for _, kernel in iter_kernels(model):
+        zeros += int(np.sum(kernel == 0))
+        total += kernel.size
+        unique_values.append(np.unique(kernel).size)
+    return {'sparsity': zeros / total if total else 0.0,
+            'kernel_weights': total,
+            'median_unique_values': int(np.median(unique_values)) if unique_values else 0}
+
+def gzipped_size_mb(path):
+    """Size of a file after gzip, a proxy for app download size"""
+    with open(path, 'rb') as f:
+        return len(gzip.compress(f.read(), compresslevel=9)) / (1024 * 1024)
+
+def export_tflite(model, tflite_path, recipe):
+    converter = apply_recipe(tf.lite.TFLiteConverter.from_keras_model(model), recipe)
+    with open(tflite_path, 'wb') as f:
+        f.write(converter.convert())
+    return tflite_path
+
+def compression_report(baseline_model, compressed_model, baseline_path, compressed_path,
+                       val_ds=None, runs=50):
+    """Sparsity, raw/gzipped size, latency and accuracy of compressed vs baseline"""
+    rows = []
+    for label, model, path in (('baseline', baseline_model, baseline_path),
+                               ('compressed', compressed_model, compressed_path)):
+        timing = benchmark_config(path, num_threads=1, use_xnnpack=True, batch_sizes=(1,),
+                                  runs=runs, warmup=5)
+        row = {
+            'model': label,
+            'path': path,
+            **model_sparsity(model),
+            'size_mb': os.path.getsize(path) / (1024 * 1024),
+            'gzipped_mb': gzipped_size_mb(path),
+            'p50_ms': timing['latency']['p50_ms'],
+            'p90_ms': timing['latency']['p90_ms'],
+        }
+        if val_ds is not None:
+            model.compile(loss='categorical_crossentropy', metrics=['accuracy'])
+            row['val_accuracy'] = float(model.evaluate(val_ds, verbose=0)[1])
+        rows.append(row)
+    return rows
+
+def print_compression_report(rows):
+    print(f"\n{'Model':<12}{'Sparsity':>10}{'Unique':>8}{'Size MB':>9}{'Gzip MB':>9}"
+          f"{'p50 ms':>9}{'p90 ms':>9}{'Val acc':>9}")
+    print("-" * 75)
+    for row in rows:
+        print(f"{row['model']:<12}{row['sparsity']:>10.1%}{row['median_unique_values']:>8}"
+              f"{row['size_mb']:>9.2f}{row['gzipped_mb']:>9.2f}{row['p50_ms']:>9.2f}{row['p90_ms']:>9.2f}"
+              f"{row.get('val_accuracy', float('nan')):>9.3f}")
+
+    baseline, compressed = rows
+    print(f"\n📦 Download size: {baseline['gzipped_mb']:.2f} MB -> {compressed['gzipped_mb']:.2f} MB "
+          f"({(1 - compressed['gzipped_mb'] / baseline['gzipped_mb']) * 100:.0f}% smaller gzipped)")
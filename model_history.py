@@ -0,0 +1,257 @@
+# Model Performance History
+# Every export appends one record (model hash, converter config, size, op
+# counts, latency percentiles and accuracy) to model_history.jsonl, so size and
+# speed changes are tracked across builds instead of scrolling past in the
+# conversion log. `compare` checks a candidate record against a baseline within
+# tolerances and exits non-zero on regression; the export scripts run the same
+# check before replacing the model in assets/models/.
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from batch_classify import BatchInterpreter
+from benchmark_model import benchmark_models
+from conversion_cache import hash_file
+from food_model_utils import load_class_labels, load_labeled_images
+from op_audit import audit_ops
+from parity_check import top_k_accuracy
+
+DEFAULT_HISTORY = 'model_history.jsonl'
+DEFAULT_EVAL_DIR = 'eval_images'
+ASSETS_MODEL_PATH = 'assets/models/food_classifier.tflite'
+
+# Relative increase for size and latency, absolute drop for accuracy
+DEFAULT_TOLERANCES = {'size': 0.05, 'latency': 0.15, 'accuracy': 0.01}
+
+def git_commit():
+    """Short hash of the checked-out commit, None outside a git checkout"""
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def measure_model(tflite_path, eval_dir=None, samples_per_class=10, runs=50):
+    """Size, op counts, single-thread latency and (with eval_dir) accuracy of a .tflite model"""
+    audit = audit_ops(tflite_path)
+    # Fresh process, so the exporter's TensorFlow threads don't skew the timings
+    timing = benchmark_models([tflite_path], max_threads=1, batch_sizes=(1,), runs=runs,
+                              xnnpack_modes=(True,))[0]
+    if 'error' in timing:
+        raise RuntimeError(f"Benchmark failed for {tflite_path}: {timing['error']}")
+
+    accuracy = None
+    if eval_dir and os.path.isdir(eval_dir):
+        interpreter = BatchInterpreter(tflite_path)
+        images, labels = load_labeled_images(eval_dir, samples_per_class, interpreter.img_size,
+                                             load_class_labels())[:2]
+        probs = interpreter.predict(images)
+        accuracy = {
+            'eval_dir': eval_dir,
+            'images': int(len(labels)),
+            'top1': top_k_accuracy(labels, probs, 1),
+            'top3': top_k_accuracy(labels, probs, 3),
+        }
+
+    return {
+        'size_bytes': os.path.getsize(tflite_path),
+        'total_ops': audit['total_ops'],
+        'ops': {op['op']: op['count'] for op in audit['ops']},
+        'non_builtin_ops': sorted(op['op'] for op in audit['non_builtin_ops']),
+        'runtime': timing['runtime'],
+        'cold_load_ms': timing['cold_load_ms'],
+        'latency': {key: timing['latency'][key] for key in ('mean_ms', 'p50_ms', 'p90_ms', 'p99_ms')},
+        'accuracy': accuracy,
+    }
+
+def load_history(history_path=DEFAULT_HISTORY):
+    if not os.path.exists(history_path):
+        return []
+    with open(history_path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def record_model(tflite_path, source, converter_config=None, history_path=DEFAULT_HISTORY,
+                 eval_dir=DEFAULT_EVAL_DIR, samples_per_class=10, runs=50):
+    """Measure a model and append its record to the history file"""
+    print(f"📈 Measuring {tflite_path} for the model history...")
+    tensorflow = sys.modules.get('tensorflow')
+    record = {
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'source': source,
+        'model': tflite_path,
+        'model_sha256': hash_file(tflite_path),
+        'git_commit': git_commit(),
+        'tensorflow': getattr(tensorflow, '__version__', None),
+        'machine': f"{platform.node()} ({platform.machine()})",
+        'converter_config': converter_config,
+        **measure_model(tflite_path, eval_dir, samples_per_class, runs),
+    }
+    with open(history_path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+    print(f"   {record['model_sha256'][:12]}: {record['size_bytes'] / (1024 * 1024):.2f} MB, "
+          f"p50 {record['latency']['p50_ms']:.2f} ms"
+          + (f", top-1 {record['accuracy']['top1']:.3f}" if record['accuracy'] else '')
+          + f" -> {history_path}")
+    return record
+
+def select_record(records, selector):
+    """Find a record by 'latest', 'previous', '#<list index>' or model hash prefix (newest match wins)
+
+    Indexes need the '#' so all-digit hash prefixes still match by hash.
+    'latest' and 'previous' skip the 'deployed' records check_deployed adds,
+    which are appended after the export they were compared against.
+    """
+    if not records:
+        raise ValueError("Model history is empty")
+    if selector in ('latest', 'previous'):
+        exports = [record for record in records if record['source'] != 'deployed']
+        if selector == 'latest':
+            if not exports:
+                raise ValueError("Model history has no exports")
+            return exports[-1]
+        if len(exports) < 2:
+            raise ValueError("Model history has no previous export")
+        return exports[-2]
+    if selector.startswith('#'):
+        try:
+            return records[int(selector[1:])]
+        except ValueError:
+            raise ValueError(f"Invalid record index: {selector}")
+        except IndexError:
+            raise ValueError(f"No record at index {selector} ({len(records)} records)")
+    for record in reversed(records):
+        if record['model_sha256'].startswith(selector):
+            return record
+    raise ValueError(f"No record matches: {selector}")
+
+def compare_records(baseline, candidate, tolerances=DEFAULT_TOLERANCES):
+    """One row per tracked metric with the change and whether it exceeds its tolerance"""
+    def relative(metric, baseline_value, candidate_value, tolerance):
+        change = (candidate_value - baseline_value) / baseline_value if baseline_value else 0.0
+        return {'metric': metric, 'baseline': baseline_value, 'candidate': candidate_value,
+                'change': f"{change:+.1%}", 'regressed': change > tolerance}
+
+    rows = [relative('size_bytes', baseline['size_bytes'], candidate['size_bytes'], tolerances['size'])]
+    for key in ('p50_ms', 'p90_ms'):
+        rows.append(relative(f"latency {key}", baseline['latency'][key], candidate['latency'][key],
+                             tolerances['latency']))
+    rows.append({'metric': 'total_ops', 'baseline': baseline['total_ops'], 'candidate': candidate['total_ops'],
+                 'change': f"{candidate['total_ops'] - baseline['total_ops']:+d}", 'regressed': False})
+
+    new_ops = sorted(set(candidate['non_builtin_ops']) - set(baseline['non_builtin_ops']))
+    rows.append({'metric': 'non_builtin_ops', 'baseline': len(baseline['non_builtin_ops']),
+                 'candidate': len(candidate['non_builtin_ops']),
+                 'change': ', '.join(new_ops) or '-', 'regressed': bool(new_ops)})
+
+    # Accuracy is only comparable on the same evaluation set
+    base_accuracy, new_accuracy = baseline.get('accuracy'), candidate.get('accuracy')
+    if (base_accuracy and new_accuracy and base_accuracy['eval_dir'] == new_accuracy['eval_dir']
+            and base_accuracy['images'] == new_accuracy['images']):
+        for key in ('top1', 'top3'):
+            change = new_accuracy[key] - base_accuracy[key]
+            rows.append({'metric': f"accuracy {key}", 'baseline': base_accuracy[key],
+                         'candidate': new_accuracy[key], 'change': f"{change:+.3f}",
+                         'regressed': -change > tolerances['accuracy']})
+    return rows
+
+def print_comparison(rows, baseline, candidate):
+    print(f"\n🔎 Baseline  {baseline['model_sha256'][:12]} ({baseline['source']}, {baseline['recorded_at']})")
+    print(f"   Candidate {candidate['model_sha256'][:12]} ({candidate['source']}, {candidate['recorded_at']})")
+    if baseline.get('machine') != candidate.get('machine'):
+        print(f"⚠️  Measured on different machines ({baseline.get('machine')} vs {candidate.get('machine')}), "
+              f"latency is not comparable")
+    print(f"\n   {'Metric':<20}{'Baseline':>14}{'Candidate':>14}{'Change':>12}")
+    print("   " + "-" * 60)
+    for row in rows:
+        marker = '  ❌' if row['regressed'] else ''
+        baseline_value, candidate_value = (f"{value:.3f}" if isinstance(value, float) else str(value)
+                                           for value in (row['baseline'], row['candidate']))
+        print(f"   {row['metric']:<20}{baseline_value:>14}{candidate_value:>14}{row['change']:>12}{marker}")
+
+def check_deployed(candidate, assets_path=ASSETS_MODEL_PATH, history_path=DEFAULT_HISTORY,
+                   tolerances=DEFAULT_TOLERANCES, eval_dir=DEFAULT_EVAL_DIR):
+    """True if candidate may replace the model at assets_path without regressing
+
+    A deployed model missing from the history, or only recorded on another
+    machine, is measured and recorded here first so latency is comparable.
+    """
+    if not os.path.exists(assets_path):
+        return True
+    deployed_hash = hash_file(assets_path)
+    if deployed_hash == candidate['model_sha256']:
+        return True
+
+    baseline = next((record for record in reversed(load_history(history_path))
+                     if record['model_sha256'] == deployed_hash
+                     and record.get('machine') == candidate.get('machine')), None)
+    if baseline is None:
+        baseline = record_model(assets_path, 'deployed', history_path=history_path, eval_dir=eval_dir)
+
+    rows = compare_records(baseline, candidate, tolerances)
+    print_comparison(rows, baseline, candidate)
+    regressed = [row['metric'] for row in rows if row['regressed']]
+    if regressed:
+        print(f"❌ Regression against the deployed model ({', '.join(regressed)})")
+        return False
+    print("✅ No regression against the deployed model")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track exported model size, latency and accuracy across builds")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSONL history path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Measure a .tflite model and append it to the history")
+    record_parser.add_argument("model", help="TFLite model path")
+    record_parser.add_argument("--source", default="manual", help="What produced the model")
+    record_parser.add_argument("--eval-dir", default=DEFAULT_EVAL_DIR, help="Labeled images for accuracy")
+    record_parser.add_argument("--samples-per-class", type=int, default=10)
+    record_parser.add_argument("--runs", type=int, default=50, help="Timed runs for latency")
+
+    list_parser = commands.add_parser("list", help="Show recorded models")
+    list_parser.add_argument("--last", type=int, default=20, help="Number of records to show")
+
+    compare_parser = commands.add_parser("compare", help="Fail if the candidate regresses against the baseline")
+    compare_parser.add_argument("--baseline", default="previous",
+                                help="'latest' or 'previous' export, '#<index>' from list, or a model hash prefix")
+    compare_parser.add_argument("--candidate", default="latest", help="Same selectors as --baseline")
+    compare_parser.add_argument("--max-size-increase", type=float, default=DEFAULT_TOLERANCES['size'],
+                                help="Allowed relative size increase")
+    compare_parser.add_argument("--max-latency-increase", type=float, default=DEFAULT_TOLERANCES['latency'],
+                                help="Allowed relative p50/p90 latency increase")
+    compare_parser.add_argument("--max-accuracy-drop", type=float, default=DEFAULT_TOLERANCES['accuracy'],
+                                help="Allowed absolute top-1/top-3 accuracy drop")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record_model(args.model, args.source, history_path=args.history, eval_dir=args.eval_dir,
+                     samples_per_class=args.samples_per_class, runs=args.runs)
+    elif args.command == "list":
+        records = load_history(args.history)
+        print(f"{'#':>4}  {'Recorded':<25}{'Source':<24}{'Hash':<14}{'MB':>7}{'p50 ms':>9}{'Top1':>7}")
+        for index, record in list(enumerate(records))[-args.last:]:
+            accuracy = record['accuracy']['top1'] if record.get('accuracy') else None
+            print(f"{index:>4}  {record['recorded_at']:<25}{record['source']:<24}{record['model_sha256'][:12]:<14}"
+                  f"{record['size_bytes'] / (1024 * 1024):>7.2f}{record['latency']['p50_ms']:>9.2f}"
+                  + (f"{accuracy:>7.3f}" if accuracy is not None else f"{'-':>7}"))
+    else:
+        records = load_history(args.history)
+        try:
+            baseline = select_record(records, args.baseline)
+            candidate = select_record(records, args.candidate)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(2)
+        tolerances = {'size': args.max_size_increase, 'latency': args.max_latency_increase,
+                      'accuracy': args.max_accuracy_drop}
+        rows = compare_records(baseline, candidate, tolerances)
+        print_comparison(rows, baseline, candidate)
+        if any(row['regressed'] for row in rows):
+            print("\n❌ Regression beyond tolerance")
+            sys.exit(1)
+        print("\n✅ Within tolerance")
@@ -0,0 +1,275 @@
+# Vectorized Nutrition Aggregation
+# Loads the food_items nutrient columns into a dense NumPy matrix indexed by
+# food id, computes consumed nutrients for every food_intake_logs row with a
+# single gather-multiply per chunk, and rolls them up per patient / day /
+# meal_type in bulk. Works against a Postgres database built from
+# supabase/migrations or a local SQLite copy (see nutrition_db.py).
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+from nutrition_db import (
+    MEAL_TYPES, NUTRIENT_COLUMNS, QUANTITY_DIVISORS, connect, create_sqlite_schema,
+    day_expression, generate_synthetic_data, is_sqlite, placeholder
+)
+
+ROLLUP_LEVELS = {
+    'patient_day_meal': ('patient', 'day', 'meal_type'),
+    'patient_day': ('patient', 'day'),
+    'patient': ('patient',),
+}
+
+# Group keys pack (patient code, day number, meal code) into one int64
+MEAL_BITS = 3
+DAY_BITS = 20
+
+class NutrientMatrix:
+    """Dense (foods x nutrients) matrix with a food id -> row index"""
+
+    def __init__(self, food_ids, values, columns=NUTRIENT_COLUMNS):
+        self.food_ids = list(food_ids)
+        self.row_by_id = {food_id: row for row, food_id in enumerate(self.food_ids)}
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(self.food_ids), len(columns))
+        self.columns = tuple(columns)
+
+    def rows_for(self, food_ids):
+        """Matrix row of each food id, -1 for ids not in food_items"""
+        row_by_id = self.row_by_id
+        return np.fromiter((row_by_id.get(food_id, -1) for food_id in food_ids),
+                           dtype=np.int64, count=len(food_ids))
+
+    def consumed(self, rows, quantity, divisor=1.0):
+        """Consumed nutrients for every log: one gather and one broadcast multiply"""
+        return self.values[rows] * (np.asarray(quantity, dtype=np.float64) / divisor)[:, None]
+
+def load_nutrient_matrix(conn, columns=NUTRIENT_COLUMNS):
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT id, {', '.join(columns)} FROM food_items")
+    rows = cursor.fetchall()
+    return NutrientMatrix([str(row[0]) for row in rows],
+                          [[float(value or 0) for value in row[1:]] for row in rows], columns)
+
+def iter_log_chunks(conn, patient_id=None, start=None, end=None, chunk_size=200_000):
+    """Yield (patient ids, food ids, quantities, meal types, days) column lists per chunk"""
+    marker = placeholder(conn)
+    conditions, params = [], []
+    if patient_id:
+        conditions.append(f"patient_id = {marker}")
+        params.append(patient_id)
+    if start:
+        conditions.append(f"{day_expression(conn)} >= {marker}")
+        params.append(start)
+    if end:
+        conditions.append(f"{day_expression(conn)} <= {marker}")
+        params.append(end)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    # A plain psycopg cursor pulls the whole result set on execute; a named
+    # (server-side) cursor makes fetchmany stream it in chunks
+    cursor = conn.cursor() if is_sqlite(conn) else conn.cursor(name='intake_logs')
+    try:
+        cursor.execute(f"SELECT patient_id, food_item_id, quantity, meal_type, {day_expression(conn)} "
+                       f"FROM food_intake_logs{where}", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            patients, foods, quantities, meals, days = zip(*rows)
+            yield ([str(patient) for patient in patients], [str(food) for food in foods],
+                   np.asarray(quantities, dtype=np.float64), meals, days)
+    finally:
+        cursor.close()
+
+class NutritionRollup:
+    """Accumulates per (patient, day, meal_type) nutrient sums across chunks"""
+
+    def __init__(self, columns=NUTRIENT_COLUMNS):
+        self.columns = tuple(columns)
+        self.patient_code = {}
+        self.meal_code = {meal: code for code, meal in enumerate(MEAL_TYPES)}
+        self._keys, self._sums, self._counts = [], [], []
+        self.logs = 0
+        self.unknown_foods = 0
+
+    def _codes(self, values, codes):
+        return np.fromiter((codes.setdefault(value, len(codes)) for value in values),
+                           dtype=np.int64, count=len(values))
+
+    def add(self, patients, meals, days, consumed, known=None):
+        """Fold one chunk of consumed nutrients into per-group partial sums
+
+        known masks out logs whose food item is missing; consumed only has rows for the rest.
+        """
+        patient_codes = self._codes(patients, self.patient_code)
+        meal_codes = self._codes(meals, self.meal_code)
+        day_numbers = np.asarray(days, dtype='datetime64[D]').astype(np.int64)
+        keys = (((patient_codes << DAY_BITS) | day_numbers) << MEAL_BITS) | meal_codes
+        if known is not None:
+            self.unknown_foods += int(len(keys) - known.sum())
+            keys = keys[known]
+        self.logs += len(keys)
+
+        unique_keys, sums, counts = group_sums(keys, consumed)
+        self._keys.append(unique_keys)
+        self._sums.append(sums)
+        self._counts.append(counts)
+
+    def finest(self):
+        """(keys, nutrient sums, log counts) per patient/day/meal_type, merged across chunks"""
+        if not self._keys:
+            return np.zeros(0, np.int64), np.zeros((0, len(self.columns))), np.zeros(0, np.int64)
+        keys, sums, counts = group_sums(np.concatenate(self._keys), np.concatenate(self._sums),
+                                        np.concatenate(self._counts))
+        self._keys, self._sums, self._counts = [keys], [sums], [counts]
+        return keys, sums, counts
+
+    def rollup(self, levels=('patient', 'day', 'meal_type')):
+        """Columns {patient_id, day, meal_type, logs, <nutrients>} grouped by levels"""
+        keys, sums, counts = self.finest()
+        patient_codes = keys >> (DAY_BITS + MEAL_BITS)
+        day_numbers = (keys >> MEAL_BITS) & ((1 << DAY_BITS) - 1)
+        meal_codes = keys & ((1 << MEAL_BITS) - 1)
+
+        # Zero out the dropped levels and regroup the (small) finest-level table
+        coarse = np.zeros_like(keys)
+        if 'patient' in levels:
+            coarse |= patient_codes << (DAY_BITS + MEAL_BITS)
+        if 'day' in levels:
+            coarse |= day_numbers << MEAL_BITS
+        if 'meal_type' in levels:
+            coarse |= meal_codes
+        coarse_keys, coarse_sums, coarse_counts = group_sums(coarse, sums, counts)
+
+        columns = {}
+        if 'patient' in levels:
+            patient_ids = np.array(list(self.patient_code), dtype=object)
+            columns['patient_id'] = patient_ids[coarse_keys >> (DAY_BITS + MEAL_BITS)]
+        if 'day' in levels:
+            day_numbers = (coarse_keys >> MEAL_BITS) & ((1 << DAY_BITS) - 1)
+            columns['day'] = day_numbers.astype('datetime64[D]').astype(str)
+        if 'meal_type' in levels:
+            columns['meal_type'] = np.array(MEAL_TYPES, dtype=object)[coarse_keys & ((1 << MEAL_BITS) - 1)]
+        columns['logs'] = coarse_counts
+        rounded = np.round(coarse_sums, 2)
+        columns.update({column: rounded[:, i] for i, column in enumerate(self.columns)})
+        return columns
+
+def group_sums(keys, values, counts=None):
+    """Sum the rows of values (and counts) that share a key"""
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    sums = np.column_stack([np.bincount(inverse, weights=values[:, i], minlength=len(unique_keys))
+                            for i in range(values.shape[1])])
+    group_counts = np.bincount(inverse, weights=counts, minlength=len(unique_keys)).astype(np.int64)
+    return unique_keys, sums, group_counts
+
+def aggregate_nutrition(conn, quantity_unit='serving', patient_id=None, start=None, end=None,
+                        chunk_size=200_000):
+    """Consumed-nutrient rollup over every matching food_intake_logs row, plus timings"""
+    timings = {}
+    begin = time.perf_counter()
+    matrix = load_nutrient_matrix(conn)
+    timings['load_food_items_s'] = time.perf_counter() - begin
+
+    rollup = NutritionRollup(matrix.columns)
+    divisor = QUANTITY_DIVISORS[quantity_unit]
+    timings.update({'fetch_logs_s': 0.0, 'compute_s': 0.0})
+
+    fetch_start = time.perf_counter()
+    for patients, foods, quantities, meals, days in iter_log_chunks(conn, patient_id, start, end, chunk_size):
+        compute_start = time.perf_counter()
+        timings['fetch_logs_s'] += compute_start - fetch_start
+
+        rows = matrix.rows_for(foods)
+        known = rows >= 0
+        rollup.add(patients, meals, days, matrix.consumed(rows[known], quantities[known], divisor), known)
+
+        fetch_start = time.perf_counter()
+        timings['compute_s'] += fetch_start - compute_start
+    return rollup, timings
+
+def sql_calorie_rollup(conn, quantity_unit='serving'):
+    """Reference per (patient, day, meal_type) calories computed by the database"""
+    day = day_expression(conn, 'l.consumed_at')
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT l.patient_id, {day}, l.meal_type, SUM(f.calories * l.quantity) "
+                   f"FROM food_intake_logs l JOIN food_items f ON f.id = l.food_item_id "
+                   f"GROUP BY l.patient_id, {day}, l.meal_type")
+    divisor = QUANTITY_DIVISORS[quantity_unit]
+    return {(str(patient), day, meal): float(total) / divisor for patient, day, meal, total in cursor.fetchall()}
+
+def write_rollup_csv(columns, path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(columns))
+        writer.writerows(zip(*(values.tolist() for values in columns.values())))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Vectorized consumed-nutrient rollups for food_intake_logs")
+    parser.add_argument("--db", default="nutriveda.db", help="SQLite file or postgresql:// URL")
+    parser.add_argument("--quantity-unit", default="serving", choices=list(QUANTITY_DIVISORS),
+                        help="How food_intake_logs.quantity scales food_items nutrients")
+    parser.add_argument("--patient", help="Only this patient_id")
+    parser.add_argument("--start", help="First day (YYYY-MM-DD, UTC)")
+    parser.add_argument("--end", help="Last day (YYYY-MM-DD, UTC)")
+    parser.add_argument("--chunk-size", type=int, default=200_000, help="Logs fetched per chunk")
+    parser.add_argument("--output-dir", default="nutrition_rollups", help="Where to write the rollup CSVs")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Create the SQLite schema and fill it with this many random logs first")
+    parser.add_argument("--check", action="store_true",
+                        help="Compare calorie totals against a SQL GROUP BY")
+    args = parser.parse_args()
+
+    print("🥗 Nutrition Aggregation")
+    print("=" * 50)
+
+    conn = connect(args.db)
+    if args.synthetic:
+        if not is_sqlite(conn):
+            print("❌ --synthetic only writes to SQLite files")
+            sys.exit(1)
+        create_sqlite_schema(conn)
+        start = time.perf_counter()
+        generate_synthetic_data(conn, args.synthetic)
+        print(f"🧪 Generated {args.synthetic:,} synthetic logs in {time.perf_counter() - start:.1f} s")
+
+    rollup, timings = aggregate_nutrition(conn, args.quantity_unit, args.patient, args.start, args.end,
+                                          args.chunk_size)
+    os.makedirs(args.output_dir, exist_ok=True)
+    timings.update({'rollup_s': 0.0, 'write_csv_s': 0.0})
+    for name, levels in ROLLUP_LEVELS.items():
+        start = time.perf_counter()
+        columns = rollup.rollup(levels)
+        written = time.perf_counter()
+        write_rollup_csv(columns, os.path.join(args.output_dir, f"{name}.csv"))
+        timings['rollup_s'] += written - start
+        timings['write_csv_s'] += time.perf_counter() - written
+        print(f"   {name}: {len(columns['logs']):,} rows")
+
+    print(f"\n📊 {rollup.logs:,} logs from {len(rollup.patient_code):,} patients")
+    if rollup.unknown_foods:
+        print(f"⚠️  {rollup.unknown_foods:,} logs reference food items that no longer exist")
+    for name, seconds in timings.items():
+        print(f"   {name}: {seconds:.2f}")
+    if timings['compute_s'] > 0:
+        print(f"⚡ {rollup.logs / timings['compute_s']:,.0f} logs/s through the gather-multiply and grouping")
+
+    if args.check:
+        start = time.perf_counter()
+        reference = sql_calorie_rollup(conn, args.quantity_unit)
+        sql_seconds = time.perf_counter() - start
+        columns = rollup.rollup(ROLLUP_LEVELS['patient_day_meal'])
+        ours = dict(zip(zip(columns['patient_id'], columns['day'], columns['meal_type']),
+                        columns['calories'].tolist()))
+        mismatched = [key for key in reference if abs(reference[key] - ours.get(key, 0.0)) > 0.01]
+        if args.patient or args.start or args.end:
+            mismatched = [key for key in mismatched if key in ours]
+        print(f"\n🔎 SQL GROUP BY took {sql_seconds:.2f} s, {len(mismatched)} of {len(reference)} groups differ")
+        if mismatched:
+            sys.exit(1)
+
+    print(f"💾 Rollups saved to: {args.output_dir}/")
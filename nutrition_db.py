@@ -0,0 +1,308 @@
+# Nutrition Database Helpers
+# Connections and dialect details for the food_items / food_intake_logs tables
+# defined in supabase/migrations, a SQLite copy of that schema for local runs,
+# applying supabase/migrations to a plain Postgres, and synthetic data for
+# testing and benchmarks. SQLite needs nothing extra; postgresql:// URLs need psycopg
+# (pip install "psycopg[binary]").
+
+import os
+import random
+import re
+import sqlite3
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from food_model_utils import FOOD_CATEGORIES
+
+# food_items nutrient columns, per serving (RealDataService) or per 100 g (DatabaseService)
+NUTRIENT_COLUMNS = (
+    'calories', 'protein', 'carbohydrates', 'fat', 'fiber', 'sugar', 'sodium', 'potassium',
+    'calcium', 'iron', 'vitamin_a', 'vitamin_c', 'vitamin_d', 'vitamin_e', 'vitamin_k',
+    'thiamine', 'riboflavin', 'niacin', 'vitamin_b6', 'folate', 'vitamin_b12'
+)
+
+# food_intake_logs columns that store a pre-computed consumed amount
+CONSUMED_COLUMNS = {
+    'calories': 'calories_consumed',
+    'protein': 'protein_consumed',
+    'carbohydrates': 'carbs_consumed',
+    'fat': 'fat_consumed',
+}
+
+# daily_nutrition_summary nutrients and the diet_charts target each is compared against
+SUMMARY_TARGETS = {
+    'calories': 'target_calories',
+    'protein': 'target_protein',
+    'carbohydrates': 'target_carbs',
+    'fat': 'target_fat',
+    'fiber': 'target_fiber',
+}
+
+# Same order as the meal_type CHECK constraint
+MEAL_TYPES = ('breakfast', 'mid_morning', 'lunch', 'evening_snack', 'dinner', 'bedtime')
+
+# quantity is a serving multiplier in RealDataService and grams in DatabaseService
+QUANTITY_DIVISORS = {'serving': 1.0, 'grams': 100.0}
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS food_items (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    subcategory TEXT,
+    {', '.join(f'{column} NUMERIC NOT NULL DEFAULT 0' for column in NUTRIENT_COLUMNS)},
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS food_intake_logs (
+    id TEXT PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    food_item_id TEXT NOT NULL,
+    quantity NUMERIC NOT NULL,
+    meal_type TEXT NOT NULL CHECK (meal_type IN ({', '.join(f"'{meal}'" for meal in MEAL_TYPES)})),
+    consumed_at TEXT NOT NULL,
+    calories_consumed NUMERIC,
+    protein_consumed NUMERIC,
+    carbs_consumed NUMERIC,
+    fat_consumed NUMERIC,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS diet_charts (
+    id TEXT PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    dietitian_id TEXT,
+    name TEXT NOT NULL,
+    start_date TEXT NOT NULL,
+    end_date TEXT,
+    status TEXT DEFAULT 'draft',
+    {', '.join(f'{target} NUMERIC' for target in SUMMARY_TARGETS.values())},
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Same lookups as the Postgres indexes in supabase/migrations
+CREATE INDEX IF NOT EXISTS idx_food_intake_logs_patient_date ON food_intake_logs (patient_id, consumed_at);
+CREATE INDEX IF NOT EXISTS idx_diet_charts_patient ON diet_charts (patient_id);
+
+CREATE TABLE IF NOT EXISTS daily_nutrition_summary (
+    patient_id TEXT NOT NULL,
+    summary_date TEXT NOT NULL,
+    meal_type TEXT NOT NULL,
+    log_count INTEGER NOT NULL DEFAULT 0,
+    {', '.join(f'{column} NUMERIC NOT NULL DEFAULT 0' for column in SUMMARY_TARGETS)},
+    diet_chart_id TEXT,
+    {', '.join(f'pct_{target} NUMERIC' for target in SUMMARY_TARGETS.values())},
+    computed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (patient_id, summary_date, meal_type)
+);
+
+CREATE TABLE IF NOT EXISTS daily_nutrition_dirty_days (
+    patient_id TEXT NOT NULL,
+    summary_date TEXT,
+    touched_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS nutrition_rollup_state (
+    job TEXT PRIMARY KEY,
+    watermark TEXT,
+    last_run_at TEXT,
+    last_run_days INTEGER
+);
+
+CREATE TRIGGER IF NOT EXISTS food_intake_logs_dirty_insert AFTER INSERT ON food_intake_logs BEGIN
+    INSERT INTO daily_nutrition_dirty_days (patient_id, summary_date) VALUES (NEW.patient_id, substr(NEW.consumed_at, 1, 10));
+END;
+
+CREATE TRIGGER IF NOT EXISTS food_intake_logs_dirty_update AFTER UPDATE ON food_intake_logs BEGIN
+    INSERT INTO daily_nutrition_dirty_days (patient_id, summary_date) VALUES (OLD.patient_id, substr(OLD.consumed_at, 1, 10));
+    INSERT INTO daily_nutrition_dirty_days (patient_id, summary_date) VALUES (NEW.patient_id, substr(NEW.consumed_at, 1, 10));
+END;
+
+CREATE TRIGGER IF NOT EXISTS food_intake_logs_dirty_delete AFTER DELETE ON food_intake_logs BEGIN
+    INSERT INTO daily_nutrition_dirty_days (patient_id, summary_date) VALUES (OLD.patient_id, substr(OLD.consumed_at, 1, 10));
+END;
+
+CREATE TRIGGER IF NOT EXISTS diet_charts_dirty_insert AFTER INSERT ON diet_charts BEGIN
+    INSERT INTO daily_nutrition_dirty_days (patient_id, summary_date) VALUES (NEW.patient_id, NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS diet_charts_dirty_update AFTER UPDATE ON diet_charts BEGIN
+    INSERT INTO daily_nutrition_dirty_days (patient_id, summary_date) VALUES (OLD.patient_id, NULL);
+    INSERT INTO daily_nutrition_dirty_days (patient_id, summary_date) VALUES (NEW.patient_id, NULL);
+END;
+
+CREATE TRIGGER IF NOT EXISTS diet_charts_dirty_delete AFTER DELETE ON diet_charts BEGIN
+    INSERT INTO daily_nutrition_dirty_days (patient_id, summary_date) VALUES (OLD.patient_id, NULL);
+END;
+"""
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'supabase', 'migrations')
+
+# Stand-ins for the roles, schemas and auth objects a Supabase project
+# provides, so the migrations also apply to a plain local Postgres
+SUPABASE_SHIM_SQL = """
+DO $shim$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'postgres') THEN CREATE ROLE postgres; END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN CREATE ROLE anon NOLOGIN; END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'authenticated') THEN CREATE ROLE authenticated NOLOGIN; END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'service_role') THEN CREATE ROLE service_role NOLOGIN; END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_publication WHERE pubname = 'supabase_realtime') THEN
+        CREATE PUBLICATION supabase_realtime;
+    END IF;
+END
+$shim$;
+
+CREATE SCHEMA IF NOT EXISTS auth;
+CREATE SCHEMA IF NOT EXISTS extensions;
+CREATE SCHEMA IF NOT EXISTS graphql;
+CREATE SCHEMA IF NOT EXISTS vault;
+
+CREATE TABLE IF NOT EXISTS auth.users (
+    id uuid PRIMARY KEY,
+    email text,
+    raw_user_meta_data jsonb DEFAULT '{}'::jsonb
+);
+
+CREATE OR REPLACE FUNCTION auth.uid() RETURNS uuid LANGUAGE sql STABLE AS $uid$
+    SELECT nullif(current_setting('request.jwt.claim.sub', true), '')::uuid
+$uid$;
+
+CREATE SCHEMA IF NOT EXISTS supabase_migrations;
+CREATE TABLE IF NOT EXISTS supabase_migrations.schema_migrations (
+    version text PRIMARY KEY,
+    name text NOT NULL
+);
+"""
+
+CREATE_EXTENSION_PATTERN = re.compile(r'CREATE EXTENSION IF NOT EXISTS "([^"]+)"[^;]*;')
+
+def is_postgres_url(db):
+    return db.startswith(('postgres://', 'postgresql://'))
+
+def connect(db):
+    """Open a SQLite file or a postgresql:// URL"""
+    if is_postgres_url(db):
+        try:
+            import psycopg
+        except ImportError:
+            raise ImportError("Postgres support needs psycopg: pip install \"psycopg[binary]\"")
+        return psycopg.connect(db)
+    return sqlite3.connect(db)
+
+def is_sqlite(conn):
+    return isinstance(conn, sqlite3.Connection)
+
+def placeholder(conn):
+    """Query parameter marker for the connection's driver"""
+    return '?' if is_sqlite(conn) else '%s'
+
+def day_expression(conn, column='consumed_at'):
+    """SQL expression for the UTC calendar day of a timestamp, as 'YYYY-MM-DD' text"""
+    if is_sqlite(conn):
+        # consumed_at is stored as ISO-8601 UTC text
+        return f"substr({column}, 1, 10)"
+    return f"to_char({column} AT TIME ZONE 'UTC', 'YYYY-MM-DD')"
+
+def date_expression(conn, column='consumed_at'):
+    """SQL expression for the UTC calendar day of a timestamp, as a date (text on SQLite)"""
+    if is_sqlite(conn):
+        return f"substr({column}, 1, 10)"
+    return f"({column} AT TIME ZONE 'UTC')::date"
+
+def transaction(conn):
+    """Context manager that commits, or rolls back on error, on either driver
+
+    Postgres connections are expected to be in autocommit mode.
+    """
+    return conn if is_sqlite(conn) else conn.transaction()
+
+def apply_migrations(conn, migrations_dir=MIGRATIONS_DIR):
+    """Apply supabase/migrations/*.sql files not yet recorded as applied (Postgres only)
+
+    Supabase-only extensions that the server does not have are skipped.
+    Returns the names of the files applied.
+    """
+    conn.execute(SUPABASE_SHIM_SQL)
+    applied = {row[0] for row in conn.execute("SELECT version FROM supabase_migrations.schema_migrations")}
+    available = {row[0] for row in conn.execute("SELECT name FROM pg_available_extensions")}
+
+    def skip_unavailable(match):
+        return match.group(0) if match.group(1) in available else f"-- skipped: {match.group(0)}"
+
+    newly_applied = []
+    for name in sorted(os.listdir(migrations_dir)):
+        version = name.split('_', 1)[0]
+        if not name.endswith('.sql') or version in applied:
+            continue
+        with open(os.path.join(migrations_dir, name)) as f:
+            sql = CREATE_EXTENSION_PATTERN.sub(skip_unavailable, f.read())
+        with conn.transaction():
+            conn.execute(sql)
+            conn.execute("INSERT INTO supabase_migrations.schema_migrations (version, name) VALUES (%s, %s)",
+                         (version, name))
+        # Migrations may change session settings such as search_path
+        conn.execute("RESET ALL")
+        newly_applied.append(name)
+    return newly_applied
+
+def create_sqlite_schema(conn):
+    conn.executescript(SQLITE_SCHEMA)
+
+def random_uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+def generate_synthetic_data(conn, num_logs=100_000, num_patients=500, num_foods=200, days=90,
+                            seed=0, batch_size=50_000):
+    """Fill food_items and food_intake_logs with random but plausible rows
+
+    Consumed columns are left NULL, like logs written before they existed.
+    Each patient gets one active diet chart covering the whole period.
+    Returns (food ids, patient ids).
+    """
+    rng = random.Random(seed)
+    marker = placeholder(conn)
+
+    food_ids = [random_uuid(rng) for _ in range(num_foods)]
+    food_rows = []
+    for i, food_id in enumerate(food_ids):
+        name = FOOD_CATEGORIES[i % len(FOOD_CATEGORIES)]
+        if i >= len(FOOD_CATEGORIES):
+            name = f"{name} {i // len(FOOD_CATEGORIES)}"
+        nutrients = [round(rng.uniform(0, 500 if column == 'calories' else 50), 2)
+                     for column in NUTRIENT_COLUMNS]
+        food_rows.append((food_id, name, 'indian') + tuple(nutrients))
+
+    columns = ('id', 'name', 'category') + NUTRIENT_COLUMNS
+    cursor = conn.cursor()
+    cursor.executemany(
+        f"INSERT INTO food_items ({', '.join(columns)}) VALUES ({', '.join([marker] * len(columns))})",
+        food_rows
+    )
+
+    patient_ids = [random_uuid(rng) for _ in range(num_patients)]
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=days)
+    chart_columns = ('id', 'patient_id', 'name', 'start_date', 'status') + tuple(SUMMARY_TARGETS.values())
+    chart_rows = [(random_uuid(rng), patient_id, 'Synthetic plan', start.date().isoformat(), 'active',
+                   rng.randrange(1400, 2800), rng.randrange(40, 120), rng.randrange(150, 350),
+                   rng.randrange(40, 90), rng.randrange(20, 40))
+                  for patient_id in patient_ids]
+    cursor.executemany(
+        f"INSERT INTO diet_charts ({', '.join(chart_columns)}) VALUES ({', '.join([marker] * len(chart_columns))})",
+        chart_rows
+    )
+
+    insert_log = (f"INSERT INTO food_intake_logs (id, patient_id, food_item_id, quantity, meal_type, consumed_at) "
+                  f"VALUES ({', '.join([marker] * 6)})")
+
+    for offset in range(0, num_logs, batch_size):
+        rows = []
+        for _ in range(min(batch_size, num_logs - offset)):
+            consumed_at = start + timedelta(seconds=rng.randrange(days * 86400))
+            rows.append((random_uuid(rng), rng.choice(patient_ids), rng.choice(food_ids),
+                         round(rng.uniform(0.25, 3.0), 2), rng.choice(MEAL_TYPES),
+                         consumed_at.isoformat()))
+        cursor.executemany(insert_log, rows)
+    conn.commit()
+    return food_ids, patient_ids
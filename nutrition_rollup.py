@@ -0,0 +1,279 @@
+# Daily Nutrition Rollup
+# Maintains daily_nutrition_summary (supabase/migrations/20251001000000_daily_nutrition_summary.sql):
+# per patient / day / meal_type totals plus a 'total' row per day, each with its
+# % of the active diet chart's targets. Triggers on food_intake_logs and
+# diet_charts record which days changed; an incremental run claims those days,
+# recomputes only them and advances the job's watermark. --backfill rebuilds
+# every patient in parallel chunks. Works against Postgres or the SQLite copy
+# from nutrition_db.py.
+
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from nutrition_db import (
+    CONSUMED_COLUMNS, QUANTITY_DIVISORS, SUMMARY_TARGETS, connect, create_sqlite_schema,
+    date_expression, generate_synthetic_data, is_sqlite, placeholder, transaction
+)
+
+ROLLUP_JOB = 'daily_nutrition_summary'
+TOTAL_MEAL_TYPE = 'total'
+
+def open_connection(db):
+    """Connection for the rollup: autocommit Postgres, or SQLite that waits out other writers"""
+    conn = connect(db)
+    if is_sqlite(conn):
+        conn.execute("PRAGMA busy_timeout = 60000")
+        create_sqlite_schema(conn)
+    else:
+        conn.autocommit = True
+    return conn
+
+def create_scope_table(conn):
+    """Per-connection temp table holding the (patient, day) pairs to recompute; NULL day = all days"""
+    if is_sqlite(conn):
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS rollup_scope (patient_id TEXT NOT NULL, summary_date TEXT)")
+    else:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS rollup_scope (patient_id uuid NOT NULL, summary_date date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS rollup_scope_patient ON rollup_scope (patient_id, summary_date)")
+    conn.execute("DELETE FROM rollup_scope")
+
+def in_scope(conn, patient_column, date_column):
+    return (f"EXISTS (SELECT 1 FROM rollup_scope s WHERE s.patient_id = {patient_column} "
+            f"AND (s.summary_date IS NULL OR s.summary_date = {date_column}))")
+
+def summary_upsert_sql(conn, quantity_unit='serving', table='daily_nutrition_summary', upsert=True):
+    """INSERT ... SELECT rebuilding the summary rows of every day in rollup_scope
+
+    Uses the consumed amount stored on the log when present, else food_items
+    nutrients scaled by quantity.
+    """
+    day = date_expression(conn, 'l.consumed_at')
+    divisor = f"{QUANTITY_DIVISORS[quantity_unit]:.1f}"
+    nutrients = list(SUMMARY_TARGETS)
+
+    sums = []
+    for nutrient in nutrients:
+        computed = f"f.{nutrient} * l.quantity / {divisor}"
+        if nutrient in CONSUMED_COLUMNS:
+            computed = f"COALESCE(l.{CONSUMED_COLUMNS[nutrient]}, {computed})"
+        sums.append(f"SUM({computed}) AS {nutrient}")
+    percentages = [f"ROUND(100.0 * d.{nutrient} / NULLIF(c.{target}, 0), 1)"
+                   for nutrient, target in SUMMARY_TARGETS.items()]
+    pct_columns = [f"pct_{target}" for target in SUMMARY_TARGETS.values()]
+    updates = ['log_count', *nutrients, 'diet_chart_id', *pct_columns, 'computed_at']
+    on_conflict = (f"ON CONFLICT (patient_id, summary_date, meal_type) DO UPDATE SET "
+                   f"{', '.join(f'{column} = excluded.{column}' for column in updates)}") if upsert else ''
+
+    return f"""
+        WITH totals AS (
+            SELECT l.patient_id, {day} AS summary_date, l.meal_type, COUNT(*) AS log_count, {', '.join(sums)}
+            FROM food_intake_logs l JOIN food_items f ON f.id = l.food_item_id
+            WHERE {in_scope(conn, 'l.patient_id', day)}
+            GROUP BY l.patient_id, {day}, l.meal_type
+        ),
+        days AS (
+            SELECT patient_id, summary_date, meal_type, log_count, {', '.join(nutrients)} FROM totals
+            UNION ALL
+            SELECT patient_id, summary_date, '{TOTAL_MEAL_TYPE}', SUM(log_count),
+                   {', '.join(f'SUM({nutrient})' for nutrient in nutrients)}
+            FROM totals GROUP BY patient_id, summary_date
+        )
+        INSERT INTO {table} (patient_id, summary_date, meal_type, log_count,
+            {', '.join(nutrients)}, diet_chart_id, {', '.join(pct_columns)}, computed_at)
+        SELECT d.patient_id, d.summary_date, d.meal_type, d.log_count,
+               {', '.join(f'ROUND(d.{nutrient}, 2)' for nutrient in nutrients)},
+               c.id, {', '.join(percentages)}, CURRENT_TIMESTAMP
+        FROM days d
+        LEFT JOIN diet_charts c ON c.id = (
+            SELECT c2.id FROM diet_charts c2
+            WHERE c2.patient_id = d.patient_id AND c2.status = 'active'
+              AND c2.start_date <= d.summary_date
+              AND (c2.end_date IS NULL OR c2.end_date >= d.summary_date)
+            ORDER BY c2.start_date DESC LIMIT 1
+        )
+        WHERE TRUE
+        {on_conflict}
+    """
+
+def recompute(conn, scope, quantity_unit='serving'):
+    """Rebuild the summary rows for (patient_id, day or None) pairs; call inside a transaction
+
+    Days that no longer have logs lose their rows. Returns the number of rows written.
+    """
+    marker = placeholder(conn)
+    create_scope_table(conn)
+    conn.cursor().executemany(f"INSERT INTO rollup_scope (patient_id, summary_date) VALUES ({marker}, {marker})",
+                              scope)
+    if not is_sqlite(conn):
+        # Temp tables are never auto-analyzed; without stats the planner guesses badly
+        conn.execute("ANALYZE rollup_scope")
+    conn.execute(f"DELETE FROM daily_nutrition_summary WHERE "
+                 f"{in_scope(conn, 'daily_nutrition_summary.patient_id', 'daily_nutrition_summary.summary_date')}")
+    cursor = conn.execute(summary_upsert_sql(conn, quantity_unit))
+    # sqlite3 only reports rowcount for statements that start with INSERT
+    return conn.execute("SELECT changes()").fetchone()[0] if is_sqlite(conn) else cursor.rowcount
+
+def claim_dirty_days(conn):
+    """Remove and return the pending dirty days as (scope pairs, newest touched_at)
+
+    Changes committed after this point stay queued for the next run.
+    """
+    rows = conn.execute("DELETE FROM daily_nutrition_dirty_days "
+                        "RETURNING patient_id, summary_date, touched_at").fetchall()
+    whole_patients = {str(patient) for patient, day, _ in rows if day is None}
+    scope = {(patient, None) for patient in whole_patients}
+    scope.update((str(patient), day) for patient, day, _ in rows
+                 if day is not None and str(patient) not in whole_patients)
+    watermark = max((touched_at for _, _, touched_at in rows), default=None)
+    return sorted(scope, key=lambda pair: (pair[0], str(pair[1]))), watermark
+
+def record_run(conn, watermark, days):
+    """Advance the job's watermark (kept as-is when nothing was pending)"""
+    marker = placeholder(conn)
+    conn.execute(
+        f"INSERT INTO nutrition_rollup_state (job, watermark, last_run_at, last_run_days) "
+        f"VALUES ({marker}, {marker}, CURRENT_TIMESTAMP, {marker}) "
+        f"ON CONFLICT (job) DO UPDATE SET watermark = COALESCE(excluded.watermark, nutrition_rollup_state.watermark), "
+        f"last_run_at = excluded.last_run_at, last_run_days = excluded.last_run_days",
+        (ROLLUP_JOB, watermark, days)
+    )
+
+def load_watermark(conn):
+    row = conn.execute(f"SELECT watermark FROM nutrition_rollup_state WHERE job = {placeholder(conn)}",
+                       (ROLLUP_JOB,)).fetchone()
+    return row[0] if row else None
+
+def run_incremental(conn, quantity_unit='serving'):
+    """Recompute only the days touched since the last run, atomically with claiming them"""
+    with transaction(conn):
+        scope, watermark = claim_dirty_days(conn)
+        rows = recompute(conn, scope, quantity_unit) if scope else 0
+        record_run(conn, watermark, len(scope))
+    return {'scope': len(scope), 'whole_patients': sum(day is None for _, day in scope),
+            'rows': rows, 'watermark': watermark}
+
+def recompute_patients(db, patient_ids, quantity_unit='serving'):
+    """Rebuild every day of a chunk of patients on a dedicated connection"""
+    conn = open_connection(db)
+    try:
+        with transaction(conn):
+            return recompute(conn, [(patient_id, None) for patient_id in patient_ids], quantity_unit)
+    finally:
+        conn.close()
+
+def backfill(db, quantity_unit='serving', workers=4, chunk_patients=2000):
+    """Rebuild the whole summary table in parallel patient chunks"""
+    conn = open_connection(db)
+    # Everything pending is covered by the rebuild; later changes stay queued
+    with transaction(conn):
+        _, watermark = claim_dirty_days(conn)
+    patient_ids = sorted(str(row[0]) for row in conn.execute(
+        "SELECT patient_id FROM food_intake_logs UNION SELECT patient_id FROM daily_nutrition_summary"
+    ).fetchall())
+
+    chunks = [patient_ids[i:i + chunk_patients] for i in range(0, len(patient_ids), chunk_patients)]
+    print(f"🧱 Backfilling {len(patient_ids):,} patients in {len(chunks)} chunks with {workers} workers")
+    rows = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(recompute_patients, db, chunk, quantity_unit) for chunk in chunks]
+        for done, future in enumerate(as_completed(futures), 1):
+            rows += future.result()
+            if done % max(1, len(chunks) // 10) == 0 or done == len(chunks):
+                print(f"   {done}/{len(chunks)} chunks, {rows:,} rows")
+
+    with transaction(conn):
+        record_run(conn, watermark, len(patient_ids))
+    conn.close()
+    return {'patients': len(patient_ids), 'chunks': len(chunks), 'rows': rows}
+
+def read_daily_summary(conn, patient_id, start=None, end=None, meal_type=TOTAL_MEAL_TYPE):
+    """A patient's summary rows between two days: one primary-key range scan"""
+    marker = placeholder(conn)
+    conditions, params = [f"patient_id = {marker}", f"meal_type = {marker}"], [patient_id, meal_type]
+    if start:
+        conditions.append(f"summary_date >= {marker}")
+        params.append(start)
+    if end:
+        conditions.append(f"summary_date <= {marker}")
+        params.append(end)
+    columns = ['summary_date', 'log_count', *SUMMARY_TARGETS, *(f"pct_{t}" for t in SUMMARY_TARGETS.values())]
+    cursor = conn.execute(f"SELECT {', '.join(columns)} FROM daily_nutrition_summary "
+                          f"WHERE {' AND '.join(conditions)} ORDER BY summary_date", params)
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+def verify_summary(conn, quantity_unit='serving'):
+    """Compare every stored daily total against a fresh GROUP BY over the logs; returns mismatches"""
+    with transaction(conn):
+        create_scope_table(conn)
+        conn.execute("INSERT INTO rollup_scope (patient_id, summary_date) "
+                     "SELECT DISTINCT patient_id, NULL FROM food_intake_logs")
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS verify_summary AS "
+                     "SELECT * FROM daily_nutrition_summary WHERE FALSE")
+        conn.execute("DELETE FROM verify_summary")
+        conn.execute(summary_upsert_sql(conn, quantity_unit, table='verify_summary', upsert=False))
+        expected = {(str(patient), str(day)): (count, float(calories)) for patient, day, count, calories in
+                    conn.execute("SELECT patient_id, summary_date, log_count, calories FROM verify_summary "
+                                 f"WHERE meal_type = '{TOTAL_MEAL_TYPE}'").fetchall()}
+        stored = {(str(patient), str(day)): (count, float(calories)) for patient, day, count, calories in
+                  conn.execute("SELECT patient_id, summary_date, log_count, calories FROM daily_nutrition_summary "
+                               f"WHERE meal_type = '{TOTAL_MEAL_TYPE}'").fetchall()}
+    mismatched = [key for key in expected.keys() | stored.keys()
+                  if key not in expected or key not in stored
+                  or expected[key][0] != stored[key][0] or abs(expected[key][1] - stored[key][1]) > 0.01]
+    return mismatched, len(expected)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the daily_nutrition_summary rollup table")
+    parser.add_argument("--db", default="nutriveda.db", help="SQLite file or postgresql:// URL")
+    parser.add_argument("--backfill", action="store_true", help="Rebuild every patient instead of only dirty days")
+    parser.add_argument("--workers", type=int, default=4, help="Parallel connections for --backfill")
+    parser.add_argument("--chunk-patients", type=int, default=2000, help="Patients per --backfill chunk")
+    parser.add_argument("--quantity-unit", default="serving", choices=list(QUANTITY_DIVISORS),
+                        help="How food_intake_logs.quantity scales food_items nutrients")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Create the SQLite schema and fill it with this many random logs first")
+    parser.add_argument("--patient", help="Print this patient's daily totals after the run")
+    parser.add_argument("--verify", action="store_true",
+                        help="Check stored daily totals against a fresh aggregation of the logs")
+    args = parser.parse_args()
+
+    print("📅 Daily Nutrition Rollup")
+    print("=" * 50)
+
+    conn = open_connection(args.db)
+    if args.synthetic:
+        if not is_sqlite(conn):
+            print("❌ --synthetic only writes to SQLite files")
+            sys.exit(1)
+        start = time.perf_counter()
+        generate_synthetic_data(conn, args.synthetic)
+        print(f"🧪 Generated {args.synthetic:,} synthetic logs in {time.perf_counter() - start:.1f} s")
+
+    start = time.perf_counter()
+    if args.backfill:
+        result = backfill(args.db, args.quantity_unit, args.workers, args.chunk_patients)
+        print(f"✅ Backfilled {result['patients']:,} patients ({result['rows']:,} summary rows)")
+    else:
+        print(f"🔖 Watermark: {load_watermark(conn) or 'none (run --backfill first)'}")
+        result = run_incremental(conn, args.quantity_unit)
+        print(f"✅ Recomputed {result['scope']:,} dirty days/patients "
+              f"({result['whole_patients']:,} whole patients), {result['rows']:,} summary rows")
+        if result['watermark'] is not None:
+            print(f"   New watermark: {result['watermark']}")
+    print(f"⏱️  {time.perf_counter() - start:.2f} s")
+
+    if args.patient:
+        start = time.perf_counter()
+        days = read_daily_summary(conn, args.patient)
+        print(f"\n📋 {len(days)} days for {args.patient} read in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for day in days[-7:]:
+            target = f"{day['pct_target_calories']}% of target" if day['pct_target_calories'] is not None else 'no active chart'
+            print(f"   {day['summary_date']}: {float(day['calories']):8.1f} kcal, {day['log_count']} logs, {target}")
+
+    if args.verify:
+        mismatched, total = verify_summary(conn, args.quantity_unit)
+        print(f"\n🔎 {len(mismatched)} of {total:,} daily totals differ from a fresh aggregation")
+        if mismatched:
+            sys.exit(1)
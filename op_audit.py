@@ -0,0 +1,218 @@
+# TensorFlow Lite Op Audit
+# Parses a .tflite flatbuffer directly (no TensorFlow needed) and lists every
+# operator with its count and whether it is a builtin, a Flex (select TF) op
+# or a custom op. Flex ops force the app to ship the large Flex delegate and
+# run outside the optimized kernels, so --builtins-only fails on any of them.
+
+import argparse
+import json
+import struct
+import sys
+from collections import Counter
+
+# BuiltinOperator enum from the TFLite schema (schema.fbs)
+BUILTIN_OPERATORS = [
+    'ADD', 'AVERAGE_POOL_2D', 'CONCATENATION', 'CONV_2D', 'DEPTHWISE_CONV_2D',
+    'DEPTH_TO_SPACE', 'DEQUANTIZE', 'EMBEDDING_LOOKUP', 'FLOOR', 'FULLY_CONNECTED',
+    'HASHTABLE_LOOKUP', 'L2_NORMALIZATION', 'L2_POOL_2D', 'LOCAL_RESPONSE_NORMALIZATION', 'LOGISTIC',
+    'LSH_PROJECTION', 'LSTM', 'MAX_POOL_2D', 'MUL', 'RELU',
+    'RELU_N1_TO_1', 'RELU6', 'RESHAPE', 'RESIZE_BILINEAR', 'RNN',
+    'SOFTMAX', 'SPACE_TO_DEPTH', 'SVDF', 'TANH', 'CONCAT_EMBEDDINGS',
+    'SKIP_GRAM', 'CALL', 'CUSTOM', 'EMBEDDING_LOOKUP_SPARSE', 'PAD',
+    'UNIDIRECTIONAL_SEQUENCE_RNN', 'GATHER', 'BATCH_TO_SPACE_ND', 'SPACE_TO_BATCH_ND', 'TRANSPOSE',
+    'MEAN', 'SUB', 'DIV', 'SQUEEZE', 'UNIDIRECTIONAL_SEQUENCE_LSTM',
+    'STRIDED_SLICE', 'BIDIRECTIONAL_SEQUENCE_RNN', 'EXP', 'TOPK_V2', 'SPLIT',
+    'LOG_SOFTMAX', 'DELEGATE', 'BIDIRECTIONAL_SEQUENCE_LSTM', 'CAST', 'PRELU',
+    'MAXIMUM', 'ARG_MAX', 'MINIMUM', 'LESS', 'NEG',
+    'PADV2', 'GREATER', 'GREATER_EQUAL', 'LESS_EQUAL', 'SELECT',
+    'SLICE', 'SIN', 'TRANSPOSE_CONV', 'SPARSE_TO_DENSE', 'TILE',
+    'EXPAND_DIMS', 'EQUAL', 'NOT_EQUAL', 'LOG', 'SUM',
+    'SQRT', 'RSQRT', 'SHAPE', 'POW', 'ARG_MIN',
+    'FAKE_QUANT', 'REDUCE_PROD', 'REDUCE_MAX', 'PACK', 'LOGICAL_OR',
+    'ONE_HOT', 'LOGICAL_AND', 'LOGICAL_NOT', 'UNPACK', 'REDUCE_MIN',
+    'FLOOR_DIV', 'REDUCE_ANY', 'SQUARE', 'ZEROS_LIKE', 'FILL',
+    'FLOOR_MOD', 'RANGE', 'RESIZE_NEAREST_NEIGHBOR', 'LEAKY_RELU', 'SQUARED_DIFFERENCE',
+    'MIRROR_PAD', 'ABS', 'SPLIT_V', 'UNIQUE', 'CEIL',
+    'REVERSE_V2', 'ADD_N', 'GATHER_ND', 'COS', 'WHERE',
+    'RANK', 'ELU', 'REVERSE_SEQUENCE', 'MATRIX_DIAG', 'QUANTIZE',
+    'MATRIX_SET_DIAG', 'ROUND', 'HARD_SWISH', 'IF', 'WHILE',
+    'NON_MAX_SUPPRESSION_V4', 'NON_MAX_SUPPRESSION_V5', 'SCATTER_ND', 'SELECT_V2', 'DENSIFY',
+    'SEGMENT_SUM', 'BATCH_MATMUL', 'PLACEHOLDER_FOR_GREATER_OP_CODES', 'CUMSUM', 'CALL_ONCE',
+    'BROADCAST_TO', 'RFFT2D', 'CONV_3D', 'IMAG', 'REAL',
+    'COMPLEX_ABS', 'HASHTABLE', 'HASHTABLE_FIND', 'HASHTABLE_IMPORT', 'HASHTABLE_SIZE',
+    'REDUCE_ALL', 'CONV_3D_TRANSPOSE', 'VAR_HANDLE', 'READ_VARIABLE', 'ASSIGN_VARIABLE',
+    'BROADCAST_ARGS', 'RANDOM_STANDARD_NORMAL', 'BUCKETIZE', 'RANDOM_UNIFORM', 'MULTINOMIAL',
+    'GELU', 'DYNAMIC_UPDATE_SLICE', 'RELU_0_TO_1', 'UNSORTED_SEGMENT_PROD', 'UNSORTED_SEGMENT_MAX',
+    'UNSORTED_SEGMENT_SUM', 'ATAN2', 'UNSORTED_SEGMENT_MIN', 'SIGN',
+]
+CUSTOM_OPCODE = BUILTIN_OPERATORS.index('CUSTOM')
+
+# TensorType enum from the TFLite schema
+TENSOR_TYPES = [
+    'float32', 'float16', 'int32', 'uint8', 'int64', 'string', 'bool', 'int16',
+    'complex64', 'int8', 'float64', 'complex128', 'uint64', 'resource', 'variant',
+    'uint32', 'uint16', 'int4',
+]
+
+class FlatbufferReader:
+    """Minimal reader for the flatbuffer tables used by the TFLite schema"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def _unpack(self, fmt, pos):
+        return struct.unpack_from('<' + fmt, self.data, pos)[0]
+
+    def root(self):
+        return self._unpack('I', 0)
+
+    def _field_pos(self, table, field):
+        vtable = table - self._unpack('i', table)
+        vtable_size = self._unpack('H', vtable)
+        entry = 4 + 2 * field
+        if entry >= vtable_size:
+            return None
+        offset = self._unpack('H', vtable + entry)
+        return table + offset if offset else None
+
+    def scalar(self, table, field, fmt, default=0):
+        pos = self._field_pos(table, field)
+        return default if pos is None else self._unpack(fmt, pos)
+
+    def _deref(self, table, field):
+        pos = self._field_pos(table, field)
+        return None if pos is None else pos + self._unpack('I', pos)
+
+    def table(self, table, field):
+        return self._deref(table, field)
+
+    def string(self, table, field):
+        pos = self._deref(table, field)
+        if pos is None:
+            return None
+        length = self._unpack('I', pos)
+        return self.data[pos + 4:pos + 4 + length].decode('utf-8', errors='replace')
+
+    def tables(self, table, field):
+        pos = self._deref(table, field)
+        if pos is None:
+            return []
+        length = self._unpack('I', pos)
+        return [pos + 4 + 4 * i + self._unpack('I', pos + 4 + 4 * i) for i in range(length)]
+
+    def scalars(self, table, field, fmt='i'):
+        pos = self._deref(table, field)
+        if pos is None:
+            return []
+        length = self._unpack('I', pos)
+        return list(struct.unpack_from(f'<{length}{fmt}', self.data, pos + 4))
+
+def read_tflite_model(model_path):
+    """Parse operator codes, tensors and operators out of a .tflite file"""
+    with open(model_path, 'rb') as f:
+        data = f.read()
+    if data[4:8] != b'TFL3':
+        raise ValueError(f"Not a TFLite flatbuffer: {model_path}")
+
+    reader = FlatbufferReader(data)
+    model = reader.root()
+
+    operator_codes = []
+    for code in reader.tables(model, 1):
+        deprecated_code = reader.scalar(code, 0, 'b')
+        builtin_code = max(deprecated_code, reader.scalar(code, 3, 'i'))
+        custom_code = reader.string(code, 1)
+
+        if builtin_code == CUSTOM_OPCODE:
+            name = custom_code or 'CUSTOM'
+            kind = 'flex' if name.startswith('Flex') else 'custom'
+        else:
+            name = (BUILTIN_OPERATORS[builtin_code] if builtin_code < len(BUILTIN_OPERATORS)
+                    else f'BUILTIN_{builtin_code}')
+            kind = 'builtin'
+
+        operator_codes.append({'name': name, 'kind': kind, 'version': reader.scalar(code, 2, 'i', 1)})
+
+    subgraphs = []
+    for subgraph in reader.tables(model, 2):
+        tensors = []
+        for tensor in reader.tables(subgraph, 0):
+            tensor_type = reader.scalar(tensor, 1, 'b')
+            tensors.append({
+                'name': reader.string(tensor, 3),
+                'shape': reader.scalars(tensor, 0),
+                'type': TENSOR_TYPES[tensor_type] if tensor_type < len(TENSOR_TYPES) else str(tensor_type),
+            })
+        operators = [
+            {
+                'opcode_index': reader.scalar(op, 0, 'I'),
+                'inputs': reader.scalars(op, 1),
+                'outputs': reader.scalars(op, 2),
+            }
+            for op in reader.tables(subgraph, 3)
+        ]
+        subgraphs.append({
+            'name': reader.string(subgraph, 4),
+            'tensors': tensors,
+            'inputs': reader.scalars(subgraph, 1),
+            'outputs': reader.scalars(subgraph, 2),
+            'operators': operators,
+        })
+
+    return {'operator_codes': operator_codes, 'subgraphs': subgraphs}
+
+def audit_ops(model_path):
+    """Count every operator in the model by name and kind"""
+    model = read_tflite_model(model_path)
+    codes = model['operator_codes']
+
+    counts = Counter()
+    for subgraph in model['subgraphs']:
+        for op in subgraph['operators']:
+            code = codes[op['opcode_index']]
+            counts[(code['name'], code['kind'])] += 1
+
+    ops = [
+        {'op': name, 'kind': kind, 'count': count}
+        for (name, kind), count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    ]
+    non_builtin = [op for op in ops if op['kind'] != 'builtin']
+
+    return {
+        'model': model_path,
+        'total_ops': sum(counts.values()),
+        'ops': ops,
+        'non_builtin_ops': non_builtin,
+        'builtins_only': not non_builtin,
+    }
+
+def print_audit(audit):
+    print(f"🔍 Op audit: {audit['model']} ({audit['total_ops']} ops)")
+    print(f"   {'Op':<32}{'Kind':<10}{'Count':>6}")
+    for op in audit['ops']:
+        marker = '' if op['kind'] == 'builtin' else '  ⚠️'
+        print(f"   {op['op']:<32}{op['kind']:<10}{op['count']:>6}{marker}")
+    if audit['builtins_only']:
+        print("   ✅ Builtin ops only")
+    else:
+        names = ', '.join(op['op'] for op in audit['non_builtin_ops'])
+        print(f"   ⚠️  Non-builtin ops: {names}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the ops in a TFLite model")
+    parser.add_argument("models", nargs="+", help="TFLite model paths")
+    parser.add_argument("--builtins-only", action="store_true",
+                        help="Exit non-zero if any Flex or custom op is present")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    audits = [audit_ops(model_path) for model_path in args.models]
+
+    if args.json:
+        print(json.dumps(audits, indent=2))
+    else:
+        for audit in audits:
+            print_audit(audit)
+
+    if args.builtins_only and not all(audit['builtins_only'] for audit in audits):
+        sys.exit(1)
@@ -0,0 +1,194 @@
+# Keras vs TensorFlow Lite Parity Checker
+# Runs the source Keras model and a converted .tflite model over the same
+# real image batches and compares their outputs. Exits non-zero when the
+# converted model drifts past the configured thresholds, so a quantized
+# variant is only promoted when it is provably close to the original.
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from food_model_utils import (
+    list_class_images, load_class_labels, load_image, normalize_image, stratified_sample
+)
+
+def top_k_agreement(reference_probs, probs, k):
+    """Fraction of images whose reference top-1 class is in the other model's top-k"""
+    reference_top1 = np.argmax(reference_probs, axis=1)
+    top_k = np.argsort(-probs, axis=1, kind='stable')[:, :k]
+    return float(np.mean(np.any(top_k == reference_top1[:, None], axis=1)))
+
+def top_k_accuracy(labels, probs, k):
+    """Fraction of images whose true label is in the top-k predictions"""
+    top_k = np.argsort(-probs, axis=1, kind='stable')[:, :k]
+    return float(np.mean(np.any(top_k == labels[:, None], axis=1)))
+
+def confusion_matrix(labels, predictions, num_classes):
+    """Rows are true classes, columns are predicted classes"""
+    counts = np.bincount(labels * num_classes + predictions, minlength=num_classes * num_classes)
+    return counts.reshape(num_classes, num_classes)
+
+def kl_divergence(reference_probs, probs, eps=1e-7):
+    """Per-image KL(reference || other) in nats"""
+    # Renormalize, dequantized int8 outputs don't sum exactly to 1
+    p = np.clip(reference_probs, eps, None)
+    q = np.clip(probs, eps, None)
+    p = p / p.sum(axis=1, keepdims=True)
+    q = q / q.sum(axis=1, keepdims=True)
+    return np.sum(p * (np.log(p) - np.log(q)), axis=1)
+
+def parity_metrics(keras_probs, tflite_probs, labels, class_names):
+    """Agreement, divergence and per-class confusion deltas between two models"""
+    num_classes = len(class_names)
+    keras_pred = np.argmax(keras_probs, axis=1)
+    tflite_pred = np.argmax(tflite_probs, axis=1)
+    kl = kl_divergence(keras_probs, tflite_probs)
+    abs_error = np.abs(keras_probs - tflite_probs)
+
+    keras_confusion = confusion_matrix(labels, keras_pred, num_classes)
+    tflite_confusion = confusion_matrix(labels, tflite_pred, num_classes)
+    confusion_delta = tflite_confusion - keras_confusion
+
+    support = keras_confusion.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        keras_recall = np.where(support > 0, np.diag(keras_confusion) / support, np.nan)
+        tflite_recall = np.where(support > 0, np.diag(tflite_confusion) / support, np.nan)
+
+    per_class = []
+    for idx, name in enumerate(class_names):
+        if support[idx] == 0:
+            continue
+        per_class.append({
+            'class': name,
+            'support': int(support[idx]),
+            'keras_accuracy': float(keras_recall[idx]),
+            'tflite_accuracy': float(tflite_recall[idx]),
+            'accuracy_delta': float(tflite_recall[idx] - keras_recall[idx]),
+            'prediction_flips': int(np.sum((labels == idx) & (keras_pred != tflite_pred))),
+        })
+
+    return {
+        'images': int(len(labels)),
+        'top1_agreement': top_k_agreement(keras_probs, tflite_probs, 1),
+        'top3_agreement': top_k_agreement(keras_probs, tflite_probs, 3),
+        'keras_top1_accuracy': top_k_accuracy(labels, keras_probs, 1),
+        'tflite_top1_accuracy': top_k_accuracy(labels, tflite_probs, 1),
+        'mean_kl_divergence': float(np.mean(kl)),
+        'max_kl_divergence': float(np.max(kl)),
+        'max_abs_prob_error': float(np.max(abs_error)),
+        'mean_abs_prob_error': float(np.mean(abs_error)),
+        'max_class_accuracy_drop': float(-np.nanmin(tflite_recall - keras_recall)) if support.any() else 0.0,
+        'per_class': per_class,
+        'confusion_delta': confusion_delta.tolist(),
+    }
+
+def run_models(keras_model_path, tflite_model_path, samples, batch_size=32):
+    """Run both models over the same image batches"""
+    import tensorflow as tf
+    from batch_classify import BatchInterpreter
+
+    keras_model = tf.keras.models.load_model(keras_model_path)
+    interpreter = BatchInterpreter(tflite_model_path)
+    img_size = interpreter.img_size
+
+    keras_probs, tflite_probs, labels = [], [], []
+    for start in range(0, len(samples), batch_size):
+        images, batch_labels = [], []
+        for image_path, class_index in samples[start:start + batch_size]:
+            try:
+                images.append(load_image(image_path, img_size))
+                batch_labels.append(class_index)
+            except Exception as e:
+                print(f"⚠️  Skipping unreadable image {image_path}: {e}")
+        if not images:
+            continue
+
+        batch = np.stack(images)
+        keras_probs.append(np.asarray(keras_model.predict_on_batch(normalize_image(batch))))
+        tflite_probs.append(interpreter.predict(batch))
+        labels.extend(batch_labels)
+        print(f"   {len(labels)}/{len(samples)} images")
+
+    return np.concatenate(keras_probs), np.concatenate(tflite_probs), np.asarray(labels)
+
+def check_thresholds(metrics, thresholds):
+    """List of human-readable threshold violations"""
+    failures = []
+    if metrics['top1_agreement'] < thresholds['min_top1_agreement']:
+        failures.append(f"top-1 agreement {metrics['top1_agreement']:.4f} < {thresholds['min_top1_agreement']}")
+    if metrics['top3_agreement'] < thresholds['min_top3_agreement']:
+        failures.append(f"top-3 agreement {metrics['top3_agreement']:.4f} < {thresholds['min_top3_agreement']}")
+    if metrics['mean_kl_divergence'] > thresholds['max_mean_kl']:
+        failures.append(f"mean KL divergence {metrics['mean_kl_divergence']:.5f} > {thresholds['max_mean_kl']}")
+    if metrics['max_abs_prob_error'] > thresholds['max_abs_error']:
+        failures.append(f"max abs probability error {metrics['max_abs_prob_error']:.4f} > {thresholds['max_abs_error']}")
+    if metrics['max_class_accuracy_drop'] > thresholds['max_class_accuracy_drop']:
+        failures.append(f"per-class accuracy drop {metrics['max_class_accuracy_drop']:.4f} > "
+                        f"{thresholds['max_class_accuracy_drop']}")
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a TFLite model against its source Keras model")
+    parser.add_argument("--keras", default="food_classifier_final.h5", help="Source Keras/H5 model")
+    parser.add_argument("--tflite", default="food_classifier.tflite", help="Converted TFLite model")
+    parser.add_argument("--data-dir", required=True, help="Real images, one folder per class")
+    parser.add_argument("--samples-per-class", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-top1-agreement", type=float, default=0.98)
+    parser.add_argument("--min-top3-agreement", type=float, default=0.995)
+    parser.add_argument("--max-mean-kl", type=float, default=0.01)
+    parser.add_argument("--max-abs-error", type=float, default=0.10)
+    parser.add_argument("--max-class-accuracy-drop", type=float, default=0.05)
+    parser.add_argument("--output", default=None, help="Optional JSON report path")
+    args = parser.parse_args()
+
+    print("⚖️  Keras vs TFLite Parity Check")
+    print("=" * 50)
+
+    class_names = load_class_labels()
+    samples = stratified_sample(list_class_images(args.data_dir, class_names), args.samples_per_class)
+    if not samples:
+        print(f"❌ No images found in: {args.data_dir}")
+        sys.exit(2)
+
+    keras_probs, tflite_probs, labels = run_models(args.keras, args.tflite, samples, args.batch_size)
+    metrics = parity_metrics(keras_probs, tflite_probs, labels, class_names)
+
+    print(f"\n📊 Parity over {metrics['images']} images:")
+    print(f"   Top-1 agreement: {metrics['top1_agreement']:.4f}")
+    print(f"   Top-3 agreement: {metrics['top3_agreement']:.4f}")
+    print(f"   Mean / max KL divergence: {metrics['mean_kl_divergence']:.5f} / {metrics['max_kl_divergence']:.5f}")
+    print(f"   Max abs probability error: {metrics['max_abs_prob_error']:.4f}")
+    print(f"   Top-1 accuracy: Keras {metrics['keras_top1_accuracy']:.4f} | "
+          f"TFLite {metrics['tflite_top1_accuracy']:.4f}")
+
+    worst = sorted(metrics['per_class'], key=lambda row: row['accuracy_delta'])[:5]
+    if worst and worst[0]['accuracy_delta'] < 0:
+        print("\n   Largest per-class accuracy drops:")
+        for row in worst:
+            if row['accuracy_delta'] < 0:
+                print(f"     {row['class']}: {row['accuracy_delta']:+.3f} ({row['prediction_flips']} flips)")
+
+    thresholds = {
+        'min_top1_agreement': args.min_top1_agreement,
+        'min_top3_agreement': args.min_top3_agreement,
+        'max_mean_kl': args.max_mean_kl,
+        'max_abs_error': args.max_abs_error,
+        'max_class_accuracy_drop': args.max_class_accuracy_drop,
+    }
+    failures = check_thresholds(metrics, thresholds)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'metrics': metrics, 'thresholds': thresholds, 'failures': failures}, f, indent=2)
+        print(f"\n💾 Parity report saved to: {args.output}")
+
+    if failures:
+        print("\n❌ Parity check FAILED:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+
+    print("\n✅ Parity check passed")
@@ -0,0 +1,243 @@
+# Per-Operator Profiler for the Food Classifier
+# The TFLite Python interpreter has no op-level profiler, so this drives the
+# official TFLite benchmark_model tool with --enable_op_profiling, then joins
+# its per-node timings with tensor shapes read from the .tflite flatbuffer.
+# Prints a ranked per-op table plus a per-block rollup (MobileNetV2 blocks,
+# Dense head) and writes a Chrome trace (chrome://tracing / Perfetto).
+#
+# Get benchmark_model from the TFLite releases (prebuilt nightly binaries for
+# linux_x86-64 / android_aarch64) and pass it with --benchmark-binary or the
+# TFLITE_BENCHMARK_MODEL environment variable.
+
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from collections import defaultdict
+
+from op_audit import BUILTIN_OPERATORS, read_tflite_model
+
+# Layer groups worth trimming: backbone blocks and the classification head
+BLOCK_PATTERN = re.compile(r'(block_\d+|expanded_conv|Conv1|Conv_1|global_\w*pool\w*|dense\w*|predictions)',
+                           re.IGNORECASE)
+
+def find_benchmark_binary(path=None):
+    """Locate the TFLite benchmark_model binary"""
+    candidates = [
+        path,
+        os.environ.get('TFLITE_BENCHMARK_MODEL'),
+        shutil.which('benchmark_model'),
+        shutil.which('linux_x86-64_benchmark_model'),
+    ]
+    for candidate in candidates:
+        if candidate and os.path.isfile(candidate) and os.access(candidate, os.X_OK):
+            return candidate
+    return None
+
+def run_op_profiling(binary, model_path, num_threads=1, use_xnnpack=True, num_runs=50):
+    """Run benchmark_model with op profiling and return its log output"""
+    command = [
+        binary,
+        f'--graph={model_path}',
+        f'--num_threads={num_threads}',
+        f'--use_xnnpack={str(use_xnnpack).lower()}',
+        f'--num_runs={num_runs}',
+        '--enable_op_profiling=true',
+        '--max_profiling_buffer_entries=65536',
+    ]
+    print(f"🏃 {' '.join(command)}")
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"benchmark_model failed:\n{result.stderr[-2000:]}")
+    # benchmark_model logs to stderr
+    return result.stdout + '\n' + result.stderr
+
+def _parse_number(value):
+    try:
+        return float(value.rstrip('%'))
+    except ValueError:
+        return value
+
+def parse_op_profile(log_text):
+    """Parse the 'Run Order' table of the regular benchmark runs
+
+    Returns one dict per profiled node with node_type, name, avg_ms, first_ms,
+    start_ms (if reported), percent and times_called.
+    """
+    section = log_text.split('Operator-wise Profiling Info for Regular Benchmark Runs', 1)
+    if len(section) < 2:
+        raise ValueError("No operator-wise profiling info found in benchmark_model output")
+    lines = section[1].splitlines()
+
+    rows, columns, in_run_order = [], None, False
+    for line in lines:
+        if 'Run Order' in line:
+            in_run_order = True
+            continue
+        if not in_run_order:
+            continue
+        if columns is None:
+            if '[node type]' in line:
+                columns = [name.strip().lower() for name in re.findall(r'\[([^\]]+)\]', line)]
+            continue
+        if not line.strip() or line.strip().startswith('='):
+            break
+
+        values = [value.strip() for value in line.split('\t') if value.strip()]
+        if len(values) != len(columns):
+            continue
+        raw = dict(zip(columns, values))
+        rows.append({
+            'node_type': raw.get('node type'),
+            'name': raw.get('name', ''),
+            'start_ms': _parse_number(raw['start']) if 'start' in raw else None,
+            'first_ms': _parse_number(raw.get('first', '0')),
+            'avg_ms': _parse_number(raw.get('avg ms', '0')),
+            'percent': _parse_number(raw.get('%', '0')),
+            'times_called': int(_parse_number(raw.get('times called', '1'))),
+        })
+
+    return rows
+
+def kernel_kind(node_type):
+    """Which runtime executed a profiled node"""
+    if node_type.startswith('Flex'):
+        return 'flex'
+    if node_type in BUILTIN_OPERATORS:
+        return 'builtin'
+    # Delegate nodes and XNNPACK operator types (e.g. "Convolution (NHWC, F32) IGEMM")
+    return 'xnnpack'
+
+def attach_shapes(rows, model_path):
+    """Add tensor shapes from the flatbuffer, matching on node index or tensor name"""
+    subgraph = read_tflite_model(model_path)['subgraphs'][0]
+    tensors = subgraph['tensors']
+    tensor_by_name = {tensor['name']: tensor for tensor in tensors}
+
+    for row in rows:
+        row['input_shapes'], row['output_shapes'] = [], []
+        # Profiler names look like "[output tensor name]:node_index"
+        match = re.match(r'^\[?(.*?)\]?:(\d+)$', row['name'])
+        tensor_name = match.group(1) if match else row['name'].strip('[]')
+        operator = None
+        if match and row['kernel'] != 'xnnpack':
+            node_index = int(match.group(2))
+            if node_index < len(subgraph['operators']):
+                operator = subgraph['operators'][node_index]
+
+        if operator is not None:
+            row['input_shapes'] = [tensors[i]['shape'] for i in operator['inputs'] if i >= 0]
+            row['output_shapes'] = [tensors[i]['shape'] for i in operator['outputs'] if i >= 0]
+        elif tensor_name in tensor_by_name:
+            row['output_shapes'] = [tensor_by_name[tensor_name]['shape']]
+
+        block = BLOCK_PATTERN.search(tensor_name)
+        row['block'] = block.group(1) if block else 'other'
+
+    return rows
+
+def block_rollup(rows):
+    """Total time per backbone block / head layer"""
+    totals = defaultdict(lambda: {'avg_ms': 0.0, 'nodes': 0})
+    for row in rows:
+        totals[row['block']]['avg_ms'] += row['avg_ms']
+        totals[row['block']]['nodes'] += 1
+    total_ms = sum(entry['avg_ms'] for entry in totals.values()) or 1.0
+    return sorted(
+        ({'block': block, 'avg_ms': entry['avg_ms'], 'nodes': entry['nodes'],
+          'share': entry['avg_ms'] / total_ms * 100} for block, entry in totals.items()),
+        key=lambda entry: -entry['avg_ms']
+    )
+
+def chrome_trace(rows, model_path):
+    """Chrome trace events for one average run, in execution order"""
+    events, cursor_ms = [], 0.0
+    for row in rows:
+        start_ms = row['start_ms'] if isinstance(row['start_ms'], float) else cursor_ms
+        events.append({
+            'name': row['node_type'],
+            'cat': row['kernel'],
+            'ph': 'X',
+            'ts': start_ms * 1000,
+            'dur': row['avg_ms'] * 1000,
+            'pid': 1,
+            'tid': 1,
+            'args': {'name': row['name'], 'block': row['block'],
+                     'input_shapes': row['input_shapes'], 'output_shapes': row['output_shapes']},
+        })
+        cursor_ms = start_ms + row['avg_ms']
+    return {'traceEvents': events, 'displayTimeUnit': 'ms', 'otherData': {'model': model_path}}
+
+def print_report(rows, top=25):
+    total_ms = sum(row['avg_ms'] for row in rows) or 1.0
+    ranked = sorted(rows, key=lambda row: -row['avg_ms'])
+
+    print(f"\n{'#':>3}  {'Op':<34}{'Avg ms':>8}{'Share':>8}  {'Kernel':<9}{'Output shape':<20}Name")
+    print("-" * 120)
+    for rank, row in enumerate(ranked[:top], 1):
+        shape = str(row['output_shapes'][0]) if row['output_shapes'] else '-'
+        print(f"{rank:>3}  {row['node_type'][:33]:<34}{row['avg_ms']:>8.3f}"
+              f"{row['avg_ms'] / total_ms * 100:>7.1f}%  {row['kernel']:<9}{shape:<20}{row['name'][:60]}")
+
+    print(f"\n{'Block':<24}{'Avg ms':>8}{'Share':>8}{'Nodes':>7}")
+    print("-" * 47)
+    for entry in block_rollup(rows):
+        print(f"{entry['block']:<24}{entry['avg_ms']:>8.3f}{entry['share']:>7.1f}%{entry['nodes']:>7}")
+
+    kernels = defaultdict(float)
+    for row in rows:
+        kernels[row['kernel']] += row['avg_ms']
+    print("\nTime by kernel: " + ", ".join(
+        f"{kind} {ms:.2f} ms ({ms / total_ms * 100:.0f}%)" for kind, ms in sorted(kernels.items())
+    ))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-operator profile of a TFLite model")
+    parser.add_argument("--model", default="food_classifier.tflite", help="TFLite model path")
+    parser.add_argument("--benchmark-binary", default=None,
+                        help="Path to TFLite benchmark_model (or set TFLITE_BENCHMARK_MODEL)")
+    parser.add_argument("--profile-log", default=None,
+                        help="Parse an existing benchmark_model log instead of running it")
+    parser.add_argument("--num-threads", type=int, default=1)
+    parser.add_argument("--no-xnnpack", action="store_true", help="Profile the builtin kernels only")
+    parser.add_argument("--num-runs", type=int, default=50)
+    parser.add_argument("--top", type=int, default=25, help="Rows to show in the ranked table")
+    parser.add_argument("--output", default="op_profile.json", help="JSON report path")
+    parser.add_argument("--trace", default="op_profile_trace.json", help="Chrome trace output path")
+    args = parser.parse_args()
+
+    print("🔬 Food Classifier Op Profiler")
+    print("=" * 50)
+
+    if args.profile_log:
+        with open(args.profile_log) as f:
+            log_text = f.read()
+    else:
+        binary = find_benchmark_binary(args.benchmark_binary)
+        if binary is None:
+            print("❌ TFLite benchmark_model binary not found")
+            print("   Download it from the TFLite releases and pass --benchmark-binary,")
+            print("   or set TFLITE_BENCHMARK_MODEL to its path.")
+            sys.exit(1)
+        log_text = run_op_profiling(binary, args.model, args.num_threads,
+                                    not args.no_xnnpack, args.num_runs)
+
+    rows = parse_op_profile(log_text)
+    for row in rows:
+        row['kernel'] = kernel_kind(row['node_type'])
+    attach_shapes(rows, args.model)
+
+    print_report(rows, args.top)
+
+    with open(args.output, 'w') as f:
+        json.dump({'model': args.model, 'num_threads': args.num_threads,
+                   'xnnpack': not args.no_xnnpack, 'ops': rows,
+                   'blocks': block_rollup(rows)}, f, indent=2)
+    with open(args.trace, 'w') as f:
+        json.dump(chrome_trace(rows, args.model), f)
+
+    print(f"\n💾 Op profile saved to: {args.output}")
+    print(f"💾 Chrome trace saved to: {args.trace} (open in chrome://tracing or ui.perfetto.dev)")
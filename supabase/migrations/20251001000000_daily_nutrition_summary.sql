@@ -0,0 +1,119 @@
+-- Precomputed per patient / day / meal_type nutrition totals, so progress and
+-- dietitian views read one indexed row range instead of re-aggregating
+-- food_intake_logs against diet_charts targets on every request.
+-- Maintained by nutrition_rollup.py: incremental runs recompute only the days
+-- recorded in daily_nutrition_dirty_days, --backfill rebuilds everything.
+
+CREATE TABLE IF NOT EXISTS public.daily_nutrition_summary (
+    patient_id uuid NOT NULL REFERENCES public.profiles(id) ON DELETE CASCADE,
+    summary_date date NOT NULL,
+    -- One row per meal_type plus a 'total' row for the whole day
+    meal_type text NOT NULL,
+    log_count integer NOT NULL DEFAULT 0,
+    calories numeric(10,2) NOT NULL DEFAULT 0,
+    protein numeric(10,2) NOT NULL DEFAULT 0,
+    carbohydrates numeric(10,2) NOT NULL DEFAULT 0,
+    fat numeric(10,2) NOT NULL DEFAULT 0,
+    fiber numeric(10,2) NOT NULL DEFAULT 0,
+    -- Active diet chart covering summary_date, and the totals as % of its targets
+    diet_chart_id uuid REFERENCES public.diet_charts(id) ON DELETE SET NULL,
+    pct_target_calories numeric(8,1),
+    pct_target_protein numeric(8,1),
+    pct_target_carbs numeric(8,1),
+    pct_target_fat numeric(8,1),
+    pct_target_fiber numeric(8,1),
+    computed_at timestamp with time zone NOT NULL DEFAULT now(),
+    PRIMARY KEY (patient_id, summary_date, meal_type),
+    CONSTRAINT daily_nutrition_summary_meal_type_check CHECK (meal_type IN (
+        'total', 'breakfast', 'mid_morning', 'lunch', 'evening_snack', 'dinner', 'bedtime'
+    ))
+);
+
+-- Days whose logs or targets changed since the rollup job last ran.
+-- summary_date NULL means every day of the patient (a diet chart changed).
+CREATE TABLE IF NOT EXISTS public.daily_nutrition_dirty_days (
+    patient_id uuid NOT NULL,
+    summary_date date,
+    touched_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_daily_nutrition_dirty_days_patient
+ON public.daily_nutrition_dirty_days(patient_id);
+
+-- Watermark and bookkeeping of the rollup job
+CREATE TABLE IF NOT EXISTS public.nutrition_rollup_state (
+    job text PRIMARY KEY,
+    watermark timestamp with time zone,
+    last_run_at timestamp with time zone,
+    last_run_days integer
+);
+
+-- Statement-level triggers with transition tables: a bulk insert of logs adds
+-- one dirty row per distinct (patient, day), not one per log. SECURITY DEFINER
+-- so app roles writing logs need no grant on the dirty-days table.
+CREATE OR REPLACE FUNCTION public.mark_nutrition_log_days_dirty() RETURNS trigger
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = '' AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO public.daily_nutrition_dirty_days (patient_id, summary_date)
+        SELECT DISTINCT patient_id, (consumed_at AT TIME ZONE 'UTC')::date FROM old_rows;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO public.daily_nutrition_dirty_days (patient_id, summary_date)
+        SELECT DISTINCT patient_id, (consumed_at AT TIME ZONE 'UTC')::date FROM new_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION public.mark_nutrition_chart_patients_dirty() RETURNS trigger
+LANGUAGE plpgsql SECURITY DEFINER SET search_path = '' AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO public.daily_nutrition_dirty_days (patient_id, summary_date)
+        SELECT DISTINCT patient_id, NULL::date FROM old_rows;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO public.daily_nutrition_dirty_days (patient_id, summary_date)
+        SELECT DISTINCT patient_id, NULL::date FROM new_rows;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS food_intake_logs_dirty_insert ON public.food_intake_logs;
+CREATE TRIGGER food_intake_logs_dirty_insert AFTER INSERT ON public.food_intake_logs
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.mark_nutrition_log_days_dirty();
+
+DROP TRIGGER IF EXISTS food_intake_logs_dirty_update ON public.food_intake_logs;
+CREATE TRIGGER food_intake_logs_dirty_update AFTER UPDATE ON public.food_intake_logs
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.mark_nutrition_log_days_dirty();
+
+DROP TRIGGER IF EXISTS food_intake_logs_dirty_delete ON public.food_intake_logs;
+CREATE TRIGGER food_intake_logs_dirty_delete AFTER DELETE ON public.food_intake_logs
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.mark_nutrition_log_days_dirty();
+
+DROP TRIGGER IF EXISTS diet_charts_dirty_insert ON public.diet_charts;
+CREATE TRIGGER diet_charts_dirty_insert AFTER INSERT ON public.diet_charts
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.mark_nutrition_chart_patients_dirty();
+
+DROP TRIGGER IF EXISTS diet_charts_dirty_update ON public.diet_charts;
+CREATE TRIGGER diet_charts_dirty_update AFTER UPDATE ON public.diet_charts
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.mark_nutrition_chart_patients_dirty();
+
+DROP TRIGGER IF EXISTS diet_charts_dirty_delete ON public.diet_charts;
+CREATE TRIGGER diet_charts_dirty_delete AFTER DELETE ON public.diet_charts
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION public.mark_nutrition_chart_patients_dirty();
+
+-- Same access model as the other tables (authorization lives in the app layer)
+ALTER TABLE public.daily_nutrition_summary DISABLE ROW LEVEL SECURITY;
+GRANT SELECT ON TABLE public.daily_nutrition_summary TO anon, authenticated;
+GRANT ALL ON TABLE public.daily_nutrition_summary TO service_role;
+GRANT ALL ON TABLE public.daily_nutrition_dirty_days TO service_role;
+GRANT ALL ON TABLE public.nutrition_rollup_state TO service_role;
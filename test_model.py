@@ -1,14 +1,15 @@
 # Test the TensorFlow Lite Food Classification Model
-import tensorflow as tf
+# Uses the lightweight TFLite runtime, TensorFlow is not needed
 import numpy as np
 
+from food_model_utils import IMG_SIZE, create_interpreter, dequantize_output, model_input_size, set_image_input
+
 # Food categories
 FOOD_CATEGORIES = ['biriyani', 'bisibelebath', 'butternaan', 'chaat', 'chappati', 'dhokla', 'dosa', 'gulab jamun', 'halwa', 'idly', 'kathi roll', 'meduvadai', 'noodles', 'paniyaram', 'poori', 'samosa', 'tandoori chicken', 'upma', 'vada pav', 'ven pongal']
 
 def test_model():
     # Load the model
-    interpreter = tf.lite.Interpreter(model_path='food_classifier.tflite')
-    interpreter.allocate_tensors()
+    interpreter = create_interpreter('food_classifier.tflite')
     
     input_details = interpreter.get_input_details()
     output_details = interpreter.get_output_details()
@@ -17,13 +18,14 @@ def test_model():
     print(f"Input shape: {input_details[0]['shape']}")
     print(f"Output shape: {output_details[0]['shape']}")
     
-    # Test with random image
-    test_image = np.random.random((1, 224, 224, 3)).astype(np.float32)
+    # Test with random image (fused-preprocessing models have a dynamic input size)
+    img_size = model_input_size(input_details[0]) or IMG_SIZE
+    test_image = np.random.randint(0, 256, size=(1, img_size, img_size, 3), dtype=np.uint8)
     
-    interpreter.set_tensor(input_details[0]['index'], test_image)
+    set_image_input(interpreter, test_image)
     interpreter.invoke()
     
-    output = interpreter.get_tensor(output_details[0]['index'])
+    output = dequantize_output(interpreter.get_tensor(output_details[0]['index']), output_details[0])
     
     # Get prediction
     predicted_class = np.argmax(output)
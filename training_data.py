@@ -0,0 +1,151 @@
+# Training Data Pipelines for the Food Classifier
+# tf.data input pipelines for fine-tuning, built from the same
+# <data_dir>/<class name>/ layout and [-1, 1] normalization used everywhere
+# else, so training sees images exactly the way the app and TFLite models do.
+# Sharded TFRecords from build_tfrecords.py are read with parallel interleave,
+# cache, batched decoding and vectorized augmentation.
+
+import json
+import os
+import random
+
+import tensorflow as tf
+
+from food_model_utils import IMAGE_MEAN, IMAGE_STD, IMG_SIZE, FOOD_CATEGORIES, list_class_images
+
+AUTOTUNE = tf.data.AUTOTUNE
+
+def split_class_images(images_by_class, validation_split=0.0, seed=0):
+    """Stratified train/validation split of (path, class index) pairs"""
+    rng = random.Random(seed)
+    train, validation = [], []
+    for class_index, paths in sorted(images_by_class.items()):
+        paths = list(paths)
+        rng.shuffle(paths)
+        num_validation = int(round(len(paths) * validation_split))
+        validation.extend((path, class_index) for path in paths[:num_validation])
+        train.extend((path, class_index) for path in paths[num_validation:])
+    rng.shuffle(train)
+    return train, validation
+
+def decode_and_normalize(image_bytes, img_size=IMG_SIZE):
+    """Decode an encoded image and scale it to the model's [-1, 1] input range"""
+    image = tf.io.decode_image(image_bytes, channels=3, expand_animations=False)
+    image = tf.image.resize(image, (img_size, img_size))
+    return (image - IMAGE_MEAN) / IMAGE_STD
+
+def make_dataset(samples, num_classes, img_size=IMG_SIZE, batch_size=32, shuffle=False, seed=0):
+    """Batched (image, one-hot label) dataset from (path, class index) pairs"""
+    paths = [path for path, _ in samples]
+    labels = [class_index for _, class_index in samples]
+
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if shuffle:
+        dataset = dataset.shuffle(len(samples), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.map(
+        lambda path, label: (decode_and_normalize(tf.io.read_file(path), img_size),
+                             tf.one_hot(label, num_classes)),
+        num_parallel_calls=AUTOTUNE
+    )
+    return dataset.batch(batch_size).prefetch(AUTOTUNE)
+
+def load_image_dataset(data_dir, class_names=None, img_size=IMG_SIZE, batch_size=32,
+                       validation_split=0.0, seed=0):
+    """Training and validation datasets from a <data_dir>/<class name>/ image folder
+
+    Returns (train_ds, val_ds); val_ds is None when validation_split is 0.
+    """
+    class_names = class_names or FOOD_CATEGORIES
+    train, validation = split_class_images(list_class_images(data_dir, class_names),
+                                           validation_split, seed)
+    if not train:
+        raise ValueError(f"No training images found in: {data_dir}")
+
+    print(f"📂 {len(train)} training / {len(validation)} validation images from {data_dir}")
+    train_ds = make_dataset(train, len(class_names), img_size, batch_size, shuffle=True, seed=seed)
+    val_ds = make_dataset(validation, len(class_names), img_size, batch_size) if validation else None
+    return train_ds, val_ds
+
+# Written next to the shards by build_tfrecords.py
+TFRECORD_INFO_FILE = 'dataset_info.json'
+
+TFRECORD_FEATURES = {
+    'image': tf.io.FixedLenFeature([], tf.string),
+    'label': tf.io.FixedLenFeature([], tf.int64),
+}
+
+def load_tfrecord_info(record_dir):
+    """Image size, encoding, class names and shard files of a TFRecord dataset"""
+    info_path = os.path.join(record_dir, TFRECORD_INFO_FILE)
+    if not os.path.exists(info_path):
+        raise FileNotFoundError(f"No {TFRECORD_INFO_FILE} in {record_dir}, run build_tfrecords.py first")
+    with open(info_path) as f:
+        return json.load(f)
+
+def decode_record_batch(serialized, img_size, encoding='raw'):
+    """Parse a batch of serialized examples into uint8 images and class indices"""
+    features = tf.io.parse_example(serialized, TFRECORD_FEATURES)
+    if encoding == 'raw':
+        images = tf.io.decode_raw(features['image'], tf.uint8)
+    else:
+        images = tf.map_fn(lambda data: tf.io.decode_jpeg(data, channels=3), features['image'],
+                           fn_output_signature=tf.uint8)
+    return tf.reshape(images, (-1, img_size, img_size, 3)), features['label']
+
+def augment_batch(images, max_zoom=0.3, max_brightness=0.1, max_contrast=0.2):
+    """Random crop-and-resize, horizontal flip, brightness and contrast on a whole float batch"""
+    batch_size = tf.shape(images)[0]
+    img_size = images.shape[1]
+
+    # One crop box per image, resized back to the input size in a single op
+    scale = tf.random.uniform((batch_size, 1), 1.0 - max_zoom, 1.0)
+    offset = tf.random.uniform((batch_size, 2)) * (1.0 - scale)
+    boxes = tf.concat([offset, offset + scale], axis=1)
+    images = tf.image.crop_and_resize(images, boxes, tf.range(batch_size), (img_size, img_size))
+
+    flip = tf.random.uniform((batch_size, 1, 1, 1)) < 0.5
+    images = tf.where(flip, tf.reverse(images, axis=[2]), images)
+
+    brightness = tf.random.uniform((batch_size, 1, 1, 1), -max_brightness, max_brightness) * 255.0
+    contrast = tf.random.uniform((batch_size, 1, 1, 1), 1.0 - max_contrast, 1.0 + max_contrast)
+    mean = tf.reduce_mean(images, axis=(1, 2, 3), keepdims=True)
+    images = (images - mean) * contrast + mean + brightness
+    return tf.clip_by_value(images, 0.0, 255.0)
+
+def load_tfrecord_dataset(record_dir, split='train', batch_size=32, augment=None, cache=True,
+                          shuffle_buffer=2048, seed=0):
+    """Batched (image, one-hot label) dataset from the TFRecord shards of one split
+
+    Shards are read in parallel and the serialized records cached (cache=True
+    in memory, a path to cache on disk, False to re-read every epoch). Decoding,
+    augmentation and normalization run once per batch rather than per image.
+    Training splits are shuffled and augmented unless augment=False.
+    """
+    info = load_tfrecord_info(record_dir)
+    if split not in info['splits']:
+        return None
+    files = [os.path.join(record_dir, name) for name in info['splits'][split]['files']]
+    img_size, encoding = info['img_size'], info['encoding']
+    num_classes = len(info['class_names'])
+    training = split == 'train'
+    augment = training if augment is None else augment
+
+    dataset = tf.data.Dataset.from_tensor_slices(files)
+    if training:
+        dataset = dataset.shuffle(len(files), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.interleave(tf.data.TFRecordDataset, cycle_length=min(len(files), 16),
+                                 num_parallel_calls=AUTOTUNE, deterministic=not training)
+    if cache:
+        dataset = dataset.cache() if cache is True else dataset.cache(cache)
+    if training:
+        dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+
+    def prepare_batch(serialized):
+        images, labels = decode_record_batch(serialized, img_size, encoding)
+        images = tf.cast(images, tf.float32)
+        if augment:
+            images = augment_batch(images)
+        return (images - IMAGE_MEAN) / IMAGE_STD, tf.one_hot(labels, num_classes)
+
+    dataset = dataset.batch(batch_size)
+    return dataset.map(prepare_batch, num_parallel_calls=AUTOTUNE).prefetch(AUTOTUNE)